@@ -0,0 +1,127 @@
+# cluster.py ─ 多 process 啟動器：把分片切成幾組，每組一個 main.py process
+#
+#   python cluster.py                     # 分片數問 Discord，每 cluster 預設 4 個分片
+#   TOTAL_SHARDS=8 SHARDS_PER_CLUSTER=2 python cluster.py
+#
+# 保活 / 狀態頁（/clusters）只在這個 launcher 開一份，子 process 不開。
+import os
+import sys
+import time
+import signal
+import logging
+import subprocess
+
+import requests
+from dotenv import load_dotenv
+
+from keep_alive import keep_alive, auto_ping
+from core.logs import setup_logging
+
+load_dotenv()
+TOKEN = os.getenv('DISCORD_TOKEN')
+
+setup_logging()
+logger = logging.getLogger("Cluster")
+
+SHARDS_PER_CLUSTER = int(os.getenv("SHARDS_PER_CLUSTER", "4"))
+# Discord 每 5 秒只收一次 IDENTIFY，錯開啟動避免互相擠掉
+IDENTIFY_INTERVAL = 5.5
+MAX_BACKOFF = 300
+
+
+def fetch_shard_count():
+    if os.getenv("TOTAL_SHARDS"):
+        return int(os.getenv("TOTAL_SHARDS"))
+    resp = requests.get(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={"Authorization": f"Bot {TOKEN}"},
+        timeout=10
+    )
+    resp.raise_for_status()
+    return resp.json()["shards"]
+
+
+def shard_groups(total, per_cluster):
+    return [list(range(i, min(i + per_cluster, total))) for i in range(0, total, per_cluster)]
+
+
+class ClusterProcess:
+    def __init__(self, cluster_id, shard_ids, shard_count):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.proc = None
+        self.backoff = 5
+        self.restart_at = 0
+        self.started_at = 0
+
+    def start(self):
+        env = dict(
+            os.environ,
+            CLUSTER_ID=str(self.cluster_id),
+            SHARD_IDS=",".join(map(str, self.shard_ids)),
+            SHARD_COUNT=str(self.shard_count),
+            KEEP_ALIVE="0",
+        )
+        self.proc = subprocess.Popen([sys.executable, "main.py"], env=env)
+        self.started_at = time.time()
+        logger.info(f"🚀 Cluster {self.cluster_id} 啟動（分片 {self.shard_ids}，PID {self.proc.pid}）")
+
+    def poll(self):
+        """掛掉就排程重啟（指數退避）；跑超過 10 分鐘才算穩定，退避歸零"""
+        now = time.time()
+        if self.proc and self.proc.poll() is None:
+            if now - self.started_at > 600:
+                self.backoff = 5
+            return
+        if self.proc:
+            logger.warning(f"💥 Cluster {self.cluster_id} 結束（code {self.proc.returncode}），{self.backoff} 秒後重啟")
+            self.proc = None
+            self.restart_at = now + self.backoff
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+        elif now >= self.restart_at:
+            self.start()
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def main():
+    if not TOKEN:
+        logger.error("錯誤：找不到 TOKEN")
+        return
+
+    total = fetch_shard_count()
+    groups = shard_groups(total, SHARDS_PER_CLUSTER)
+    logger.info(f"🧩 共 {total} 個分片，分成 {len(groups)} 個 cluster")
+
+    keep_alive()
+    auto_ping()
+
+    clusters = [ClusterProcess(i, shards, total) for i, shards in enumerate(groups)]
+    for c in clusters:
+        c.start()
+        time.sleep(IDENTIFY_INTERVAL * len(c.shard_ids))
+
+    def shutdown(*_):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, shutdown)
+
+    try:
+        while True:
+            time.sleep(5)
+            for c in clusters:
+                c.poll()
+    except KeyboardInterrupt:
+        logger.info("🛑 關閉所有 cluster...")
+        for c in clusters:
+            c.stop()
+
+
+if __name__ == "__main__":
+    main()
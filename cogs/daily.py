@@ -1,23 +1,21 @@
 import discord
 from discord.ext import commands, tasks
-from datetime import datetime, timezone, timedelta
 import random
 import logging
-import os
-import google.generativeai as genai
-import asyncio
-import aiohttp
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from core.prompts import PromptBuilder
+from core.fanout import fan_out
+from core.broadcast import BroadcastPrep, PLACEHOLDER_HINT, fill
 
-TARGET_CHANNEL_ID = 1385233731073343498
+logger = logging.getLogger(__name__)
 
 class Daily(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.checked_today = False
-        self.checked_9am = False
+        # guild_id -> 已執行日期
+        self.checked_today = {}
+        self.checked_9am = {}
+        self.prepared = BroadcastPrep()  # 04:00 / 09:00 的內容提前生成
         
         self.quotes = [
             "你見過凌晨四點的洛杉磯嗎？早安，曼巴們。🏀",
@@ -37,102 +35,94 @@ class Daily(commands.Cog):
             "3 人小隊裡，就你還醒？**{mention}** 別拖後腿，睡吧！🐍"
         ]
         
-        api_key = os.getenv("GEMINI_API_KEY")
-        self.model = None
-        if api_key:
-            try:
-                genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel("gemini-1.5-flash")
-                logger.info("✅ Daily Cog - Gemini AI 啟動成功")
-            except Exception as e:
-                logger.error(f"Gemini 啟動失敗: {e}")
-        
         self.morning_call.start()
 
     def cog_unload(self):
         self.morning_call.cancel()
 
     async def ask_kobe(self, prompt: str) -> str | None:
-        if hasattr(self.bot, 'ask_brain'):
-            reply = await self.bot.ask_brain(prompt, system_instruction="你是 Kobe Bryant，嚴格的曼巴教練。")
-            if reply and "⚠️" not in reply: return reply
-
-        if not self.model: return None
-        try:
-            response = await self.model.generate_content_async(f"你是 Kobe Bryant。請毒舌罵人：{prompt}")
-            return response.text.strip()
-        except: return None
+        if not hasattr(self.bot, 'ask_brain'): return None
+        reply = await self.bot.ask_brain(prompt, persona="coach", feature="reports")
+        return reply if reply and "⚠️" not in reply else None
 
     @tasks.loop(seconds=60)
     async def morning_call(self):
-        tz = timezone(timedelta(hours=8))
-        now = datetime.now(tz)
-        
+        await fan_out(self.bot.guilds, self.morning_call_for_guild, timeout=120)
+
+    async def morning_call_for_guild(self, guild):
+        cfg = self.bot.guild_config.get(guild.id)
+        now = cfg.now()
+        today = now.strftime("%Y-%m-%d")
+
         # 04:00 點名
-        if now.hour == 4 and now.minute == 0:
-            if not self.checked_today:
-                await self.send_motivation()
-                self.checked_today = True
-        elif now.hour == 4 and now.minute == 1:
-            self.checked_today = False
+        if cfg.enabled("4am") and self.prepared.due(now, 4, 0):
+            self.prepared.prepare("4am", guild.id, today, lambda: self.compose_motivation(guild))
+        if now.hour == 4 and now.minute == 0 and cfg.enabled("4am"):
+            if self.checked_today.get(guild.id) != today:
+                self.checked_today[guild.id] = today
+                await self.send_motivation(guild, today)
 
         # 09:00 每日一問
-        if now.hour == 9 and now.minute == 0:
-            if not self.checked_9am:
-                await self.send_daily_question()
-                self.checked_9am = True
-        elif now.hour == 9 and now.minute == 1:
-            self.checked_9am = False
+        if cfg.enabled("question") and self.prepared.due(now, 9, 0):
+            self.prepared.prepare("question", guild.id, today, self.compose_daily_question)
+        if now.hour == 9 and now.minute == 0 and cfg.enabled("question"):
+            if self.checked_9am.get(guild.id) != today:
+                self.checked_9am[guild.id] = today
+                await self.send_daily_question(guild, today)
 
     @morning_call.error
     async def morning_call_error(self, error):
         logger.error(f"morning_call 任務錯誤: {error}")
 
-    async def send_daily_question(self):
-        channel = self.get_target_channel()
+    async def compose_daily_question(self):
+        prompt = "出一個二選一的問題給球員，逼他們選擇是要『變強』還是『當廢物』。例如：今天你要練球還是睡覺？語氣要非常有壓迫感。"
+        return await self.ask_kobe(prompt)
+
+    async def send_daily_question(self, guild, today):
+        channel = self.get_target_channel(guild)
         if not channel: return
 
-        prompt = "出一個二選一的問題給球員，逼他們選擇是要『變強』還是『當廢物』。例如：今天你要練球還是睡覺？語氣要非常有壓迫感。"
-        question = await self.ask_kobe(prompt) or "今天你要變強還是繼續當廢物？回覆 1 或 2。"
+        question = await self.prepared.take("question", guild.id, today, live=self.compose_daily_question)
+        question = question or "今天你要變強還是繼續當廢物？回覆 1 或 2。"
         
         embed = discord.Embed(title="❓ 每日曼巴靈魂拷問", description=question, color=0xe67e22)
         embed.set_footer(text="不回答？那就當作你默認是廢物。")
         await channel.send(embed=embed)
 
-    async def send_motivation(self):
-        channel = self.get_target_channel()
+    def awake_members(self, guild):
+        return self.bot.online.members(guild)
+
+    async def compose_motivation(self, guild):
+        """提前生成 04:00 的內容：(預計有沒有人醒著, 文字)；名單發送時才填"""
+        if self.awake_members(guild):
+            prompt = PromptBuilder("4am").text(f"凌晨四點還有人醒著。{PLACEHOLDER_HINT}。群體毒舌罵醒他們").build()
+            return True, await self.ask_kobe(prompt)
+        return False, await self.ask_kobe("全員都睡了，發一條勵志語錄鼓勵明天訓練")
+
+    async def send_motivation(self, guild, today):
+        channel = self.get_target_channel(guild)
         if not channel: return
 
-        stay_up_late = []
-        if self.bot.guilds:
-            guild = self.bot.guilds[0]
-            for member in guild.members:
-                if member.bot: continue
-                if member.status == discord.Status.online:
-                    stay_up_late.append(member)
+        stay_up_late = self.awake_members(guild)
+        awake, ai_text = await self.prepared.take("4am", guild.id, today, live=lambda: self.compose_motivation(guild)) or (None, None)
+        if awake != bool(stay_up_late):
+            ai_text = None  # 這幾分鐘內有人上線 / 下線，預先寫好的那種不適用了
 
         if stay_up_late:
-            if len(stay_up_late) > 1:
-                names = "、".join(m.display_name for m in stay_up_late)
-                ai_text = await self.ask_kobe(f"3人小隊 {names} 都還醒著，群體毒舌罵醒他們")
-                msg = ai_text or f"😡 {names}！你們全隊還在線上？曼巴不允許這種墮落！快睡！🐍🏀"
+            mentions = "、".join(f"**{m.mention}**" for m in stay_up_late[:10])
+            if ai_text:
+                msg = fill(ai_text, mentions)
+            elif len(stay_up_late) > 1:
+                msg = f"😡 {mentions}！你們全隊還在線上？曼巴不允許這種墮落！快睡！🐍🏀"
             else:
-                target = stay_up_late[0]
-                ai_text = await self.ask_kobe(f"只有 {target.display_name} 還醒著，個人罵他去睡覺")
-                msg = ai_text or random.choice(self.angry_roasts).format(mention=target.mention)
+                msg = random.choice(self.angry_roasts).format(mention=stay_up_late[0].mention)
             await channel.send(f"🌅 **凌晨四點 · 曼巴點名！**\n{msg}")
         else:
-            ai_text = await self.ask_kobe("全員都睡了，發一條勵志語錄鼓勵明天訓練")
             msg = ai_text or random.choice(self.quotes)
             await channel.send(f"🌅 **凌晨四點 · 曼巴時刻**\n{msg} 🐍🏀")
 
-    def get_target_channel(self):
-        if not self.bot.guilds: return None
-        guild = self.bot.guilds[0]
-        channel = guild.get_channel(TARGET_CHANNEL_ID)
-        if not channel:
-            channel = discord.utils.get(guild.text_channels, name="general") or guild.system_channel
-        return channel
+    def get_target_channel(self, guild):
+        return self.bot.channel_cache.get(guild)
 
     @morning_call.before_loop
     async def before_morning_call(self):
@@ -1,41 +1,74 @@
 import discord
 from discord.ext import commands, tasks
-import aiosqlite
 import asyncio
 import time
-from datetime import datetime, timedelta, timezone
 import random
 import os
 import io
 import aiohttp
 import logging
-from PIL import Image
 from collections import deque, Counter
 
-logging.basicConfig(level=logging.INFO)
+from core.database import connect
+from core.presence_filter import PresenceFilter, snapshot
+from core.leaderboard import Leaderboards
+from core.tracks import TrackCatalog
+from core import chat_index
+from core.memory import ConversationMemory
+from core.retrieval import RetrievalIndex
+from core.tokens import estimate_tokens, truncate_to_tokens
+from core.prompts import PromptBuilder
+from core.mood import MoodWindow
+from core.digest import DailyDigest
+from core.fanout import fan_out
+from core.broadcast import BroadcastPrep, PLACEHOLDER_HINT, fill
+from core.daysplit import split_days
+from core.logs import log_task_failure
+
 logger = logging.getLogger(__name__)
 
-TARGET_CHANNEL_ID = 1385233731073343498
+# 舊版單一伺服器資料搬遷時要歸到哪座伺服器（0 = 保留但不顯示）
+LEGACY_GUILD_ID = int(os.getenv("LEGACY_GUILD_ID", "0"))
+
+# 每座伺服器的排程工作最多跑多久（含 AI + 發訊息），超過就放棄這一輪
+GUILD_JOB_TIMEOUT = float(os.getenv("GUILD_JOB_TIMEOUT", "120"))
+
+# @ 機器人時，從這個人的聊天紀錄撈幾句相關的舊發言一起送（token 上限）
+RECALL_SNIPPETS = int(os.getenv("RECALL_SNIPPETS", "3"))
+RECALL_TOKENS = int(os.getenv("RECALL_TOKENS", "150"))
+
+# 舊表 → 要搬過去的欄位（guild_id 之外）
+LEGACY_TABLES = {
+    "playtime": "user_id, game_name, seconds, last_played",
+    "honor": "user_id, points, last_vote_date",
+    "daily_stats": "user_id, msg_count, lazy_points, roasted_count, last_updated",
+    "chat_logs": "user_id, content, timestamp",
+    "music_history": "user_id, title, artist, timestamp",
+    "nonsense_stats": "user_id, count",
+}
 
 class Game(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db_name = "mamba_system.db"
 
-        # 狀態儲存
+        # 狀態儲存（一律以 (guild_id, user_id) 為 key，同一人在不同伺服器互不干擾）
         self.active_sessions = {}
+        self.playtime_lock = asyncio.Lock()  # 定期存檔與結束結算不能同時動同一段時間
         self.pending_replies = {}
         self.processed_msg_ids = deque(maxlen=2000)
-        self.last_music_processed = {}
-        self.short_term_memory = {}
-        self.last_chat_time = {}
+        self.presence_filter = PresenceFilter(self.handle_presence)
+        self.memory = ConversationMemory(self.summarize_memory, self.db_name)  # 聊天記憶（token 上限 + 摘要，存 SQLite）
+        self.retrieval = RetrievalIndex(self.db_name)  # 每人聊天紀錄的 BM25 索引（@ 機器人時撈相關舊發言）
         self.user_goals = {}
+        self.boards = Leaderboards()  # honor / lazy / nonsense 排行（啟動時從 SQLite 重建）
+        self.background = set()  # 接回 session、每日一問處刑等背景 Task（留參照，unload 時一起取消）
 
-        # 任務執行標記（全部補齊！絕對不會再 AttributeError）
-        self._morning_executed = None   # 08:00 起床氣
-        self._4am_executed = None       # 04:00 點名
-        self._daily_executed = None     # 23:59 日報
-        self._weekly_executed = None    # 週日 20:00
+        # 任務執行標記：guild_id -> 已執行日期
+        self._morning_executed = {}   # 08:00 起床氣
+        self._4am_executed = {}       # 04:00 點名
+        self._daily_executed = {}     # 23:50 日報
+        self._weekly_executed = {}    # 週日 20:00
 
         # 冷卻系統
         self.ai_roast_cooldowns = {}
@@ -45,20 +78,23 @@ class Game(commands.Cog):
         self.detail_cooldowns = {}
         self.toxic_cooldowns = {}
 
-        # 新功能變數
-        self.long_term_memory = {}
-        self.daily_question_asked = None
-        self.daily_question_msg_id = None
-        self.pending_daily_answer = set()
-        self.daily_question_channel = None
-        self.last_daily_summary = None
-        self.daily_word_count = {}
-        self.spotify_taste = {}
+        # 新功能變數（每日一問 / 戰報皆以 guild_id 分開）
+        self.daily_question_asked = {}
+        self.daily_question_msg_id = {}
+        self.pending_daily_answer = {}
+        self.daily_question_channel = {}
+        self.last_daily_summary = {}
+        self.daily_word_count = {}     # guild_id -> {user_id: 文字}
+        self.mood_windows = {}         # guild_id -> MoodWindow（情緒雷達，最近一小時）
+        self.digest = DailyDigest()    # 每日聊天加權抽樣（日報用）
+        self.prepared = BroadcastPrep()  # 排程廣播提前生成（04:00 / 08:00 / 23:50）
+        self.tracks = TrackCatalog()
 
         # 關鍵字
         self.weak_words = ["累", "好累", "想睡", "放棄", "休息", "好睏", "沒力", "廢了"]
         self.toxic_words = ["幹", "靠", "爛", "輸", "垃圾", "廢物"]
         self.nonsense_words = ["哈", "喔", "笑死", "恩", "4", "呵呵", "真假", "確實"]
+        self.black_history_words = self.weak_words + ["廢", "爛", "不行", "放棄"]
 
         # 語錄
         self.kobe_quotes = ["Mamba Out.", "別吵我，正在訓練。", "那些殺不死你的，只會讓你更強。", "Soft."]
@@ -70,34 +106,44 @@ class Game(commands.Cog):
             "今天的努力，是為了明天的奇蹟。",
             "我不想和別人一樣，即使這個人是喬丹。——Kobe"
         ]
-        self.angry_roasts = [
-            "{mention}！現在凌晨四點你還亮著燈？你的肝是鐵做的嗎？去睡覺！",
-            "{mention}，你以為你在練球嗎？不，你在修仙！給我滾去睡覺！",
-            "{mention} 警告！曼巴精神是用來訓練的，不是用來熬夜打遊戲的！",
-            "抓到了！{mention} 這麼晚還在線上？明天的精神去哪了？",
-            "{mention}，你是想挑戰人體極限嗎？快去睡，不然沒收你的鍵盤！",
-            "全隊都睡了，就你還醒？{mention} 別拖後腿，睡吧！"
-        ]
 
-        self.sys_prompt_template = (
-            "你是 Kobe Bryant。個性：真實、不恭維、專業、現實、專注於問題。\n"
-            "1. 回答問題給專業、嚴厲但實用的建議。絕對不要硬扯籃球比喻，除非真的貼切。\n"
-            "2. 如果是連續對話，參考前文。\n"
-            "3. 音樂審判時你是心理學大師，要提歌名。\n"
-            "4. 錯字/邏輯嚴厲糾正。\n"
-            "5. 繁體中文(台灣)，30字內，多用 emoji (籃球蛇)。"
-        )
     async def cog_load(self):
-        async with aiosqlite.connect(self.db_name) as db:
+        async with connect(self.db_name) as db:
+            legacy = await self.detach_legacy_tables(db)
             await db.executescript('''
-                CREATE TABLE IF NOT EXISTS playtime (user_id INTEGER, game_name TEXT, seconds INTEGER, last_played DATE, PRIMARY KEY(user_id, game_name));
-                CREATE TABLE IF NOT EXISTS honor (user_id INTEGER PRIMARY KEY, points INTEGER DEFAULT 0, last_vote_date DATE);
-                CREATE TABLE IF NOT EXISTS daily_stats (user_id INTEGER PRIMARY KEY, msg_count INTEGER DEFAULT 0, lazy_points INTEGER DEFAULT 0, roasted_count INTEGER DEFAULT 0, last_updated DATE);
-                CREATE TABLE IF NOT EXISTS chat_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, content TEXT, timestamp REAL);
-                CREATE TABLE IF NOT EXISTS music_history (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, title TEXT, artist TEXT, timestamp REAL);
-                CREATE TABLE IF NOT EXISTS nonsense_stats (user_id INTEGER PRIMARY KEY, count INTEGER DEFAULT 0);
+                CREATE TABLE IF NOT EXISTS playtime (guild_id INTEGER, user_id INTEGER, game_name TEXT, seconds INTEGER, last_played DATE, PRIMARY KEY(guild_id, user_id, game_name));
+                CREATE TABLE IF NOT EXISTS honor (guild_id INTEGER, user_id INTEGER, points INTEGER DEFAULT 0, last_vote_date DATE, PRIMARY KEY(guild_id, user_id));
+                CREATE TABLE IF NOT EXISTS daily_stats (guild_id INTEGER, user_id INTEGER, msg_count INTEGER DEFAULT 0, lazy_points INTEGER DEFAULT 0, roasted_count INTEGER DEFAULT 0, last_updated DATE, PRIMARY KEY(guild_id, user_id));
+                CREATE TABLE IF NOT EXISTS chat_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER, user_id INTEGER, content TEXT, timestamp REAL, flagged INTEGER DEFAULT 0);
+                CREATE TABLE IF NOT EXISTS music_history (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER, user_id INTEGER, title TEXT, artist TEXT, timestamp REAL);
+                CREATE TABLE IF NOT EXISTS nonsense_stats (guild_id INTEGER, user_id INTEGER, count INTEGER DEFAULT 0, PRIMARY KEY(guild_id, user_id));
+                CREATE INDEX IF NOT EXISTS idx_chat_logs_guild_time ON chat_logs (guild_id, timestamp);
+
+                -- 遊戲時長：(人, 遊戲, 當地日期) 分桶 + 日 / 週 / 總計三層彙總，排行榜都是單一索引查詢
+                CREATE TABLE IF NOT EXISTS playtime_daily (guild_id INTEGER, user_id INTEGER, game_name TEXT, day DATE, seconds INTEGER DEFAULT 0, PRIMARY KEY(guild_id, user_id, game_name, day));
+                CREATE TABLE IF NOT EXISTS playtime_user_daily (guild_id INTEGER, day DATE, user_id INTEGER, seconds INTEGER DEFAULT 0, PRIMARY KEY(guild_id, day, user_id));
+                CREATE TABLE IF NOT EXISTS playtime_user_weekly (guild_id INTEGER, week TEXT, user_id INTEGER, seconds INTEGER DEFAULT 0, PRIMARY KEY(guild_id, week, user_id));
+                CREATE TABLE IF NOT EXISTS playtime_user_total (guild_id INTEGER, user_id INTEGER, seconds INTEGER DEFAULT 0, PRIMARY KEY(guild_id, user_id));
+                CREATE INDEX IF NOT EXISTS idx_playtime_user_daily_rank ON playtime_user_daily (guild_id, day, seconds DESC);
+                CREATE INDEX IF NOT EXISTS idx_playtime_user_weekly_rank ON playtime_user_weekly (guild_id, week, seconds DESC);
+                CREATE INDEX IF NOT EXISTS idx_playtime_user_total_rank ON playtime_user_total (guild_id, seconds DESC);
+                -- 進行中的遊戲（重啟後接回去）
+                CREATE TABLE IF NOT EXISTS playtime_sessions (guild_id INTEGER, user_id INTEGER, game_name TEXT, start REAL, checkpoint INTEGER, PRIMARY KEY(guild_id, user_id));
             ''')
+            for table in legacy:
+                cols = LEGACY_TABLES[table]
+                await db.execute(f"INSERT OR IGNORE INTO {table} (guild_id, {cols}) SELECT ?, {cols} FROM {table}_legacy", (LEGACY_GUILD_ID,))
+                await db.execute(f"DROP TABLE {table}_legacy")
+            # 第一次建彙總表時，用舊的每款遊戲總時數補上總榜
+            cursor = await db.execute("SELECT 1 FROM playtime_user_total LIMIT 1")
+            if not await cursor.fetchone():
+                await db.execute("INSERT INTO playtime_user_total (guild_id, user_id, seconds) SELECT guild_id, user_id, SUM(seconds) FROM playtime GROUP BY guild_id, user_id")
+            await self.tracks.setup(db)
+            await chat_index.setup(db)
+            await self.digest.setup(db)
             await db.commit()
+            await self.boards.load(db)
+        await self.memory.setup(LEGACY_GUILD_ID)
 
         # 啟動所有任務（包含凌晨4點點名！）
         self.daily_tasks.start()
@@ -109,65 +155,87 @@ class Game(commands.Cog):
         self.mood_radar.start()
         self.daily_summary_and_memory.start()
         self.morning_4am_check.start()  # 凌晨4點點名啟動！
-
-        await self.bot.wait_until_ready()
+        self.playtime_checkpoint.start()
+        self.presence_filter.start()
+        self.spawn(self.resume_sessions())
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+        task.add_done_callback(log_task_failure)
+        return task
+
+    async def detach_legacy_tables(self, db):
+        """舊版（沒有 guild_id）的表先改名，建好新表後再搬資料"""
+        legacy = []
+        for table in LEGACY_TABLES:
+            cursor = await db.execute(f"PRAGMA table_info({table})")
+            columns = [row[1] for row in await cursor.fetchall()]
+            if columns and "guild_id" not in columns:
+                await db.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+                legacy.append(table)
+        if legacy:
+            logger.info(f"🔧 搬遷舊版資料表到多伺服器格式: {', '.join(legacy)}")
+        return legacy
 
     async def cog_unload(self):
         tasks_to_cancel = [
             self.daily_tasks, self.weekly_tasks, self.game_check, self.ghost_check,
             self.morning_execution, self.daily_mamba_question, self.mood_radar,
-            self.daily_summary_and_memory, self.morning_4am_check
+            self.daily_summary_and_memory, self.morning_4am_check, self.playtime_checkpoint
         ]
         for t in tasks_to_cancel:
             if t.is_running():
                 t.cancel()
+        self.presence_filter.stop()
+        for task in list(self.background):
+            task.cancel()
 
     def get_text_channel(self, guild):
-        if not guild:
-            return None
-        channel = guild.get_channel(TARGET_CHANNEL_ID)
-        if channel and channel.permissions_for(guild.me).send_messages:
-            return channel
-        # 備用搜尋
-        return discord.utils.find(
-            lambda c: any(t in c.name.lower() for t in ["chat", "general", "聊天", "公頻"]) 
-                     and c.permissions_for(guild.me).send_messages,
-            guild.text_channels
-        ) or next((c for c in guild.text_channels if c.permissions_for(guild.me).send_messages), None)
-    async def ask_kobe(self, prompt, user_id=None, cooldown_dict=None, cooldown_time=30, image=None, use_memory=False):
+        return self.bot.channel_cache.get(guild)
+
+    async def for_each_guild(self, job, feature=None):
+        """所有伺服器同時跑 job(guild, cfg)；某座伺服器卡住或出錯都不會拖累其他伺服器"""
+        targets = [(g, self.bot.guild_config.get(g.id)) for g in self.bot.guilds]
+        if feature:
+            targets = [(g, cfg) for g, cfg in targets if cfg.enabled(feature)]
+        await fan_out(targets, lambda t: job(*t), timeout=GUILD_JOB_TIMEOUT, label=job.__name__)
+
+    async def ask_kobe(self, prompt, user_id=None, cooldown_dict=None, cooldown_time=30, image=None, use_memory=False, guild_id=None, feature="roast"):
         now = time.time()
-        
-        # 冷卻保護
+
+        # 冷卻保護（負載高時自動拉長；被 @ 的對話不拉長，直接回覆要快）
         if user_id and cooldown_dict is not None:
+            if not use_memory:
+                cooldown_time = self.bot.governor.cooldown(cooldown_time)
             last = cooldown_dict.get(user_id, 0)
             if now - last < cooldown_time:
                 return None  # 靜默冷卻
             cooldown_dict[user_id] = now
 
-        # 如果主 AI 沒載入，直接用靜態語錄（永不當機）
+        # 如果主 AI 沒載入，直接用語錄池（永不當機）
         if not hasattr(self.bot, 'ask_brain') or not callable(getattr(self.bot, 'ask_brain', None)):
-            return random.choice([
-                "Mamba Out.", "Soft.", "去訓練。", "你很弱。",
-                "別吵我，正在練球。", "第二名就是第一個輸家。",
-                "那些殺不死你的，只會讓你更強。"
-            ])
+            return self.bot.roast_pool.take("fallback")
 
+        fields = {"guild": guild_id, "user": user_id, "feature": feature}  # 日誌結構化欄位
         try:
             final_prompt = f"情境/用戶說：{prompt}"
             history = None
+            context = ""
             if use_memory and user_id:
-                if now - self.last_chat_time.get(user_id, 0) > 600:
-                    self.short_term_memory[user_id] = []
-                self.last_chat_time[user_id] = now
-                history = self.short_term_memory.get(user_id, [])
+                history = await self.memory.history(guild_id, user_id)
+                if guild_id:
+                    context = await self.recall(guild_id, user_id, prompt)
 
             # 15 秒超時保護
             reply = await asyncio.wait_for(
                 self.bot.ask_brain(
-                    final_prompt,
+                    context + final_prompt,
                     image=image,
-                    system_instruction=self.sys_prompt_template,
-                    history=history
+                    persona="kobe",
+                    history=history,
+                    feature=feature
                 ),
                 timeout=15.0
             )
@@ -175,73 +243,141 @@ class Game(commands.Cog):
             if reply and "⚠️" not in reply and "ERROR" not in reply:
                 # 更新記憶
                 if use_memory and user_id and not image:
-                    self.short_term_memory.setdefault(user_id, [])
-                    self.short_term_memory[user_id].extend([
-                        {'role': 'user', 'parts': [final_prompt]},
-                        {'role': 'model', 'parts': [reply]}
-                    ])
-                    if len(self.short_term_memory[user_id]) > 10:
-                        self.short_term_memory[user_id] = self.short_term_memory[user_id][-10:]
+                    await self.memory.append(guild_id, user_id, final_prompt, reply)
                 return reply
             return None
 
         except asyncio.TimeoutError:
-            logger.warning("AI 回應超時，切換靜態模式")
+            logger.warning("AI 回應超時，切換靜態模式", extra=fields)
         except Exception as e:
             if "429" in str(e) or "quota" in str(e).lower():
-                logger.warning("AI 429 額度暫滿，切換靜態模式")
+                logger.warning("AI 429 額度暫滿，切換靜態模式", extra=fields)
             elif "404" in str(e):
-                logger.warning("AI 模型 404（名稱過期），切換靜態模式")
+                logger.warning("AI 模型 404（名稱過期），切換靜態模式", extra=fields)
             elif "unauthorized" in str(e).lower():
-                logger.warning("API Key 無效，切換靜態模式")
+                logger.warning("API Key 無效，切換靜態模式", extra=fields)
             else:
-                logger.error(f"AI 未知錯誤: {e}")
+                logger.error(f"AI 未知錯誤: {e}", extra=fields)
 
         # 所有失敗的最終保底
-        return random.choice([
-            "Mamba Out.", "Soft.", "去訓練。", "你很弱。",
-            "別吵我，正在練球。", "第二名就是第一個輸家。",
-            "那些殺不死你的，只會讓你更強。"
-        ])
+        return self.bot.roast_pool.take("fallback")
+
+    async def analyze_image(self, url, user_id, feature="image"):
+        """圖片點評：下載後縮到 512px 再送（省流量也省 token）"""
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                    if resp.status != 200:
+                        return None
+                    data = await resp.read()
+            image = await asyncio.to_thread(self.load_image, data)
+        except Exception as e:
+            logger.warning(f"圖片讀取失敗: {e}")
+            return None
+        return await self.ask_kobe("用戶傳了這張圖，用曼巴的眼光毒舌點評", user_id, self.image_cooldowns, 60, image=image, feature=feature)
+
+    @staticmethod
+    def load_image(data):
+        from PIL import Image  # 只有看圖會用到，不拖慢啟動
+        image = Image.open(io.BytesIO(data))
+        image.thumbnail((512, 512))
+        return image.convert("RGB")
+
+    async def ask_kobe_batch(self, prompts):
+        """同一輪要罵很多人時一次問完（一次 API 呼叫），回傳順序同 prompts，失敗的位置是 None"""
+        if not prompts:
+            return []
+        if len(prompts) == 1 or not callable(getattr(self.bot, 'ask_brain_batch', None)):
+            return await fan_out(prompts, lambda p: self.ask_kobe(p, None, {}, 0), label="ask_kobe")
+        try:
+            replies = await asyncio.wait_for(
+                self.bot.ask_brain_batch([f"情境/用戶說：{p}" for p in prompts], persona="kobe"),
+                timeout=30.0
+            )
+        except Exception as e:
+            logger.warning(f"批次 AI 失敗: {e}")
+            return [None] * len(prompts)
+        return [r if r and "⚠️" not in r and "ERROR" not in r else None for r in replies]
+
+    async def recall(self, guild_id, user_id, text):
+        """從這個人的聊天紀錄撈出最相關的幾句（本機 bm25，不花 AI 額度），超過預算就截掉"""
+        try:
+            snippets = await self.retrieval.search(guild_id, user_id, text, RECALL_SNIPPETS)
+        except Exception as e:
+            logger.warning(f"聊天紀錄檢索失敗: {e}")
+            return ""
+        lines, used = [], 0
+        for s in snippets:
+            s = truncate_to_tokens(s, RECALL_TOKENS // 2)
+            used += estimate_tokens(s)
+            if used > RECALL_TOKENS:
+                break
+            lines.append(f"- {s}")
+        return "（他以前說過：\n" + "\n".join(lines) + "）\n" if lines else ""
+
+    async def summarize_memory(self, summary, dialogue):
+        """把舊對話併進摘要；失敗回 None，由 ConversationMemory 改用截斷"""
+        if not callable(getattr(self.bot, 'ask_brain', None)):
+            return None
+        prompt = (
+            f"舊摘要：{summary or '（無）'}\n新對話：\n{dialogue}\n"
+            "請把舊摘要和新對話合併成 100 字內的重點摘要（用戶是誰、在意什麼、聊過什麼、答應過什麼），只輸出摘要本身。"
+        )
+        try:
+            reply = await asyncio.wait_for(
+                self.bot.ask_brain(prompt, persona="summarizer", feature="other"),
+                timeout=15.0
+            )
+        except Exception as e:
+            logger.warning(f"對話摘要失敗: {e}")
+            return None
+        if not reply or "⚠️" in reply:
+            return None
+        return reply
+
         # ==================== 凌晨 4 點點名（最終版）===================
     @tasks.loop(minutes=1)
     async def morning_4am_check(self):
-        tz = timezone(timedelta(hours=8))
-        now = datetime.now(tz)
+        await self.for_each_guild(self._4am_for_guild, "4am")
+
+    async def _4am_for_guild(self, guild, cfg):
+        now = cfg.now()
         today_str = now.strftime("%Y-%m-%d")
-        
+        if self.prepared.due(now, 4, 0):
+            self.prepared.prepare("4am", guild.id, today_str, lambda: self.compose_4am(guild))
         if now.hour == 4 and now.minute == 0:
-            if self._4am_executed != today_str:
-                await self.send_4am_motivation()
-                self._4am_executed = today_str
-
-    async def send_4am_motivation(self):
-        guild = self.bot.guilds[0] if self.bot.guilds else None
-        if not guild: return
+            if self._4am_executed.get(guild.id) != today_str:
+                self._4am_executed[guild.id] = today_str
+                await self.send_4am_motivation(guild, today_str)
+
+    def awake_members(self, guild):
+        return self.bot.online.members(guild)
+
+    async def compose_4am(self, guild):
+        """提前生成 04:00 的內容：(預計有沒有人醒著, 文字)；名單發送時才填"""
+        builder = PromptBuilder("4am")
+        if self.awake_members(guild):
+            builder.text(f"凌晨4點還有人醒著在線上。{PLACEHOLDER_HINT}。群體毒舌罵他們去睡覺，語氣極兇，結尾帶 🐍💀")
+            return True, await self.ask_kobe(builder.build(), None, {}, 0, feature="reports")
+        builder.text("凌晨4點全員都睡了，發一條勵志語錄鼓勵明天訓練")
+        return False, await self.ask_kobe(builder.build(), None, {}, 0, feature="reports")
+
+    async def send_4am_motivation(self, guild, today_str):
         channel = self.get_text_channel(guild)
         if not channel: return
 
-        stay_up_late = [m for m in guild.members if not m.bot and m.status == discord.Status.online]
-        
+        stay_up_late = self.awake_members(guild)
+        awake, text = await self.prepared.take("4am", guild.id, today_str, live=lambda: self.compose_4am(guild)) or (None, None)
+        if awake != bool(stay_up_late):
+            text = None  # 這幾分鐘內有人上線 / 下線，預先寫好的那種不適用了
+
         if stay_up_late:
-            if len(stay_up_late) > 5:
-                names = "、".join(m.display_name for m in stay_up_late[:5]) + " 等廢物"
-                prompt = f"凌晨4點還有 {len(stay_up_late)} 人醒著，包括 {names}，群體毒舌罵他們去睡覺，語氣極兇，結尾帶 🐍💀"
-            elif len(stay_up_late) > 1:
-                names = "、".join(m.display_name for m in stay_up_late)
-                prompt = f"凌晨4點還有 {names} 醒著，群體毒舌罵醒他們，結尾帶 🐍💀"
-            else:
-                target = stay_up_late[0]
-                prompt = f"只有 {target.display_name} 凌晨4點還醒著，個人罵他去睡覺，結尾帶 🐍💀"
-            
-            roast = await self.ask_kobe(prompt, None, {}, 0)
-            msg = roast or random.choice(self.angry_roasts).format(mention=" ".join(m.mention for m in stay_up_late[:10]))
+            mentions = " ".join(m.mention for m in stay_up_late[:10])
+            msg = fill(text, mentions) or f"{mentions} {self.bot.roast_pool.take('4am')}"
             title = "04:00 · 曼巴點名處刑"
             color = 0x8e44ad
         else:
-            prompt = "凌晨4點全員都睡了，發一條勵志語錄鼓勵明天訓練"
-            msg = await self.ask_kobe(prompt, None, {}, 0)
-            msg = msg or random.choice(self.morning_quotes)
+            msg = text or random.choice(self.morning_quotes)
             title = "04:00 · 曼巴時刻"
             color = 0x2c3e50
 
@@ -249,174 +385,83 @@ class Game(commands.Cog):
         embed.set_footer(text="Mamba Mentality | 凌晨4點的洛杉磯")
         await channel.send(embed=embed)
 
-    @morning_4am_check.before_loop
-    async def before_4am(self):
-        await self.bot.wait_until_ready()
-
     @morning_4am_check.error
     async def morning_4am_check_error(self, error):
         logger.error(f"凌晨4點點名錯誤: {error}")
         await asyncio.sleep(60)  # 錯誤後等1分鐘再試
     @commands.Cog.listener()
     async def on_presence_update(self, before, after):
+        # 熱路徑：只做前置過濾，真的有變（遊戲 / 歌曲 / 上線狀態）才會進 handle_presence
         if after.bot: return
-        user_id = after.id
-        channel = self.get_text_channel(after.guild)
-        if not channel: return
-
-        # 遊戲監控
-        new_game = next((a.name for a in after.activities if a.type == discord.ActivityType.playing), None)
-        old_game = next((a.name for a in before.activities if a.type == discord.ActivityType.playing), None)
-
-        if new_game and not old_game:
-            self.active_sessions[user_id] = {"game": new_game, "start": time.time(), "1h_warned": False, "2h_warned": False}
-            prompt = f"用戶開始玩 {new_game}。" + ("痛罵他玩2K是垃圾" if "2k" in new_game.lower() else "罵他不去訓練")
-            roast = await self.ask_kobe(prompt, user_id, self.ai_roast_cooldowns, 300)
-            msg = roast if roast and roast != "ERROR" else f"玩 {new_game}？去訓練！"
-            await channel.send(f"{after.mention} {msg}")
-
-        elif old_game and not new_game and user_id in self.active_sessions:
-            session = self.active_sessions.pop(user_id, None)
-            if session:
-                duration = int(time.time() - session["start"])
-                await self.save_to_db(user_id, old_game, duration)
-                if duration > 600:
-                    interview = await self.ask_kobe(f"{after.display_name} 玩了 {duration//60} 分鐘 {old_game}。質問收穫。", user_id, self.ai_chat_cooldowns, 0)
-                    if interview and interview != "COOLDOWN":
-                        await channel.send(f"賽後採訪 {after.mention}\n{interview}")
-
-        # Spotify 監控 + 長期心理分析
-        new_spotify = next((a for a in after.activities if isinstance(a, discord.Spotify)), None)
-        if new_spotify:
-            now = time.time()
-            if now - self.last_music_processed.get(user_id, 0) < 10: return
-            self.last_music_processed[user_id] = now
-
-            async with aiosqlite.connect(self.db_name) as db:
-                await db.execute("INSERT INTO music_history (user_id, title, artist, timestamp) VALUES (?, ?, ?, ?)",
-                                 (user_id, new_spotify.title, new_spotify.artist, now))
-                await db.commit()
-
-            # 情緒分類
-            title_art = (new_spotify.title + " " + new_spotify.artist).lower()
-            mood_map = {
-                "sad": ["哭", "雨", "分手", "夜", "slow", "ballad", "lonely"],
-                "angry": ["fuck", "shit", "rage", "恨", "幹"],
-                "chill": ["lofi", "chill", "relax", "study"],
-                "hype": ["gym", "workout", "rap", "rock", "pump"]
-            }
-            detected = "neutral"
-            for mood, keywords in mood_map.items():
-                if any(k in title_art for k in keywords):
-                    detected = mood
-                    break
-
-            # 長期記憶
-            self.spotify_taste.setdefault(user_id, {"count": 0, "moods": {}})
-            self.spotify_taste[user_id]["count"] += 1
-            self.spotify_taste[user_id]["moods"][detected] = self.spotify_taste[user_id]["moods"].get(detected, 0) + 1
+        self.presence_filter.feed(before, after)
 
-            # 每15首深度分析一次
-            if self.spotify_taste[user_id]["count"] % 15 == 0:
-                total = sum(self.spotify_taste[user_id]["moods"].values())
-                dominant = max(self.spotify_taste[user_id]["moods"], key=self.spotify_taste[user_id]["moods"].get)
-                pct = self.spotify_taste[user_id]["moods"][dominant] / total * 100
-                if pct > 65:
-                    roast = await self.ask_kobe(
-                        f"用戶最近 {pct:.0f}% 聽 {dominant} 類型歌（共{self.spotify_taste[user_id]['count']}首），分析心理狀態，要毒舌",
-                        user_id, self.spotify_cooldowns, 300
-                    )
-                    if roast and roast != "COOLDOWN":
-                        await channel.send(f"深度心理剖析 {after.mention}\n{roast}")
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.presence_filter.forget(member.guild.id, member.id)
 
-            # 隨機點評（20% 機率）
-            if random.random() < 0.2:
-                roast = await self.ask_kobe(
-                    f"用戶正在聽 {new_spotify.title} - {new_spotify.artist}。用心理學分析品味。",
-                    user_id, self.spotify_cooldowns, 180
-                )
-                if roast and roast != "COOLDOWN":
-                    await channel.send(f"DJ Mamba 點評 {after.mention}\n{roast}")
     @commands.Cog.listener()
-    async def on_presence_update(self, before, after):
-        if after.bot: return
+    async def on_guild_remove(self, guild):
+        self.presence_filter.forget(guild.id)
+
+    async def handle_presence(self, after, old, new):
         user_id = after.id
+        guild_id = after.guild.id
+        key = (guild_id, user_id)
+        cfg = self.bot.guild_config.get(guild_id)
         channel = self.get_text_channel(after.guild)
         if not channel: return
 
         # 遊戲監控
-        new_game = next((a.name for a in after.activities if a.type == discord.ActivityType.playing), None)
-        old_game = next((a.name for a in before.activities if a.type == discord.ActivityType.playing), None)
-
-        if new_game and not old_game:
-            self.active_sessions[user_id] = {"game": new_game, "start": time.time(), "1h_warned": False, "2h_warned": False}
-            prompt = f"用戶開始玩 {new_game}。" + ("痛罵他玩2K是垃圾" if "2k" in new_game.lower() else "罵他不去訓練")
-            roast = await self.ask_kobe(prompt, user_id, self.ai_roast_cooldowns, 300)
-            msg = roast if roast and roast != "ERROR" else f"玩 {new_game}？去訓練！"
-            await channel.send(f"{after.mention} {msg}")
-
-        elif old_game and not new_game and user_id in self.active_sessions:
-            session = self.active_sessions.pop(user_id, None)
+        new_game = new.game
+        old_game = old.game if old else None
+
+        # 停玩或直接換一款（debounce 會把 A → 無 → B 合併成 A → B）：先結算舊的那款
+        if old_game and old_game != new_game and key in self.active_sessions:
+            session = await self.end_session(guild_id, user_id)
             if session:
                 duration = int(time.time() - session["start"])
-                await self.save_to_db(user_id, old_game, duration)
-                if duration > 600:
+                if duration > 600 and cfg.enabled("game_watch"):
                     interview = await self.ask_kobe(f"{after.display_name} 玩了 {duration//60} 分鐘 {old_game}。質問收穫。", user_id, self.ai_chat_cooldowns, 0)
                     if interview and interview != "COOLDOWN":
-                        await channel.send(f"賽後採訪 {after.mention}\n{interview}")
-
-        # Spotify 監控 + 長期心理分析
-        new_spotify = next((a for a in after.activities if isinstance(a, discord.Spotify)), None)
-        if new_spotify:
-            now = time.time()
-            if now - self.last_music_processed.get(user_id, 0) < 10: return
-            self.last_music_processed[user_id] = now
-
-            async with aiosqlite.connect(self.db_name) as db:
-                await db.execute("INSERT INTO music_history (user_id, title, artist, timestamp) VALUES (?, ?, ?, ?)",
-                                 (user_id, new_spotify.title, new_spotify.artist, now))
+                        self.bot.outbox.roast(channel, f"賽後採訪 {after.mention}\n{interview}")
+
+        if new_game and new_game != old_game:
+            await self.start_session(guild_id, user_id, new_game, time.time())
+            if cfg.enabled("game_watch"):
+                # 開玩很頻繁：直接從語錄池拿，不等 AI
+                now = time.time()
+                if now - self.ai_roast_cooldowns.get(user_id, 0) >= self.bot.governor.cooldown(300):
+                    self.ai_roast_cooldowns[user_id] = now
+                    self.bot.outbox.roast(channel, f"{after.mention} 玩 {new_game}？{self.bot.roast_pool.take('game_start')}")
+
+        # Spotify 監控 + 長期心理分析（換歌才算，進度更新早在過濾器就被擋掉）
+        if new.track_id and new.track_id != (old.track_id if old else None) and cfg.enabled("spotify"):
+            # 歌曲目錄（情緒只算一次）+ 整數收聽紀錄 + 持久化情緒直方圖
+            async with connect(self.db_name) as db:
+                _, moods = await self.tracks.record(db, guild_id, user_id, new.track_title, new.track_artist, int(time.time()))
                 await db.commit()
-
-            # 情緒分類
-            title_art = (new_spotify.title + " " + new_spotify.artist).lower()
-            mood_map = {
-                "sad": ["哭", "雨", "分手", "夜", "slow", "ballad", "lonely"],
-                "angry": ["fuck", "shit", "rage", "恨", "幹"],
-                "chill": ["lofi", "chill", "relax", "study"],
-                "hype": ["gym", "workout", "rap", "rock", "pump"]
-            }
-            detected = "neutral"
-            for mood, keywords in mood_map.items():
-                if any(k in title_art for k in keywords):
-                    detected = mood
-                    break
-
-            # 長期記憶
-            self.spotify_taste.setdefault(user_id, {"count": 0, "moods": {}})
-            self.spotify_taste[user_id]["count"] += 1
-            self.spotify_taste[user_id]["moods"][detected] = self.spotify_taste[user_id]["moods"].get(detected, 0) + 1
+            count = sum(moods.values())
 
             # 每15首深度分析一次
-            if self.spotify_taste[user_id]["count"] % 15 == 0:
-                total = sum(self.spotify_taste[user_id]["moods"].values())
-                dominant = max(self.spotify_taste[user_id]["moods"], key=self.spotify_taste[user_id]["moods"].get)
-                pct = self.spotify_taste[user_id]["moods"][dominant] / total * 100
+            if count % 15 == 0:
+                dominant = max(moods, key=moods.get)
+                pct = moods[dominant] / count * 100
                 if pct > 65:
                     roast = await self.ask_kobe(
-                        f"用戶最近 {pct:.0f}% 聽 {dominant} 類型歌（共{self.spotify_taste[user_id]['count']}首），分析心理狀態，要毒舌",
-                        user_id, self.spotify_cooldowns, 300
+                        f"用戶最近 {pct:.0f}% 聽 {dominant} 類型歌（共{count}首），分析心理狀態，要毒舌",
+                        user_id, self.spotify_cooldowns, 300, feature="spotify"
                     )
                     if roast and roast != "COOLDOWN":
-                        await channel.send(f"深度心理剖析 {after.mention}\n{roast}")
+                        self.bot.outbox.roast(channel, f"深度心理剖析 {after.mention}\n{roast}")
 
             # 隨機點評（20% 機率）
-            if random.random() < 0.2:
+            if self.bot.governor.chance(0.2):
                 roast = await self.ask_kobe(
-                    f"用戶正在聽 {new_spotify.title} - {new_spotify.artist}。用心理學分析品味。",
-                    user_id, self.spotify_cooldowns, 180
+                    f"用戶正在聽 {new.track_title} - {new.track_artist}。用心理學分析品味。",
+                    user_id, self.spotify_cooldowns, 180, feature="spotify"
                 )
                 if roast and roast != "COOLDOWN":
-                    await channel.send(f"DJ Mamba 點評 {after.mention}\n{roast}")
+                    self.bot.outbox.roast(channel, f"DJ Mamba 點評 {after.mention}\n{roast}")
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author.bot or message.content.startswith('!') or message.id in self.processed_msg_ids:
@@ -425,71 +470,73 @@ class Game(commands.Cog):
             return
         self.processed_msg_ids.append(message.id)
         user_id = message.author.id
+        guild_id = message.guild.id if message.guild else 0
         content = message.content.strip()
         lower = content.lower()
 
-        # 記錄聊天 + 每日詞頻統計
+        # 記錄聊天（同時寫進全文索引）+ 每日詞頻統計
         if len(content) > 0:
-            async with aiosqlite.connect(self.db_name) as db:
-                await db.execute("INSERT INTO chat_logs (user_id, content, timestamp) VALUES (?, ?, ?)", (user_id, content, time.time()))
+            # 黑歷史候選：直接在同一列打旗標（永久保留），不再另存一份
+            is_black_history = (any(w in lower for w in self.black_history_words) or len(content) < 6) and random.random() < 0.1
+            async with connect(self.db_name) as db:
+                await chat_index.add_message(db, guild_id, user_id, content, time.time(), flagged=is_black_history)
+                self.retrieval.add(guild_id, user_id, content)
+                if message.guild:
+                    day = self.bot.guild_config.get(guild_id).today()
+                    await self.digest.add(db, guild_id, day, user_id, content, is_black_history)
                 if random.random() < 0.05:
-                    limit_time = time.time() - 86400
-                    await db.execute("DELETE FROM chat_logs WHERE timestamp < ?", (limit_time,))
+                    await chat_index.prune(db, time.time() - chat_index.CHAT_RETENTION_DAYS * 86400)
                 await db.commit()
-            self.daily_word_count[user_id] = self.daily_word_count.get(user_id, "") + " " + content
-
-            # 黑歷史候選
-            if any(w in lower for w in self.weak_words + ["廢", "爛", "不行", "放棄"]) or len(content) < 6:
-                if random.random() < 0.1:
-                    async with aiosqlite.connect(self.db_name) as db:
-                        await db.execute("INSERT INTO chat_logs (user_id, content, timestamp) VALUES (?, ?, ?)",
-                                       (user_id, "[黑歷史]" + content, time.time()))
+            words = self.daily_word_count.setdefault(guild_id, {})
+            words[user_id] = words.get(user_id, "") + " " + content
+            self.mood_windows.setdefault(guild_id, MoodWindow()).add(content)
 
         # 無視傳球檢查（ghosting）
-        if user_id in self.pending_replies:
-            self.pending_replies.pop(user_id, None)
+        if (guild_id, user_id) in self.pending_replies:
+            self.pending_replies.pop((guild_id, user_id), None)
         if message.mentions:
             for member in message.mentions:
-                if not member.bot and member.status == discord.Status.online and member.id != user_id:
-                    self.pending_replies[member.id] = {'time': time.time(), 'channel': message.channel, 'mention_by': message.author}
+                if not member.bot and self.bot.online.status(guild_id, member.id) == "online" and member.id != user_id:
+                    self.pending_replies[(guild_id, member.id)] = {'time': time.time(), 'channel': message.channel, 'mention_by': message.author}
 
         # 廢話偵測 + 加分
         for word in self.nonsense_words:
             if word in lower:
-                async with aiosqlite.connect(self.db_name) as db:
-                    await db.execute("INSERT OR IGNORE INTO nonsense_stats (user_id, count) VALUES (?, 0)", (user_id,))
-                    await db.execute("UPDATE nonsense_stats SET count = count + 1 WHERE user_id = ?", (user_id,))
+                async with connect(self.db_name) as db:
+                    await db.execute("INSERT OR IGNORE INTO nonsense_stats (guild_id, user_id, count) VALUES (?, ?, 0)", (guild_id, user_id))
+                    await db.execute("UPDATE nonsense_stats SET count = count + 1 WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
                     await db.commit()
+                self.boards.add(guild_id, "nonsense", user_id, 1)
                 break
 
         # 隨機加表情
-        if random.random() < 0.3:
+        if self.bot.governor.chance(0.3):
             emojis = ["FIRE", "BASKETBALL", "SNAKE", "FLEXED_BICEPS", "CLOWN", "POOP", "SKULL", "EYES"]
-            try:
-                await message.add_reaction(random.choice(emojis))
-            except:
-                pass
+            self.bot.outbox.react(message, random.choice(emojis))
 
         # 說累自動 @ 最廢的人
         if any(w in lower for w in ["好累", "想睡", "睡了", "累死", "沒力", "廢了", "好睏"]):
-            today = datetime.now().strftime("%Y-%m-%d")
-            async with aiosqlite.connect(self.db_name) as db:
-                cursor = await db.execute("SELECT user_id, seconds FROM playtime WHERE last_played = ? ORDER BY seconds DESC LIMIT 1", (today,))
+            today = self.bot.guild_config.get(guild_id).today()
+            async with connect(self.db_name) as db:
+                cursor = await db.execute("SELECT user_id, seconds FROM playtime_user_daily WHERE guild_id = ? AND day = ? ORDER BY seconds DESC LIMIT 1", (guild_id, today))
                 row = await cursor.fetchone()
             if row and row[0] != user_id:
                 loser = self.bot.get_user(row[0])
                 if loser:
                     hours = row[1] // 3600
                     mins = (row[1] % 3600) // 60
-                    await message.reply(f"{loser.mention} 你今天已經玩了 {hours}小時{mins}分還敢說累？\n你才是最廢的那個")
+                    self.bot.outbox.reply(message, f"{loser.mention} 你今天已經玩了 {hours}小時{mins}分還敢說累？\n你才是最廢的那個")
 
         # 優先圖片分析
         has_image = message.attachments and any(att.content_type and att.content_type.startswith("image/") for att in message.attachments)
         if has_image:
-            if self.bot.user in message.mentions or random.random() < 0.1:
+            mentioned = self.bot.user in message.mentions
+            if mentioned or self.bot.governor.chance(0.1):
+                # 被 @ 才算聊天（不受節流）；主動點評走 image 額度，不吃聊天保留額度
                 async with message.channel.typing():
-                    reply = await self.analyze_image(message.attachments[0].url, user_id)
-                    await message.reply(reply)
+                    reply = await self.analyze_image(message.attachments[0].url, user_id, "chat" if mentioned else "image")
+                    if reply and reply != "COOLDOWN":
+                        self.bot.outbox.reply(message, reply)
             return
 
         # 優先 Tag / 問號 → AI 回覆
@@ -500,145 +547,416 @@ class Game(commands.Cog):
                 clean_text = content.replace(f"<@{self.bot.user.id}>", "").replace(f"<@!{self.bot.user.id}>", "").strip()
                 if not clean_text and not is_question: return
             async with message.channel.typing():
-                reply = await self.ask_kobe(content, user_id, self.ai_chat_cooldowns, 3, use_memory=True)
+                reply = await self.ask_kobe(content, user_id, self.ai_chat_cooldowns, 3, use_memory=True, guild_id=guild_id, feature="chat")
                 if reply == "COOLDOWN":
-                    await message.add_reaction("CLOCK")
+                    self.bot.outbox.react(message, "CLOCK")
                 elif reply and "ERROR" not in reply:
-                    await message.reply(reply)
+                    self.bot.outbox.reply(message, reply)
             return
 
         # 負能量 / 毒舌
         has_toxic = any(w in lower for w in self.toxic_words)
         if has_toxic:
-            async with message.channel.typing():
-                roast = await self.ask_kobe(f"用戶說：'{content}'。散播失敗主義。狠狠罵他。", user_id, self.toxic_cooldowns, 30)
-                if roast and "ERROR" not in roast and roast != "COOLDOWN":
-                    await message.reply(roast)
+            now = time.time()
+            if now - self.toxic_cooldowns.get(user_id, 0) >= self.bot.governor.cooldown(30):
+                self.toxic_cooldowns[user_id] = now
+                self.bot.outbox.reply(message, self.bot.roast_pool.take("toxic"))
             return
 
         # 細節糾察
-        if len(content) > 10 and random.random() < 0.2:
+        if len(content) > 10 and self.bot.governor.chance(0.2):
             async with message.channel.typing():
-                roast = await self.ask_kobe(f"檢查這句話有無錯字邏輯：'{content}'。若無錯回傳 PASS。", user_id, self.detail_cooldowns, 60)
+                roast = await self.ask_kobe(f"檢查這句話有無錯字邏輯：'{content}'。若無錯回傳 PASS。", user_id, self.detail_cooldowns, 60, feature="detail")
                 if roast and "PASS" not in roast and "ERROR" not in roast and roast != "COOLDOWN":
-                    await message.reply(f"細節糾察\n{roast}")
+                    self.bot.outbox.reply(message, f"細節糾察\n{roast}")
             return
 
         # 弱者關鍵字
         has_weak = any(w in lower for w in self.weak_words)
         if has_weak:
-            await message.channel.send(f"{message.author.mention} 累了？軟蛋！")
-            await self.update_daily_stats(user_id, "lazy_points", 2)
+            self.bot.outbox.roast(message.channel, f"{message.author.mention} {self.bot.roast_pool.take('weak')}")
+            await self.update_daily_stats(guild_id, user_id, "lazy_points", 2)
 
         await self.bot.process_commands(message)
     # ==================== 資料庫工具函式 ====================
-    async def save_to_db(self, user_id, game_name, seconds):
-        if seconds < 5: return
-        today = datetime.now().strftime('%Y-%m-%d')
-        async with aiosqlite.connect(self.db_name) as db:
+    async def start_session(self, guild_id, user_id, game_name, start):
+        now = int(time.time())
+        self.active_sessions[(guild_id, user_id)] = {
+            "game": game_name, "start": start, "checkpoint": now,
+            "1h_warned": now - start >= 3600, "2h_warned": now - start >= 7200
+        }
+        async with connect(self.db_name) as db:
+            await db.execute(
+                "INSERT OR REPLACE INTO playtime_sessions (guild_id, user_id, game_name, start, checkpoint) VALUES (?, ?, ?, ?, ?)",
+                (guild_id, user_id, game_name, start, now)
+            )
+            await db.commit()
+
+    async def end_session(self, guild_id, user_id):
+        """結算上次存檔到現在的時間，回傳結束的 session"""
+        async with self.playtime_lock:
+            session = self.active_sessions.pop((guild_id, user_id), None)
+            if not session: return None
+            async with connect(self.db_name) as db:
+                await self.record_playtime(db, guild_id, user_id, session["game"], session["checkpoint"], int(time.time()))
+                await db.execute("DELETE FROM playtime_sessions WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+                await db.commit()
+        return session
+
+    async def record_playtime(self, db, guild_id, user_id, game_name, start, end):
+        """把 [start, end) 依伺服器當地午夜切段，累加到分桶與日 / 週 / 總計彙總"""
+        tz = self.bot.guild_config.get(guild_id).tz
+        for day, week, seconds in split_days(start, end, tz):
+            await db.execute('''
+                INSERT INTO playtime_daily (guild_id, user_id, game_name, day, seconds) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(guild_id, user_id, game_name, day) DO UPDATE SET seconds = seconds + excluded.seconds
+            ''', (guild_id, user_id, game_name, day, seconds))
+            await db.execute('''
+                INSERT INTO playtime_user_daily (guild_id, day, user_id, seconds) VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id, day, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+            ''', (guild_id, day, user_id, seconds))
+            await db.execute('''
+                INSERT INTO playtime_user_weekly (guild_id, week, user_id, seconds) VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id, week, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+            ''', (guild_id, week, user_id, seconds))
+            await db.execute('''
+                INSERT INTO playtime_user_total (guild_id, user_id, seconds) VALUES (?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+            ''', (guild_id, user_id, seconds))
             await db.execute('''
-                INSERT INTO playtime (user_id, game_name, seconds, last_played) 
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(user_id, game_name) DO UPDATE SET
+                INSERT INTO playtime (guild_id, user_id, game_name, seconds, last_played) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(guild_id, user_id, game_name) DO UPDATE SET
                 seconds = seconds + excluded.seconds,
                 last_played = excluded.last_played
-            ''', (user_id, game_name, seconds, today))
-            await db.commit()
+            ''', (guild_id, user_id, game_name, seconds, day))
 
-    async def update_daily_stats(self, user_id, column, value):
-        today = datetime.now().strftime('%Y-%m-%d')
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.execute("SELECT 1 FROM daily_stats WHERE user_id = ?", (user_id,))
-            if not await cursor.fetchone():
-                await db.execute("INSERT INTO daily_stats (user_id, last_updated) VALUES (?, ?)", (user_id, today))
-            await db.execute(f"UPDATE daily_stats SET {column} = {column} + ? WHERE user_id = ?", (value, user_id))
-            await db.commit()
+    async def resume_sessions(self):
+        """重啟後：還在玩同一款的接回去（停機期間不算），已經沒在玩的丟掉，停機時才開始玩的補開"""
+        await self.bot.wait_until_ready()
+        async with connect(self.db_name) as db:
+            cursor = await db.execute("SELECT guild_id, user_id, game_name, start FROM playtime_sessions")
+            rows = await cursor.fetchall()
 
-    async def add_honor(self, user_id, amount):
-        async with aiosqlite.connect(self.db_name) as db:
-            await db.execute("INSERT OR IGNORE INTO honor (user_id, points) VALUES (?, 0)", (user_id,))
-            await db.execute("UPDATE honor SET points = points + ? WHERE user_id = ?", (amount, user_id))
+        resumed = stale = 0
+        for guild_id, user_id, game_name, start in rows:
+            guild = self.bot.get_guild(guild_id)
+            if not guild: continue  # 不是這個 cluster 負責的伺服器
+            member = guild.get_member(user_id)
+            if member and snapshot(member).game == game_name:
+                await self.start_session(guild_id, user_id, game_name, start)
+                resumed += 1
+            else:
+                async with connect(self.db_name) as db:
+                    await db.execute("DELETE FROM playtime_sessions WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+                    await db.commit()
+                stale += 1
+
+        for guild in self.bot.guilds:
+            # 離線的人不會在玩遊戲，只看線上索引
+            for member in self.bot.online.members(guild, None):
+                if (guild.id, member.id) in self.active_sessions: continue
+                game_name = snapshot(member).game
+                if game_name:
+                    await self.start_session(guild.id, member.id, game_name, time.time())
+        logger.info(f"🎮 遊戲 session 接回 {resumed} 筆，丟棄 {stale} 筆")
+
+    async def update_daily_stats(self, guild_id, user_id, column, value):
+        await self.update_daily_stats_many(guild_id, [user_id], column, value)
+
+    async def update_daily_stats_many(self, guild_id, user_ids, column, value):
+        """一次幫很多人加分（同一個交易），不用一人開一次連線"""
+        today = self.bot.guild_config.get(guild_id).today()
+        async with connect(self.db_name) as db:
+            await db.executemany("INSERT OR IGNORE INTO daily_stats (guild_id, user_id, last_updated) VALUES (?, ?, ?)", [(guild_id, u, today) for u in user_ids])
+            await db.executemany(f"UPDATE daily_stats SET {column} = {column} + ? WHERE guild_id = ? AND user_id = ?", [(value, guild_id, u) for u in user_ids])
             await db.commit()
+        if column == "lazy_points":
+            for u in user_ids:
+                self.boards.add(guild_id, "lazy", u, value)
+
+    async def add_honor(self, guild_id, user_id, amount):
+        async with connect(self.db_name) as db:
+            await db.execute("INSERT OR IGNORE INTO honor (guild_id, user_id, points) VALUES (?, ?, 0)", (guild_id, user_id))
+            await db.execute("UPDATE honor SET points = points + ? WHERE guild_id = ? AND user_id = ?", (amount, guild_id, user_id))
+            await db.commit()
+        return self.boards.add(guild_id, "honor", user_id, amount)
 
     # ==================== Ghost Check（無視傳球 10 分鐘處刑）===================
     @tasks.loop(minutes=1)
     async def ghost_check(self):
         now = time.time()
-        for uid, data in list(self.pending_replies.items()):
+        due = []
+        for key, data in list(self.pending_replies.items()):
             if now - data['time'] > 1800:  # 30分鐘自動清除
-                self.pending_replies.pop(uid, None)
-                continue
-            if now - data['time'] > 600:  # 10分鐘未回
-                channel = data['channel']
-                if not channel: 
-                    self.pending_replies.pop(uid, None)
-                    continue
-                member = channel.guild.get_member(uid)
-                if member and member.status == discord.Status.online:
-                    roast = await self.ask_kobe(
-                        f"{data['mention_by'].display_name} 傳球給 {member.display_name} 10分鐘沒回，罵他",
-                        uid, {}, 0
-                    )
-                    if roast:
-                        await channel.send(f"無視傳球 10 分鐘 {member.mention}\n{roast}")
-                        await self.update_daily_stats(uid, "lazy_points", 5)
-                self.pending_replies.pop(uid, None)
+                self.pending_replies.pop(key, None)
+            elif now - data['time'] > 600:  # 10分鐘未回（先移出，處刑慢也不會下一輪重複）
+                self.pending_replies.pop(key, None)
+                if data['channel']:
+                    due.append((key, data))
+        targets = []
+        for key, data in due:
+            member = data['channel'].guild.get_member(key[1])
+            if member and self.bot.online.status(key[0], member.id) == "online":
+                targets.append((key, data, member))
+        roasts = await self.ask_kobe_batch([
+            f"{data['mention_by'].display_name} 傳球給 {member.display_name} 10分鐘沒回，罵他"
+            for _, data, member in targets
+        ])
+        roasts = [r or self.bot.roast_pool.take("ghost") for r in roasts]
+        await fan_out(list(zip(targets, roasts)), self.punish_ghost)
+
+    async def punish_ghost(self, item):
+        ((guild_id, uid), data, member), roast = item
+        self.bot.outbox.roast(data['channel'], f"無視傳球 10 分鐘 {member.mention}\n{roast}")
+        await self.update_daily_stats(guild_id, uid, "lazy_points", 5)
 
     # ==================== 遊戲時長警告（1小時 / 2小時）===================
     @tasks.loop(minutes=1)
     async def game_check(self):
         now = time.time()
-        for user_id, session in list(self.active_sessions.items()):
+        warnings = []
+        for (guild_id, user_id), session in list(self.active_sessions.items()):
             duration = int(now - session["start"])
             if duration >= 3600 and not session.get("1h_warned"):
                 session["1h_warned"] = True
-                await self.send_warning(user_id, session["game"], "1小時", 5)
+                warnings.append((guild_id, user_id, session["game"], "1小時", 5))
             if duration >= 7200 and not session.get("2h_warned"):
                 session["2h_warned"] = True
-                await self.send_warning(user_id, session["game"], "2小時", 10)
+                warnings.append((guild_id, user_id, session["game"], "2小時", 10))
+
+        targets = []
+        for warning in warnings:
+            guild_id, user_id = warning[:2]
+            guild = self.bot.get_guild(guild_id)
+            if not guild or not self.bot.guild_config.get(guild_id).enabled("game_watch"): continue
+            member = guild.get_member(user_id)
+            channel = self.get_text_channel(guild)
+            if not member or not channel: continue
+            if now - self.ai_roast_cooldowns.get(user_id, 0) < 300: continue
+            self.ai_roast_cooldowns[user_id] = now
+            targets.append((warning, member, channel))
+        roasts = await self.ask_kobe_batch([f"用戶玩 {w[2]} 超過 {w[3]}，罵他眼睛瞎了嗎" for w, _, _ in targets])
+        await fan_out([(t, r) for t, r in zip(targets, roasts) if r], self.send_warning)
+
+    async def send_warning(self, item):
+        ((guild_id, user_id, game, time_str, penalty), member, channel), roast = item
+        self.bot.outbox.roast(channel, f"{time_str} 警報 {member.mention}\n{roast}")
+        await self.update_daily_stats(guild_id, user_id, "lazy_points", penalty)
+        # ==================== 自動任務區 ====================
 
-    async def send_warning(self, user_id, game, time_str, penalty):
-        guild = self.bot.guilds[0] if self.bot.guilds else None
-        if not guild: return
-        member = guild.get_member(user_id)
-        channel = self.get_text_channel(guild)
-        if not member or not channel: return
+    # ==================== 遊戲時長定期存檔（當機最多掉 1 分鐘）===================
+    @tasks.loop(minutes=1)
+    async def playtime_checkpoint(self):
+        if not self.active_sessions: return
+        now = int(time.time())
+        async with self.playtime_lock:
+            async with connect(self.db_name) as db:
+                for (guild_id, user_id), session in list(self.active_sessions.items()):
+                    if now <= session["checkpoint"]: continue
+                    await self.record_playtime(db, guild_id, user_id, session["game"], session["checkpoint"], now)
+                    session["checkpoint"] = now
+                    await db.execute("UPDATE playtime_sessions SET checkpoint = ? WHERE guild_id = ? AND user_id = ?", (now, guild_id, user_id))
+                await db.commit()
 
-        roast = await self.ask_kobe(f"用戶玩 {game} 超過 {time_str}，罵他眼睛瞎了嗎", user_id, self.ai_roast_cooldowns, 300)
-        if roast and roast != "COOLDOWN":
-            await channel.send(f"{time_str} 警報 {member.mention}\n{roast}")
-            await self.update_daily_stats(user_id, "lazy_points", penalty)
-        # ==================== 自動任務區 ====================
+    @playtime_checkpoint.error
+    async def playtime_checkpoint_error(self, error):
+        logger.error(f"遊戲時長存檔錯誤: {error}")
+
+    # ==================== 遊戲時長排行榜 ====================
+    @commands.command(name="r", aliases=["rank", "排行"])
+    @commands.guild_only()
+    async def rank(self, ctx, period: str = "day"):
+        cfg = self.bot.guild_config.get(ctx.guild.id)
+        now = cfg.now()
+        if period in ("week", "w", "週"):
+            title = "本週"
+            sql = "SELECT user_id, seconds FROM playtime_user_weekly WHERE guild_id = ? AND week = ? ORDER BY seconds DESC LIMIT 10"
+            params = (ctx.guild.id, now.strftime("%G-W%V"))
+        elif period in ("all", "a", "總"):
+            title = "總"
+            sql = "SELECT user_id, seconds FROM playtime_user_total WHERE guild_id = ? ORDER BY seconds DESC LIMIT 10"
+            params = (ctx.guild.id,)
+        else:
+            title = "今日"
+            sql = "SELECT user_id, seconds FROM playtime_user_daily WHERE guild_id = ? AND day = ? ORDER BY seconds DESC LIMIT 10"
+            params = (ctx.guild.id, now.strftime("%Y-%m-%d"))
+
+        async with connect(self.db_name) as db:
+            cursor = await db.execute(sql, params)
+            rows = await cursor.fetchall()
+
+        if not rows:
+            await ctx.send(f"{title}還沒人打遊戲。很好，繼續保持。🐍")
+            return
+        lines = []
+        for i, (uid, seconds) in enumerate(rows, 1):
+            m = ctx.guild.get_member(uid) or self.bot.get_user(uid)
+            name = m.display_name if m else f"用戶{uid}"
+            lines.append(f"`{i:>2}.` **{name}** {seconds // 3600}小時{(seconds % 3600) // 60}分")
+        embed = discord.Embed(title=f"🎮 {title}遊戲時長排行榜", description="\n".join(lines), color=0xe67e22)
+        embed.set_footer(text="`!r` 今日 | `!r week` 本週 | `!r all` 總榜（每分鐘更新）")
+        await ctx.send(embed=embed)
+
+    # ==================== 這週歌單心理分析 ====================
+    @commands.command(name="s", aliases=["songs", "歌單"])
+    @commands.guild_only()
+    async def songs(self, ctx, member: discord.Member = None):
+        member = member or ctx.author
+        async with connect(self.db_name) as db:
+            moods, top = await self.tracks.weekly_report(db, ctx.guild.id, member.id, int(time.time()) - 7 * 86400)
+        total = sum(moods.values())
+        if not total:
+            await ctx.send(f"{member.display_name} 這週一首歌都沒聽？還是關掉 Spotify 狀態在心虛？")
+            return
+
+        mood_line = "　".join(f"{m} {c / total * 100:.0f}%" for m, c in sorted(moods.items(), key=lambda x: -x[1]))
+        embed = discord.Embed(title=f"🎧 {member.display_name} 的本週歌單", color=0x1db954)
+        embed.add_field(name=f"情緒分佈（{total} 首）", value=mood_line, inline=False)
+        embed.add_field(name="重播最多", value="\n".join(f"{title} - {artist}（{c}次）" for title, artist, c in top), inline=False)
 
-    @tasks.loop(hours=24)
+        dominant = max(moods, key=moods.get)
+        roast = await self.ask_kobe(
+            f"用戶這週聽了 {total} 首歌，{dominant} 類型佔 {moods[dominant] / total * 100:.0f}%，最常聽 {top[0][0]} - {top[0][1]}。分析心理狀態，要毒舌",
+            member.id, self.spotify_cooldowns, 60, feature="spotify"
+        )
+        if roast:
+            embed.add_field(name="DJ Mamba", value=roast, inline=False)
+        await ctx.send(embed=embed)
+
+    # ==================== 榮譽系統 + 排行榜 ====================
+    def honor_title(self, points):
+        if points >= 200: return "🐍 黑曼巴"
+        if points >= 100: return "🏆 曼巴傳人"
+        if points >= 50: return "🏀 先發球員"
+        if points >= 0: return "🪑 板凳球員"
+        return "🚰 飲水機"
+
+    def format_board(self, guild, rows, unit):
+        lines = []
+        for i, (uid, score) in enumerate(rows, 1):
+            m = guild.get_member(uid) or self.bot.get_user(uid)
+            name = m.display_name if m else f"用戶{uid}"
+            lines.append(f"`{i:>2}.` **{name}** {score} {unit}")
+        return "\n".join(lines)
+
+    @commands.command(name="goal", aliases=["目標"])
+    @commands.guild_only()
+    async def goal(self, ctx, *, content: str):
+        self.user_goals[(ctx.guild.id, ctx.author.id)] = content
+        await ctx.send(f"📝 {ctx.author.mention} 立下誓言：**{content}**\n做不到就別回來見我。完成打 `!d`。")
+
+    @commands.command(name="d", aliases=["done", "完成"])
+    @commands.guild_only()
+    async def done(self, ctx):
+        goal = self.user_goals.pop((ctx.guild.id, ctx.author.id), None)
+        if not goal:
+            await ctx.send("你連目標都沒立，完成什麼？先 `!goal 內容`。")
+            return
+        points = await self.add_honor(ctx.guild.id, ctx.author.id, 20)
+        await ctx.send(f"✅ {ctx.author.mention} 完成「{goal}」+20 honor（現在 {points}）。這才像話。🐍")
+
+    async def vote_honor(self, ctx, member, amount):
+        if member.bot or member.id == ctx.author.id:
+            await ctx.send("自己投自己？還是投給機器人？Soft.")
+            return
+        today = self.bot.guild_config.get(ctx.guild.id).today()
+        async with connect(self.db_name) as db:
+            cursor = await db.execute("SELECT last_vote_date FROM honor WHERE guild_id = ? AND user_id = ?", (ctx.guild.id, ctx.author.id))
+            row = await cursor.fetchone()
+            if row and row[0] == today:
+                await ctx.send("一天只能投一次。明天再來。")
+                return
+            await db.execute("INSERT OR IGNORE INTO honor (guild_id, user_id, points) VALUES (?, ?, 0)", (ctx.guild.id, ctx.author.id))
+            await db.execute("UPDATE honor SET last_vote_date = ? WHERE guild_id = ? AND user_id = ?", (today, ctx.guild.id, ctx.author.id))
+            await db.commit()
+        return await self.add_honor(ctx.guild.id, member.id, amount)
+
+    @commands.command(name="res", aliases=["respect", "致敬"])
+    @commands.guild_only()
+    async def respect(self, ctx, member: discord.Member):
+        points = await self.vote_honor(ctx, member, 10)
+        if points is not None:
+            await ctx.send(f"🫡 {ctx.author.display_name} 向 {member.mention} 致敬 +10（{points}）")
+
+    @commands.command(name="b", aliases=["blame", "譴責"])
+    @commands.guild_only()
+    async def blame(self, ctx, member: discord.Member):
+        points = await self.vote_honor(ctx, member, -10)
+        if points is not None:
+            await ctx.send(f"👎 {ctx.author.display_name} 譴責 {member.mention} -10（{points}）")
+
+    @commands.command(name="honor", aliases=["榮譽"])
+    @commands.guild_only()
+    async def honor(self, ctx, member: discord.Member = None):
+        member = member or ctx.author
+        board = self.boards.board(ctx.guild.id, "honor")
+        points = board.get(member.id)
+        rank = board.rank(member.id)
+        embed = discord.Embed(title="🏅 曼巴榮譽榜", color=0xf1c40f)
+        embed.description = self.format_board(ctx.guild, board.top(10), "honor") or "還沒有人有榮譽。全是飲水機。"
+        embed.add_field(
+            name=member.display_name,
+            value=f"{self.honor_title(points)}　`{points}` honor" + (f"　第 {rank} 名" if rank else ""),
+            inline=False
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="lazy", aliases=["懶惰榜"])
+    @commands.guild_only()
+    async def lazy(self, ctx):
+        rows = self.boards.top(ctx.guild.id, "lazy", 10)
+        embed = discord.Embed(title="🛌 今日懶惰榜", description=self.format_board(ctx.guild, rows, "懶惰點") or "今天沒人偷懶？我不信。", color=0xe74c3c)
+        await ctx.send(embed=embed)
+
+    @commands.command(name="ns", aliases=["nonsense", "廢話榜"])
+    @commands.guild_only()
+    async def nonsense(self, ctx):
+        rows = self.boards.top(ctx.guild.id, "nonsense", 10)
+        embed = discord.Embed(title="💬 本週廢話榜", description=self.format_board(ctx.guild, rows, "次廢話") or "本週還沒人講廢話。", color=0x95a5a6)
+        await ctx.send(embed=embed)
+
+    @commands.command(name="bh", aliases=["黑歷史"])
+    @commands.guild_only()
+    async def black_history(self, ctx, member: discord.Member = None):
+        member = member or ctx.author
+        async with connect(self.db_name) as db:
+            # 先拿被標記的黑歷史，不夠再用全文索引撈他講過最廢的話
+            quotes = await chat_index.flagged(db, ctx.guild.id, member.id, 3)
+            if len(quotes) < 3:
+                found = await chat_index.search(db, ctx.guild.id, member.id, self.black_history_words + self.toxic_words, 6)
+                quotes += [q for q in found if q not in quotes][:3 - len(quotes)]
+            cursor = await db.execute("SELECT seconds FROM playtime_user_total WHERE guild_id = ? AND user_id = ?", (ctx.guild.id, member.id))
+            row = await cursor.fetchone()
+        seconds = row[0] if row else 0
+        lazy = self.boards.board(ctx.guild.id, "lazy")
+
+        embed = discord.Embed(title=f"📜 {member.display_name} 的黑歷史", color=0x000000)
+        embed.add_field(name="金句", value="\n".join(f"「{q}」" for q in quotes) or "還沒抓到把柄。", inline=False)
+        embed.add_field(name="總廢時", value=f"{seconds // 3600}小時{(seconds % 3600) // 60}分", inline=True)
+        embed.add_field(name="今日懶惰點", value=f"{lazy.get(member.id)}" + (f"（第 {lazy.rank(member.id)} 名）" if lazy.rank(member.id) else ""), inline=True)
+        await ctx.send(embed=embed)
+
+    # 各伺服器時區不同，排程一律每分鐘檢查一次自己的當地時間
+    @tasks.loop(minutes=1)
     async def daily_tasks(self):
-        tz = timezone(timedelta(hours=8))
-        now = datetime.now(tz)
+        await self.for_each_guild(self._daily_report_for_guild, "daily_report")
+
+    async def _daily_report_for_guild(self, guild, cfg):
+        now = cfg.now()
         today_str = now.strftime("%Y-%m-%d")
-        if getattr(self, '_daily_executed', None) == today_str:
+        if self._daily_executed.get(guild.id) == today_str:
             return
+        if self.prepared.due(now, 23, 50):
+            self.prepared.prepare("daily_report", guild.id, today_str, lambda: self.compose_daily_report(guild, today_str))
         if now.hour == 23 and now.minute >= 50:
-            self._daily_executed = today_str
-            channel = self.get_text_channel(self.bot.guilds[0]) if self.bot.guilds else None
+            self._daily_executed[guild.id] = today_str
+            channel = self.get_text_channel(guild)
             if not channel: return
 
-            async with aiosqlite.connect(self.db_name) as db:
-                limit = time.time() - 86400
-                cursor = await db.execute("SELECT user_id, content FROM chat_logs WHERE timestamp > ? ORDER BY RANDOM() LIMIT 30", (limit,))
-                chat_rows = await cursor.fetchall()
-                cursor = await db.execute("SELECT user_id, lazy_points FROM daily_stats ORDER BY lazy_points DESC LIMIT 5")
-                lazy_rows = await cursor.fetchall()
-
-            report = []
-            for uid, points in lazy_rows:
-                m = self.bot.get_user(uid)
-                name = m.display_name if m else f"用戶{uid}"
-                report.append(f"{name}: {points} 懶惰點")
-
-            chat_sample = "\n".join([c for _, c in chat_rows[:10]]) if chat_rows else "今天很安靜"
-
-            prompt = f"今日懶惰榜：{' | '.join(report)}\n今日聊天片段：\n{chat_sample}\n請用 Kobe Bryant 的語氣寫一篇毒舌日報，結尾帶蛇死"
-            news = await self.ask_kobe(prompt, None, {}, 0)
+            report = self.lazy_report(guild)
+            news = await self.prepared.take(
+                "daily_report", guild.id, today_str, live=lambda: self.compose_daily_report(guild, today_str)
+            )
             if not news or "⚠️" in news:
                 news = f"今日最廢物榜：{'、'.join([r.split(':')[0] for r in report])}\n你們讓我失望。蛇死"
 
@@ -646,33 +964,55 @@ class Game(commands.Cog):
             await channel.send(embed=embed)
 
             # 清空每日統計
-            async with aiosqlite.connect(self.db_name) as db:
-                await db.execute("DELETE FROM daily_stats")
+            async with connect(self.db_name) as db:
+                await db.execute("DELETE FROM daily_stats WHERE guild_id = ?", (guild.id,))
                 await db.commit()
+            self.boards.clear(guild.id, "lazy")
+
+    def lazy_report(self, guild):
+        report = []
+        for uid, points in self.boards.top(guild.id, "lazy", 5):
+            m = guild.get_member(uid) or self.bot.get_user(uid)
+            name = m.display_name if m else f"用戶{uid}"
+            report.append(f"{name}: {points} 懶惰點")
+        return report
+
+    async def compose_daily_report(self, guild, today_str):
+        prompt = (
+            PromptBuilder("daily_report")
+            .section("今日懶惰榜：", self.lazy_report(guild), 80, sep=" | ", item_tokens=20, empty="（沒人上榜）")
+            .section("今日聊天片段：\n", [c for _, c in self.digest.sample(guild.id, today_str)], 300, item_tokens=50, empty="今天很安靜")
+            .text("請用 Kobe Bryant 的語氣寫一篇毒舌日報，結尾帶蛇死")
+            .build()
+        )
+        return await self.ask_kobe(prompt, None, {}, 0, feature="reports")
 
-    @tasks.loop(hours=1)
+    @tasks.loop(minutes=1)
     async def weekly_tasks(self):
-        tz = timezone(timedelta(hours=8))
-        now = datetime.now(tz)
+        await self.for_each_guild(self._weekly_for_guild, "weekly")
+
+    async def _weekly_for_guild(self, guild, cfg):
+        now = cfg.now()
         if now.weekday() == 6 and 20 <= now.hour < 21:
             today_str = now.strftime("%Y-%m-%d")
-            if getattr(self, '_weekly_executed', None) == today_str:
+            if self._weekly_executed.get(guild.id) == today_str:
                 return
-            self._weekly_executed = today_str
+            self._weekly_executed[guild.id] = today_str
 
-            channel = self.get_text_channel(self.bot.guilds[0]) if self.bot.guilds else None
+            channel = self.get_text_channel(guild)
             if not channel: return
 
             # 本週廢話王
-            async with aiosqlite.connect(self.db_name) as db:
-                cursor = await db.execute("SELECT user_id, count FROM nonsense_stats ORDER BY count DESC LIMIT 1")
-                row = await cursor.fetchone()
-                if row:
-                    user = self.bot.get_user(row[0])
-                    name = user.display_name if user else "神秘廢物"
-                    await channel.send(f"本週廢話王：{user.mention if user else name}（{row[1]} 次廢話）\nKobe: 你的存在就是噪音。蛇")
-                    await db.execute("DELETE FROM nonsense_stats")
+            top = self.boards.top(guild.id, "nonsense", 1)
+            if top:
+                uid, count = top[0]
+                user = guild.get_member(uid) or self.bot.get_user(uid)
+                name = user.display_name if user else "神秘廢物"
+                await channel.send(f"本週廢話王：{user.mention if user else name}（{count} 次廢話）\nKobe: 你的存在就是噪音。蛇")
+                async with connect(self.db_name) as db:
+                    await db.execute("DELETE FROM nonsense_stats WHERE guild_id = ?", (guild.id,))
                     await db.commit()
+                self.boards.clear(guild.id, "nonsense")
 
             # 投票 + 最爛歌單（可選）
             embed = discord.Embed(title="本週最廢表情投票", color=0xffd700)
@@ -683,50 +1023,63 @@ class Game(commands.Cog):
 
     @tasks.loop(minutes=1)
     async def morning_execution(self):
-        tz = timezone(timedelta(hours=8))
-        now = datetime.now(tz)
+        await self.for_each_guild(self._morning_for_guild, "morning")
+
+    async def _morning_for_guild(self, guild, cfg):
+        now = cfg.now()
         today_str = now.strftime("%Y-%m-%d")
-        if getattr(self, '_morning_executed', None) == today_str:
+        if self._morning_executed.get(guild.id) == today_str:
             return
+        if self.prepared.due(now, 8, 0):
+            self.prepared.prepare("morning", guild.id, today_str, self.compose_morning)
+            self.bot.online.warm(guild)  # 大伺服器趁這幾分鐘先把完整名單 chunk 好
         if now.hour == 8 and now.minute == 0:
-            self._morning_executed = today_str
-            guild = self.bot.guilds[0] if self.bot.guilds else None
-            if not guild: return
+            self._morning_executed[guild.id] = today_str
             channel = self.get_text_channel(guild)
             if not channel: return
 
-            sleeping = [m for m in guild.members if not m.bot and m.status == discord.Status.offline]
+            # 名單一定用發送當下的（提前生成的文字裡只有 {名單} 標記）
+            sleeping = [m for m in await self.bot.online.roster(guild) if self.bot.online.status(guild.id, m.id) == "offline"]
             if not sleeping: return
 
-            names = "、".join(m.display_name for m in sleeping[:10])
-            prompt = f"早上8點還有 {len(sleeping)} 個廢物在睡，包括 {names}，用最毒的方式把他們罵醒，結尾帶蛇死"
-            roast = await self.ask_kobe(prompt, None, {}, 0)
-            msg = roast or f"8點了還在睡？{' '.join(m.mention for m in sleeping[:20])}\n給我起來訓練！蛇死"
+            mentions = " ".join(m.mention for m in sleeping[:20])
+            roast = await self.prepared.take("morning", guild.id, today_str, live=self.compose_morning)
+            msg = fill(roast, mentions) or f"8點了還在睡？{mentions}\n給我起來訓練！蛇死"
 
             embed = discord.Embed(title="08:00 起床氣處刑名單", description=msg, color=0xff0000)
             embed.set_footer(text="Mamba 在凌晨4點就醒了。你呢？")
             await channel.send(embed=embed)
 
+    async def compose_morning(self):
+        prompt = (
+            PromptBuilder("morning")
+            .text(f"早上8點還有一群廢物在睡。{PLACEHOLDER_HINT}。用最毒的方式把他們罵醒，結尾帶蛇死")
+            .build()
+        )
+        return await self.ask_kobe(prompt, None, {}, 0, feature="reports")
+
     # ==================== 每日意志測驗（09:00）===================
-    @tasks.loop(hours=24)
+    @tasks.loop(minutes=1)
     async def daily_mamba_question(self):
-        tz = timezone(timedelta(hours=8))
-        now = datetime.now(tz)
+        await self.for_each_guild(self._question_for_guild, "question")
+
+    async def _question_for_guild(self, guild, cfg):
+        now = cfg.now()
+        if self.prepared.due(now, 9, 0):
+            self.bot.online.warm(guild)
         if not (now.hour == 9 and now.minute < 5):
             return
         today = now.strftime("%Y-%m-%d")
-        if self.daily_question_asked == today:
+        if self.daily_question_asked.get(guild.id) == today:
             return
-        self.daily_question_asked = today
+        self.daily_question_asked[guild.id] = today
 
-        guild = self.bot.guilds[0] if self.bot.guilds else None
-        if not guild: return
         channel = self.get_text_channel(guild)
         if not channel: return
 
-        self.pending_daily_answer = {m.id for m in guild.members if not m.bot}
-        self.daily_question_channel = channel
-        self.daily_question_msg_id = None
+        pending = self.pending_daily_answer[guild.id] = {m.id for m in await self.bot.online.roster(guild)}
+        self.daily_question_channel[guild.id] = channel
+        self.daily_question_msg_id[guild.id] = None
 
         embed = discord.Embed(title="【每日曼巴意志測驗】", color=0x000000)
         embed.description = "**今天你要變強還是繼續當廢物？**\n\n1️⃣ 變強　　2️⃣ 當廢物\n\n60 秒內不回 → +10 懶惰點"
@@ -736,51 +1089,54 @@ class Game(commands.Cog):
             msg = await channel.send("@everyone", embed=embed)
             await msg.add_reaction("1️⃣")
             await msg.add_reaction("2️⃣")
-            self.daily_question_msg_id = msg.id
+            self.daily_question_msg_id[guild.id] = msg.id
+            # 處刑文字趁這 68 秒先寫好，時間到直接發
+            self.prepared.prepare("question_losers", guild.id, today, lambda: self.ask_kobe(
+                "這些人沒回答每日一問，極兇罵醒，不要寫人名，結尾蛇死", None, {}, 0, feature="reports"
+            ))
 
             async def execution():
                 await asyncio.sleep(68)
-                if self.daily_question_msg_id != msg.id: return
-                losers = [guild.get_member(uid) for uid in self.pending_daily_answer if guild.get_member(uid)]
+                if self.daily_question_msg_id.get(guild.id) != msg.id: return
+                losers = [guild.get_member(uid) for uid in pending if guild.get_member(uid)]
                 if losers:
                     mentions = " ".join(m.mention for m in losers[:20]) if len(losers) <= 20 else f"{len(losers)}名廢物"
-                    roast = await self.ask_kobe(f"這{len(losers)}人沒回答每日一問，極兇罵醒，結尾蛇死", None, {}, 0)
+                    roast = await self.prepared.take("question_losers", guild.id, today)
                     await channel.send(f"【意志力處刑】 {mentions}\n{roast or '廢物就是廢物。蛇死'}")
-                    for m in losers:
-                        await self.update_daily_stats(m.id, "lazy_points", 10)
-                self.pending_daily_answer.clear()
-                self.daily_question_msg_id = None
-            self.bot.loop.create_task(execution())
+                    await self.update_daily_stats_many(guild.id, [m.id for m in losers], "lazy_points", 10)
+                pending.clear()
+                self.daily_question_msg_id[guild.id] = None
+            self.spawn(execution())
         except Exception as e:
-            logger.error(f"每日一問失敗: {e}")
+            logger.error(f"[{guild.id}] 每日一問失敗: {e}")
 
     # ==================== 情緒雷達 + 深夜戰報 + before_loop ====================
-      @tasks.loop(minutes=15)
+    @tasks.loop(minutes=15)
     async def mood_radar(self):
-        guild = self.bot.guilds[0] if self.bot.guilds else None
-        if not guild:
-            return
-        
+        await self.for_each_guild(self._mood_radar_for_guild, "mood_radar")
+
+    async def _mood_radar_for_guild(self, guild, cfg):
         channel = self.get_text_channel(guild)
-        if not channel:
+        window = self.mood_windows.get(guild.id)
+        if not channel or not window:
             return
+        # 上次檢查後沒有新訊息，結果不會變
+        if window.added == window.checked:
+            return
+        window.checked = window.added
 
-        async with aiosqlite.connect(self.db_name) as db:
-            limit = time.time() - 3600
-            cursor = await db.execute(
-                "SELECT content FROM chat_logs WHERE timestamp > ? ORDER BY id DESC LIMIT 25",
-                (limit,)
-            )
-            rows = await cursor.fetchall()
-
-        if len(rows) < 8:
+        # 先用本機詞庫判斷：沒什麼情緒、或一面倒是不用處理的情緒，就不花 AI 額度
+        local, ask = window.assess()
+        if not ask or (local and local not in ("低落", "嗨")):
             return
 
-        text = " | ".join(r[0] for r in rows)
-        mood = await self.ask_kobe(
-            f"用一個詞總結這25句話情緒：開心/低落/嗨/憤怒/正常\n內容：{text}",
-            None, {}, 0
+        prompt = (
+            PromptBuilder("mood_radar")
+            .text("用一個詞總結這些話的情緒：開心/低落/嗨/憤怒/正常")
+            .section("內容：", window.texts(), 300, sep=" | ", item_tokens=30)
+            .build()
         )
+        mood = await self.ask_kobe(prompt, None, {}, 0, feature="reports")
         if not mood:
             return
 
@@ -789,25 +1145,28 @@ class Game(commands.Cog):
             await channel.send("「You don't get better sitting on the bench.」蛇")
         elif any(w in mood for w in ["嗨", "瘋", "笑死", "哈哈"]):
             await channel.send("『你們這叫興奮？我叫這幼稚。去訓練。』死")
-    @tasks.loop(hours=24)
+    @tasks.loop(minutes=1)
     async def daily_summary_and_memory(self):
-        tz = timezone(timedelta(hours=8))
-        now = datetime.now(tz)
+        await self.for_each_guild(self._summary_for_guild, "summary")
+
+    async def _summary_for_guild(self, guild, cfg):
+        now = cfg.now()
         if now.hour == 0 and now.minute < 10:
             today = now.strftime("%Y-%m-%d")
-            if self.last_daily_summary == today: return
-            self.last_daily_summary = today
-            channel = self.get_text_channel(self.bot.guilds[0]) if self.bot.guilds else None
-            if not channel or not self.daily_word_count: return
+            if self.last_daily_summary.get(guild.id) == today: return
+            self.last_daily_summary[guild.id] = today
+            word_count = self.daily_word_count.get(guild.id)
+            channel = self.get_text_channel(guild)
+            if not channel or not word_count: return
 
-            all_text = " ".join(self.daily_word_count.values())
+            all_text = " ".join(word_count.values())
             top5 = Counter(all_text.split()).most_common(5)
             words = "、".join(f"{w}({c}次)" for w,c in top5)
 
             embed = discord.Embed(title="曼巴深夜戰報", color=0x000000)
             embed.description = f"今日最常出現的詞：{words}\n\nMamba never sleeps. 你呢？蛇"
             await channel.send(embed=embed)
-            self.daily_word_count.clear()
+            word_count.clear()
 
     # ==================== 所有 before_loop（防崩潰必備）===================
     @morning_4am_check.before_loop
@@ -819,6 +1178,7 @@ class Game(commands.Cog):
     @weekly_tasks.before_loop
     @ghost_check.before_loop
     @morning_execution.before_loop
+    @playtime_checkpoint.before_loop
     async def before_loops(self):
         await self.bot.wait_until_ready()
 
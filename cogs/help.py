@@ -6,7 +6,6 @@ import os
 import asyncio
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class HelpView(View):
@@ -66,6 +65,7 @@ class HelpView(View):
         embed = discord.Embed(title="主動指令列表", color=0x2ecc71)
         embed.add_field(name="狀態查詢", value=(
             "`!r` → 遊戲時長排行榜\n"
+            "`!vr` → 語音時長排行榜\n"
             "`!st` → 曼巴監控中心（誰在玩什麼）\n"
             "`!s` / `!songs` → 這週歌單心理分析\n"
             "`!bh @某人` → 調出他的黑歷史金句 + 總廢時"
@@ -75,9 +75,15 @@ class HelpView(View):
             "`!d` → 完成目標 +20 honor\n"
             "`!res @人` → 致敬 +10\n"
             "`!b @人` → 譴責 -10\n"
-            "`!honor` → 查看稱號（飲水機 / 黑曼巴）"
+            "`!honor` → 查看稱號（飲水機 / 黑曼巴）\n"
+            "`!lazy` → 今日懶惰榜　`!ns` → 本週廢話榜"
+        ), inline=False)
+        embed.add_field(name="其他", value=(
+            "`!h` → 你現在看到的這個\n"
+            "`!config` → 本伺服器設定（頻道 / 時區 / 功能開關，管理員）\n"
+            "`!clusters` → 各 cluster / 分片狀態\n"
+            "`!quota` → 今天各功能的 AI 額度用量"
         ), inline=False)
-        embed.add_field(name="其他", value="`!h` → 你現在看到的這個", inline=False)
         await interaction.response.edit_message(embed=embed, view=self)
 
     @discord.ui.button(label="曼巴語錄", style=discord.ButtonStyle.grey, emoji="SNAKE")
@@ -0,0 +1,63 @@
+# settings.py ─ 每座伺服器自己的設定指令（管理員專用）
+import discord
+from discord.ext import commands
+import logging
+
+from core.guild_config import FEATURES
+
+logger = logging.getLogger(__name__)
+
+class Settings(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.group(name="config", aliases=["設定"], invoke_without_command=True)
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def config(self, ctx):
+        cfg = self.bot.guild_config.get(ctx.guild.id)
+        channel = ctx.guild.get_channel(cfg.target_channel_id)
+        embed = discord.Embed(title="⚙️ 曼巴設定", color=0x8e44ad)
+        embed.add_field(name="公告頻道", value=channel.mention if channel else "（自動尋找）", inline=False)
+        embed.add_field(name="時區", value=f"UTC{cfg.tz_offset:+g}", inline=False)
+        embed.add_field(name="功能", value="\n".join(
+            f"{'✅' if cfg.enabled(key) else '❌'} `{key}` {desc}" for key, desc in FEATURES.items()
+        ), inline=False)
+        embed.set_footer(text="!config channel #頻道 | !config tz 8 | !config feature <名稱> on/off")
+        await ctx.send(embed=embed)
+
+    @config.command(name="channel")
+    async def config_channel(self, ctx, channel: discord.TextChannel = None):
+        await self.bot.guild_config.update(ctx.guild.id, channel_id=channel.id if channel else None)
+        self.bot.channel_cache.invalidate(ctx.guild.id)
+        await ctx.send(f"✅ 公告頻道：{channel.mention if channel else '自動尋找'}")
+
+    @config.command(name="tz")
+    async def config_tz(self, ctx, offset: float):
+        if not -12 <= offset <= 14:
+            await ctx.send("時區要在 -12 ~ +14 之間，連這都不會？")
+            return
+        await self.bot.guild_config.update(ctx.guild.id, tz_offset=offset)
+        await ctx.send(f"✅ 時區：UTC{offset:+g}")
+
+    @config.command(name="feature")
+    async def config_feature(self, ctx, name: str, state: str):
+        if name not in FEATURES:
+            await ctx.send(f"沒有這個功能。可用：{', '.join(FEATURES)}")
+            return
+        enabled = state.lower() in ("on", "true", "1", "開")
+        await self.bot.guild_config.update(ctx.guild.id, feature=name, enabled=enabled)
+        await ctx.send(f"{'✅' if enabled else '❌'} `{name}` {FEATURES[name]}")
+
+    async def cog_command_error(self, ctx, error):
+        if isinstance(error, commands.MissingPermissions):
+            await ctx.send("你沒有管理伺服器的權限，Soft.")
+        elif isinstance(error, commands.NoPrivateMessage):
+            await ctx.send("設定只能在伺服器裡改。")
+        elif isinstance(error, commands.BadArgument):
+            await ctx.send("參數錯了，用 `!config` 看用法。")
+        else:
+            logger.error(f"config 指令錯誤: {error}")
+
+async def setup(bot):
+    await bot.add_cog(Settings(bot))
@@ -0,0 +1,176 @@
+# status.py ─ 曼巴監控台：每個 cluster 的心跳與狀態
+import discord
+from discord.ext import commands, tasks
+import os
+import math
+import time
+import logging
+
+from core.database import connect
+from core.prompts import PROMPT_STATS
+
+logger = logging.getLogger(__name__)
+
+# 超過這麼久沒心跳就當作掛了
+STALE_AFTER = 90
+
+class Status(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.started = time.time()
+
+    async def cog_load(self):
+        async with connect() as db:
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS cluster_status (
+                    cluster_id INTEGER PRIMARY KEY, pid INTEGER, shard_ids TEXT, shard_count INTEGER,
+                    guilds INTEGER, latency_ms INTEGER, started REAL, updated REAL
+                )
+            ''')
+            await db.commit()
+        self.heartbeat.start()
+
+    async def cog_unload(self):
+        self.heartbeat.cancel()
+
+    @tasks.loop(seconds=30)
+    async def heartbeat(self):
+        shard_ids = sorted(self.bot.shards) if hasattr(self.bot, "shards") else [0]
+        latency = self.bot.latency
+        latency_ms = int(latency * 1000) if math.isfinite(latency) else -1
+        async with connect() as db:
+            await db.execute('''
+                INSERT INTO cluster_status (cluster_id, pid, shard_ids, shard_count, guilds, latency_ms, started, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cluster_id) DO UPDATE SET
+                pid = excluded.pid, shard_ids = excluded.shard_ids, shard_count = excluded.shard_count,
+                guilds = excluded.guilds, latency_ms = excluded.latency_ms,
+                started = excluded.started, updated = excluded.updated
+            ''', (
+                getattr(self.bot, "cluster_id", 0), os.getpid(), ",".join(map(str, shard_ids)),
+                self.bot.shard_count or 1, len(self.bot.guilds), latency_ms, self.started, time.time()
+            ))
+            await db.commit()
+
+    @heartbeat.before_loop
+    async def before_heartbeat(self):
+        await self.bot.wait_until_ready()
+
+    @heartbeat.error
+    async def heartbeat_error(self, error):
+        logger.error(f"cluster 心跳錯誤: {error}")
+
+    @commands.command(name="clusters", aliases=["cluster"])
+    async def clusters(self, ctx):
+        async with connect() as db:
+            cursor = await db.execute(
+                "SELECT cluster_id, pid, shard_ids, shard_count, guilds, latency_ms, started, updated FROM cluster_status ORDER BY cluster_id"
+            )
+            rows = await cursor.fetchall()
+
+        now = time.time()
+        embed = discord.Embed(title="🛰️ 曼巴 Cluster 狀態", color=0x2c3e50)
+        for cluster_id, pid, shard_ids, shard_count, guilds, latency_ms, started, updated in rows:
+            alive = now - updated < STALE_AFTER
+            here = " ← 你在這" if cluster_id == getattr(self.bot, "cluster_id", 0) else ""
+            embed.add_field(
+                name=f"{'🟢' if alive else '🔴'} Cluster {cluster_id}{here}",
+                value=(
+                    f"分片 `{shard_ids}` / {shard_count}\n"
+                    f"伺服器 `{guilds}`　延遲 `{latency_ms}ms`\n"
+                    f"PID `{pid}`　上線 `{int((now - started) // 60)}` 分　心跳 `{int(now - updated)}s` 前"
+                ),
+                inline=False
+            )
+        if not rows:
+            embed.description = "還沒有任何心跳紀錄。"
+
+        governor = getattr(self.bot, "governor", None)
+        if governor:
+            g = governor.snapshot()
+            causes = "、".join(k for k, v in g["reasons"].items() if v == g["level"] and v) or "無"
+            embed.add_field(
+                name=f"⚖️ 本 cluster 負載：{g['name']}（等級 {g['level']}）",
+                value=(
+                    f"loop 延遲 `{g['lag_ms']}ms`　AI 進行中 `{g['ai_inflight']}`　額度剩 `{g['quota_ratio']:.0%}`\n"
+                    f"主因：{causes}"
+                ),
+                inline=False
+            )
+
+        outbox = getattr(self.bot, "outbox", None)
+        if outbox:
+            m = outbox.metrics()
+            embed.add_field(
+                name="📤 本 cluster 出站佇列",
+                value=(
+                    f"排隊 `{m['depth']}`（回覆 {m['depth_reply']} / 處刑 {m['depth_roast']} / 表情 {m['depth_reaction']}）"
+                    f"　頻道 `{m['channels']}`\n"
+                    f"已送 `{m['sent']}`　合併 `{m['coalesced']}`　丟棄 `{m['dropped']}`　失敗 `{m['failed']}`"
+                ),
+                inline=False
+            )
+
+        game = self.bot.get_cog("Game")
+        if game:
+            m = game.presence_filter.metrics()
+            embed.add_field(
+                name="👀 本 cluster 狀態過濾",
+                value=(
+                    f"事件 `{m['events']}`　沒變 `{m['dropped']}`　閃動 `{m['flapped']}`　處理 `{m['dispatched']}`\n"
+                    f"追蹤 `{m['tracked']}` 人　等待 `{m['pending']}`　處理中 `{m['inflight']}`"
+                ),
+                inline=False
+            )
+
+        pool = getattr(self.bot, "roast_pool", None)
+        if pool:
+            m = pool.metrics()
+            embed.add_field(
+                name="🎯 本 cluster 語錄池",
+                value=f"已給 `{m['served']}`（內建語錄 `{m['seeded']}`）　補貨 `{m['generated']}` 句　緩衝 `{m['buffered']}`",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(name="quota", aliases=["額度"])
+    async def quota(self, ctx):
+        rows = await self.bot.ai_budget.report()
+        remaining = await self.bot.ai_budget.remaining()
+        limits = self.bot.ai_budget.limits
+
+        def fmt(left, limit):
+            return f"{left}/{limit}" if limit else "不限"
+
+        embed = discord.Embed(title="🧮 今日 AI 額度（UTC）", color=0x16a085)
+        embed.description = (
+            f"總額度　每分鐘剩 `{fmt(remaining['minute'], limits['minute'])}`　"
+            f"今日剩 `{fmt(remaining['day'], limits['day'])}`"
+        )
+        for r in rows:
+            if not (r["requests"] or r["throttled"] or r["rate_limited"]):
+                continue
+            day_limit = f"/{r['day']}" if r["day"] else ""
+            embed.add_field(
+                name=r["feature"],
+                value=(
+                    f"請求 `{r['requests']}{day_limit}`　token `{r['prompt_tokens']}+{r['output_tokens']}`\n"
+                    f"被節流 `{r['throttled']}`　429 `{r['rate_limited']}`"
+                ),
+                inline=True
+            )
+        if len(embed.fields) == 0:
+            embed.add_field(name="今天", value="還沒用過 AI。", inline=False)
+        if PROMPT_STATS:
+            embed.add_field(
+                name="📝 報表 prompt 大小（本 cluster，啟動以來）",
+                value="\n".join(
+                    f"`{feature}` 平均 `{s['tokens'] // s['count']}` / 最大 `{s['max']}` token（{s['count']} 次）"
+                    for feature, s in sorted(PROMPT_STATS.items())
+                ),
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Status(bot))
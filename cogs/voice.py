@@ -1,30 +1,39 @@
 # Voice.py ─ 曼巴語音監獄長（2025 最終版）
+#
+# 全部靠 on_voice_state_update：最後一個真人離開 → 等 VOICE_EMPTY_GRACE 秒沒人回來才退出；
+# 每個人的語音時長（進 → 出，AFK 頻道不算）寫進共用資料庫，每分鐘存檔一次，排行榜直接查彙總表。
 import discord
 from discord.ext import commands, tasks
 import random
 import asyncio
 import time
-import aiosqlite
 import os
-import google.generativeai as genai
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from core.database import connect
+from core.daysplit import split_days
+from core.logs import log_task_failure
+
 logger = logging.getLogger(__name__)
 
+# 語音頻道只剩 bot 之後，等多久沒人回來才離開（秒）
+VOICE_EMPTY_GRACE = int(os.getenv("VOICE_EMPTY_GRACE", "60"))
+
+
+def in_voice(state, guild):
+    """這個語音狀態算不算「在語音裡」（AFK 頻道視同離開）"""
+    return state.channel is not None and state.channel != guild.afk_channel
+
+
 class Voice(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db_name = "mamba_system.db"
-        self.voice_sessions = {}  # {user_id: join_time}
-        
-        # 超兇回嗆庫
-        self.aggressive_leave_msgs = [
-            "叫我滾？你算老幾？好，我走！但記住：那些殺不死你的，只會讓你更強。",
-            "軟蛋才叫人滾！曼巴精神是面對挑戰！Mamba Out.",
-            "這就是你的態度？難怪你還在打低端局！Soft.",
-            "我走不是因為我怕，是因為我不屑！別吵我，正在訓練。"
-        ]
+        self.sessions = {}  # (guild_id, user_id) -> {"start", "checkpoint"}
+        self.voice_lock = asyncio.Lock()  # 定期存檔與離開結算不能同時動同一段時間
+        self.empty_timers = {}  # guild_id -> 空頻道倒數 Task
+        self.resume_task = None
+
         self.not_in_voice_roasts = [
             "我根本不在語音裡，你對著空氣吼什麼？幻聽了嗎？3人小隊，去看醫生吧！",
             "眼睛不需要可以捐給有需要的人！ 我哪裡在語音裡了？",
@@ -32,61 +41,34 @@ class Voice(commands.Cog):
             "你的曼巴精神是用來幻想的嗎？ 我人都不在，你叫誰滾？軟蛋！"
         ]
 
-        # === 2025 正確 Gemini 初始化 ===
-        self.model = None
-        self.has_ai = False
-        api_key = os.getenv("GEMINI_API_KEY")
-        if api_key:
-            try:
-                genai.configure(api_key=api_key)
-                self.model = genai.GenerativeModel(
-                    "gemini-1.5-flash",  # 唯一永不 404 的神
-                    generation_config={
-                        "temperature": 1.0,
-                        "max_output_tokens": 60
-                    }
-                )
-                self.has_ai = True
-                logger.info("Voice Cog - Gemini 1.5 Flash 啟動成功")
-            except Exception as e:
-                logger.error(f"Voice AI 初始化失敗: {e}")
-                self.has_ai = False
-        else:
-            logger.warning("無 GEMINI_API_KEY，語音回嗆用固定語錄")
-
         # 冷卻（防止被刷爆）
         self.kick_cooldown = {}  # user_id -> timestamp
 
-        self.voice_check.start()
-
-    def cog_unload(self):
-        self.voice_check.cancel()
+    async def cog_load(self):
+        async with connect(self.db_name) as db:
+            await db.executescript('''
+                -- 語音時長：日 / 週 / 總計三層彙總（跟遊戲時長同一套），排行榜都是單一索引查詢
+                CREATE TABLE IF NOT EXISTS voice_time_daily (guild_id INTEGER, day DATE, user_id INTEGER, seconds INTEGER DEFAULT 0, PRIMARY KEY(guild_id, day, user_id));
+                CREATE TABLE IF NOT EXISTS voice_time_weekly (guild_id INTEGER, week TEXT, user_id INTEGER, seconds INTEGER DEFAULT 0, PRIMARY KEY(guild_id, week, user_id));
+                CREATE TABLE IF NOT EXISTS voice_time_total (guild_id INTEGER, user_id INTEGER, seconds INTEGER DEFAULT 0, PRIMARY KEY(guild_id, user_id));
+                CREATE INDEX IF NOT EXISTS idx_voice_time_daily_rank ON voice_time_daily (guild_id, day, seconds DESC);
+                CREATE INDEX IF NOT EXISTS idx_voice_time_weekly_rank ON voice_time_weekly (guild_id, week, seconds DESC);
+                CREATE INDEX IF NOT EXISTS idx_voice_time_total_rank ON voice_time_total (guild_id, seconds DESC);
+                -- 進行中的語音（重啟後接回去）
+                CREATE TABLE IF NOT EXISTS voice_sessions (guild_id INTEGER, user_id INTEGER, start REAL, checkpoint INTEGER, PRIMARY KEY(guild_id, user_id));
+            ''')
+            await db.commit()
+        self.voice_checkpoint.start()
+        self.resume_task = asyncio.create_task(self.resume_sessions())
+        self.resume_task.add_done_callback(log_task_failure)
 
-    # ========================================
-    # 真正 async 的 Kobe AI（再也不卡了！）
-    # ========================================
-    async def ask_kobe(self, prompt: str) -> str:
-        if not self.has_ai:
-            return random.choice(self.aggressive_leave_msgs)
-
-        full_prompt = (
-            "你是 Kobe Bryant，在一個 3 人小 Discord 語音室當超兇教練。\n"
-            "語氣極度毒舌但勵志，用繁體中文（台灣腔），30 字內，多 emoji \n"
-            f"情境：{prompt}"
-        )
-
-        for _ in range(2):  # retry 一次就夠了
-            try:
-                response = await self.model.generate_content_async(full_prompt)
-                text = response.text.strip()
-                return text if text else "Mamba 不廢話！"
-            except Exception as e:
-                logger.error(f"Voice AI 失敗: {e}")
-                if "quota" in str(e).lower() or "429" in str(e):
-                    return "冷卻中...你太軟了！"
-                await asyncio.sleep(1)
-
-        return random.choice(self.aggressive_leave_msgs)
+    async def cog_unload(self):
+        self.voice_checkpoint.cancel()
+        if self.resume_task:
+            self.resume_task.cancel()
+        for task in self.empty_timers.values():
+            task.cancel()
+        self.empty_timers.clear()
 
     # ========================================
     # 關鍵指令：叫 Kobe 滾
@@ -100,51 +82,189 @@ class Voice(commands.Cog):
         self.kick_cooldown[ctx.author.id] = now
 
         voice_client = ctx.guild.voice_client
-        
+
         if not voice_client:
             msg = random.choice(self.not_in_voice_roasts)
             await ctx.send(f"{ctx.author.mention} {msg}")
             return
 
-        # 用 AI 生成超兇回嗆
-        ai_reply = await self.ask_kobe(f"{ctx.author.display_name} 在語音叫我滾，超兇回他")
-        final_msg = ai_reply or random.choice(self.aggressive_leave_msgs)
-        
+        # 語錄池裡預先生成好的超兇回嗆（不用等 AI）
+        final_msg = self.bot.roast_pool.take("voice_kick")
         await ctx.send(f"||{ctx.author.mention}|| {final_msg}")
-        
+
         # 真正離開語音
         await voice_client.disconnect()
 
     # ========================================
-    # 🔥 已移除自動進語音功能
+    # 語音事件：時長記錄 + 空頻道自動離開（不會自動進語音）
     # ========================================
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
-        # 這裡留空，防止 Bot 自動進入
-        pass
+        guild = member.guild
+        if not member.bot:
+            was, now = in_voice(before, guild), in_voice(after, guild)
+            if now and not was:
+                await self.start_session(guild.id, member.id, time.time())
+            elif was and not now:
+                await self.end_session(guild.id, member.id)
+            # 同伺服器換頻道：同一段 session 繼續算
+        self.check_empty(guild)
+
+    def check_empty(self, guild):
+        """bot 所在的頻道沒有真人 → 開始倒數；有人回來（或 bot 已經離開）→ 取消倒數"""
+        vc = guild.voice_client
+        timer = self.empty_timers.get(guild.id)
+        if vc and vc.channel and not any(not m.bot for m in vc.channel.members):
+            if timer is None or timer.done():
+                self.empty_timers[guild.id] = asyncio.create_task(self.leave_after_grace(guild))
+        elif timer:
+            timer.cancel()
+            self.empty_timers.pop(guild.id, None)
+
+    async def leave_after_grace(self, guild):
+        try:
+            await asyncio.sleep(VOICE_EMPTY_GRACE)
+            vc = guild.voice_client
+            # 倒數期間有人回來會被取消；這裡再確認一次
+            if vc and vc.channel and not any(not m.bot for m in vc.channel.members):
+                logger.info(f"🔇 [{guild.id}] {vc.channel.name} 空了 {VOICE_EMPTY_GRACE} 秒，離開語音")
+                await vc.disconnect()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"[{guild.id}] 空頻道離開失敗: {e}")
+        finally:
+            if self.empty_timers.get(guild.id) is asyncio.current_task():
+                self.empty_timers.pop(guild.id, None)
 
     # ========================================
-    # 每 30 秒檢查語音狀態
+    # 語音時長
     # ========================================
-    @tasks.loop(seconds=30)
-    async def voice_check(self):
+    async def start_session(self, guild_id, user_id, start):
+        now = int(time.time())
+        self.sessions[(guild_id, user_id)] = {"start": start, "checkpoint": now}
+        async with connect(self.db_name) as db:
+            await db.execute(
+                "INSERT OR REPLACE INTO voice_sessions (guild_id, user_id, start, checkpoint) VALUES (?, ?, ?, ?)",
+                (guild_id, user_id, start, now)
+            )
+            await db.commit()
+
+    async def end_session(self, guild_id, user_id):
+        """結算上次存檔到現在的時間，回傳結束的 session"""
+        async with self.voice_lock:
+            session = self.sessions.pop((guild_id, user_id), None)
+            if not session: return None
+            async with connect(self.db_name) as db:
+                await self.record_voice(db, guild_id, user_id, session["checkpoint"], int(time.time()))
+                await db.execute("DELETE FROM voice_sessions WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+                await db.commit()
+        return session
+
+    async def record_voice(self, db, guild_id, user_id, start, end):
+        """把 [start, end) 依伺服器當地午夜切段，累加到日 / 週 / 總計彙總"""
+        tz = self.bot.guild_config.get(guild_id).tz
+        for day, week, seconds in split_days(start, end, tz):
+            await db.execute('''
+                INSERT INTO voice_time_daily (guild_id, day, user_id, seconds) VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id, day, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+            ''', (guild_id, day, user_id, seconds))
+            await db.execute('''
+                INSERT INTO voice_time_weekly (guild_id, week, user_id, seconds) VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id, week, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+            ''', (guild_id, week, user_id, seconds))
+            await db.execute('''
+                INSERT INTO voice_time_total (guild_id, user_id, seconds) VALUES (?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET seconds = seconds + excluded.seconds
+            ''', (guild_id, user_id, seconds))
+
+    async def resume_sessions(self):
+        """重啟後：還在語音裡的接回去（停機期間不算），已經離開的丟掉，停機時才進來的補開"""
+        await self.bot.wait_until_ready()
+        async with connect(self.db_name) as db:
+            cursor = await db.execute("SELECT guild_id, user_id, start FROM voice_sessions")
+            rows = await cursor.fetchall()
+
+        resumed = stale = 0
+        for guild_id, user_id, start in rows:
+            guild = self.bot.get_guild(guild_id)
+            if not guild: continue  # 不是這個 cluster 負責的伺服器
+            member = guild.get_member(user_id)
+            if member and member.voice and in_voice(member.voice, guild):
+                await self.start_session(guild_id, user_id, start)
+                resumed += 1
+            else:
+                async with connect(self.db_name) as db:
+                    await db.execute("DELETE FROM voice_sessions WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+                    await db.commit()
+                stale += 1
+
         for guild in self.bot.guilds:
-            vc = guild.voice_client
-            if not vc or not vc.channel:
-                continue
-                
-            members = [m for m in vc.channel.members if not m.bot]
-            # 如果沒人了，才離開 (保持整潔)
-            if len(members) == 0:
-                await vc.disconnect()
+            # 成員快取固定保留在語音裡的人，掃頻道就夠了
+            for channel in guild.voice_channels + guild.stage_channels:
+                if channel == guild.afk_channel: continue
+                for member in channel.members:
+                    if member.bot or (guild.id, member.id) in self.sessions: continue
+                    await self.start_session(guild.id, member.id, time.time())
+            self.check_empty(guild)
+        logger.info(f"🎙️ 語音 session 接回 {resumed} 筆，丟棄 {stale} 筆")
 
-    @voice_check.before_loop
-    async def before_voice_check(self):
+    # ==================== 語音時長定期存檔（當機最多掉 1 分鐘）===================
+    @tasks.loop(minutes=1)
+    async def voice_checkpoint(self):
+        if not self.sessions: return
+        now = int(time.time())
+        async with self.voice_lock:
+            async with connect(self.db_name) as db:
+                for (guild_id, user_id), session in list(self.sessions.items()):
+                    if now <= session["checkpoint"]: continue
+                    await self.record_voice(db, guild_id, user_id, session["checkpoint"], now)
+                    session["checkpoint"] = now
+                    await db.execute("UPDATE voice_sessions SET checkpoint = ? WHERE guild_id = ? AND user_id = ?", (now, guild_id, user_id))
+                await db.commit()
+
+    @voice_checkpoint.before_loop
+    async def before_voice_checkpoint(self):
         await self.bot.wait_until_ready()
 
-    @voice_check.error
-    async def voice_check_error(self, error):
-        logger.error(f"voice_check 任務錯誤: {error}")
+    @voice_checkpoint.error
+    async def voice_checkpoint_error(self, error):
+        logger.error(f"語音時長存檔錯誤: {error}")
+
+    # ==================== 語音時長排行榜 ====================
+    @commands.command(name="vr", aliases=["voicerank", "語音榜"])
+    @commands.guild_only()
+    async def voice_rank(self, ctx, period: str = "day"):
+        cfg = self.bot.guild_config.get(ctx.guild.id)
+        now = cfg.now()
+        if period in ("week", "w", "週"):
+            title = "本週"
+            sql = "SELECT user_id, seconds FROM voice_time_weekly WHERE guild_id = ? AND week = ? ORDER BY seconds DESC LIMIT 10"
+            params = (ctx.guild.id, now.strftime("%G-W%V"))
+        elif period in ("all", "a", "總"):
+            title = "總"
+            sql = "SELECT user_id, seconds FROM voice_time_total WHERE guild_id = ? ORDER BY seconds DESC LIMIT 10"
+            params = (ctx.guild.id,)
+        else:
+            title = "今日"
+            sql = "SELECT user_id, seconds FROM voice_time_daily WHERE guild_id = ? AND day = ? ORDER BY seconds DESC LIMIT 10"
+            params = (ctx.guild.id, now.strftime("%Y-%m-%d"))
+
+        async with connect(self.db_name) as db:
+            cursor = await db.execute(sql, params)
+            rows = await cursor.fetchall()
+
+        if not rows:
+            await ctx.send(f"{title}還沒人進語音。都在當獨行俠？🐍")
+            return
+        lines = []
+        for i, (uid, seconds) in enumerate(rows, 1):
+            m = ctx.guild.get_member(uid) or self.bot.get_user(uid)
+            name = m.display_name if m else f"用戶{uid}"
+            lines.append(f"`{i:>2}.` **{name}** {seconds // 3600}小時{(seconds % 3600) // 60}分")
+        embed = discord.Embed(title=f"🎙️ {title}語音時長排行榜", description="\n".join(lines), color=0x3498db)
+        embed.set_footer(text="`!vr` 今日 | `!vr week` 本週 | `!vr all` 總榜（每分鐘更新）")
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(Voice(bot))
@@ -0,0 +1,169 @@
+# ai_budget.py ─ 跨 cluster 共用的 Gemini 額度（存在 SQLite，原子扣款），並依功能分帳
+#
+# 每次呼叫前 acquire(feature)：總額度 + 該功能的每分鐘 / 每日額度都要有剩才放行。
+# 聊天（被 @）以外的功能另外有「預測節流」：
+#   - 每分鐘總額度保留 AI_CHAT_RESERVE 次給聊天
+#   - 每日用量不能跑在時間前面太多（已過 40% 的一天，最多用掉 40% + AI_PACE_SLACK）
+# 用量（請求數、token、被擋次數、429）寫進 ai_usage，!quota 和 /quota 都讀這張表。
+import os
+import time
+import logging
+
+from core.database import connect
+
+logger = logging.getLogger(__name__)
+
+# 0 = 不限制
+AI_RPM = int(os.getenv("AI_RPM", "15"))
+AI_RPD = int(os.getenv("AI_RPD", "1500"))
+
+AI_CHAT_RESERVE = int(os.getenv("AI_CHAT_RESERVE", "2"))
+AI_PACE_SLACK = float(os.getenv("AI_PACE_SLACK", "0.2"))
+
+# 功能 -> (預設每分鐘, 預設每日)，可用 AI_RPM_<功能> / AI_RPD_<功能> 覆蓋
+FEATURE_DEFAULTS = {
+    "chat": (0, 0),        # 被 @ 的對話：只受總額度限制
+    "roast": (0, 400),     # 遊戲 / 毒舌 / 無視傳球
+    "spotify": (3, 200),
+    "detail": (3, 150),    # 細節糾察
+    "image": (2, 100),     # 沒被 @ 的圖片點評（被 @ 的算 chat）
+    "reports": (0, 100),   # 排程報表（日報、點名、每日一問…）
+    "pool": (2, 200),      # 語錄池背景補貨（只在額度閒置時跑）
+    "other": (0, 0),       # 記憶摘要等內部用途
+}
+FEATURES = tuple(FEATURE_DEFAULTS)
+
+# 不受預測節流的功能（有人在等回覆）
+PRIORITY_FEATURES = {"chat"}
+
+
+def feature_limits():
+    return {
+        f: {
+            "minute": int(os.getenv(f"AI_RPM_{f.upper()}", str(rpm))),
+            "day": int(os.getenv(f"AI_RPD_{f.upper()}", str(rpd))),
+        }
+        for f, (rpm, rpd) in FEATURE_DEFAULTS.items()
+    }
+
+
+class SharedBudget:
+    """每次呼叫 Gemini 前先扣一次額度；所有 process 看的是同一組計數"""
+
+    def __init__(self, rpm=AI_RPM, rpd=AI_RPD):
+        self.limits = {"minute": rpm, "day": rpd}
+        self.feature_limits = feature_limits()
+
+    async def setup(self):
+        async with connect() as db:
+            await db.executescript('''
+                CREATE TABLE IF NOT EXISTS ai_budget (
+                    bucket TEXT PRIMARY KEY, used INTEGER DEFAULT 0, expires REAL
+                );
+                CREATE TABLE IF NOT EXISTS ai_usage (
+                    day DATE, feature TEXT, requests INTEGER DEFAULT 0, prompt_tokens INTEGER DEFAULT 0,
+                    output_tokens INTEGER DEFAULT 0, throttled INTEGER DEFAULT 0, rate_limited INTEGER DEFAULT 0,
+                    PRIMARY KEY(day, feature)
+                );
+            ''')
+            await db.commit()
+
+    @staticmethod
+    def _day(now):
+        return time.strftime('%Y-%m-%d', time.gmtime(now))
+
+    def _buckets(self, now, feature=None):
+        suffix = f":{feature}" if feature else ""
+        return {
+            "minute": (f"m:{int(now // 60)}{suffix}", (now // 60 + 1) * 60),
+            "day": (f"d:{self._day(now)}{suffix}", (now // 86400 + 1) * 86400),
+        }
+
+    async def _used(self, db, bucket):
+        cursor = await db.execute("SELECT used FROM ai_budget WHERE bucket = ?", (bucket,))
+        row = await cursor.fetchone()
+        return row[0] if row else 0
+
+    async def _check(self, db, now, feature):
+        """回傳擋下的原因，可以放行就回 None"""
+        checks = [(window, bucket, self.limits[window]) for window, (bucket, _) in self._buckets(now).items()]
+        flimits = self.feature_limits.get(feature, {})
+        checks += [
+            (f"{feature}/{window}", bucket, flimits.get(window, 0))
+            for window, (bucket, _) in self._buckets(now, feature).items()
+        ]
+        pace = min(1.0, (now % 86400) / 86400 + AI_PACE_SLACK)
+        for name, bucket, limit in checks:
+            if not limit:
+                continue
+            used = await self._used(db, bucket)
+            if used >= limit:
+                return f"{name} 額度已滿"
+            if feature in PRIORITY_FEATURES:
+                continue
+            if name == "minute" and limit - used <= AI_CHAT_RESERVE:
+                return "每分鐘額度保留給聊天"
+            if name.endswith("day") and used >= limit * pace:
+                return f"{name} 用量超前（預測節流）"
+        return None
+
+    async def acquire(self, feature="other"):
+        now = time.time()
+        feature = feature if feature in self.feature_limits else "other"
+        async with connect() as db:
+            # IMMEDIATE：先拿寫鎖，「讀 → 判斷 → 加一」之間不會被別的 cluster 插隊
+            await db.execute("BEGIN IMMEDIATE")
+            reason = await self._check(db, now, feature)
+            column = "throttled" if reason else "requests"
+            await db.execute(f'''
+                INSERT INTO ai_usage (day, feature, {column}) VALUES (?, ?, 1)
+                ON CONFLICT(day, feature) DO UPDATE SET {column} = {column} + 1
+            ''', (self._day(now), feature))
+            if not reason:
+                for bucket, expires in [*self._buckets(now).values(), *self._buckets(now, feature).values()]:
+                    await db.execute('''
+                        INSERT INTO ai_budget (bucket, used, expires) VALUES (?, 1, ?)
+                        ON CONFLICT(bucket) DO UPDATE SET used = used + 1
+                    ''', (bucket, expires))
+                await db.execute("DELETE FROM ai_budget WHERE expires < ?", (now - 86400,))
+            await db.commit()
+        if reason:
+            logger.warning(f"AI 額度：{feature} 本次略過（{reason}）")
+        return not reason
+
+    async def record(self, feature, prompt_tokens=0, output_tokens=0, rate_limited=False):
+        """呼叫完成後記 token 數（或撞到 429）"""
+        feature = feature if feature in self.feature_limits else "other"
+        async with connect() as db:
+            await db.execute('''
+                INSERT INTO ai_usage (day, feature, prompt_tokens, output_tokens, rate_limited) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(day, feature) DO UPDATE SET
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                output_tokens = output_tokens + excluded.output_tokens,
+                rate_limited = rate_limited + excluded.rate_limited
+            ''', (self._day(time.time()), feature, prompt_tokens or 0, output_tokens or 0, int(rate_limited)))
+            await db.commit()
+
+    async def remaining(self):
+        """{window: 剩餘次數 or None(不限)}"""
+        now = time.time()
+        result = {}
+        async with connect() as db:
+            for window, (bucket, _) in self._buckets(now).items():
+                limit = self.limits[window]
+                result[window] = max(0, limit - await self._used(db, bucket)) if limit else None
+        return result
+
+    async def report(self):
+        """今天各功能的用量 + 額度：[{feature, requests, prompt_tokens, output_tokens, throttled, rate_limited, minute, day}]"""
+        day = self._day(time.time())
+        async with connect() as db:
+            cursor = await db.execute(
+                "SELECT feature, requests, prompt_tokens, output_tokens, throttled, rate_limited FROM ai_usage WHERE day = ?", (day,)
+            )
+            usage = {row[0]: row[1:] for row in await cursor.fetchall()}
+        return [
+            dict(zip(("requests", "prompt_tokens", "output_tokens", "throttled", "rate_limited"), usage.get(f, (0, 0, 0, 0, 0))),
+                 feature=f, **self.feature_limits[f])
+            for f in FEATURES
+        ]
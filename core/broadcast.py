@@ -0,0 +1,66 @@
+# broadcast.py ─ 排程廣播預先生成：時間到之前 BROADCAST_LEAD_MINUTES 分鐘先叫 AI 寫好，整點直接發
+#
+# 會變的部分（當下誰在線上、誰沒回答）不交給 AI 寫死：請 AI 用 {名單} 代替，發送當下再填進去。
+# 時間到了還沒生成完，最多再等 BROADCAST_SEND_WAIT 秒，之後就改用保底文字，不會拖到下一分鐘。
+import os
+import time
+import asyncio
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_LEAD_MINUTES = float(os.getenv("BROADCAST_LEAD_MINUTES", "5"))
+BROADCAST_SEND_WAIT = float(os.getenv("BROADCAST_SEND_WAIT", "3"))
+
+PLACEHOLDER = "{名單}"
+PLACEHOLDER_HINT = f"不要寫任何人名，用 {PLACEHOLDER} 代表這些人（原樣保留這個標記）"
+
+
+def fill(text, names):
+    """把發送當下的名單填進預先寫好的文字；AI 沒照做就放在最前面"""
+    if not text:
+        return text
+    if PLACEHOLDER in text:
+        return text.replace(PLACEHOLDER, names)
+    return f"{names} {text}" if names else text
+
+
+class BroadcastPrep:
+    def __init__(self, lead=BROADCAST_LEAD_MINUTES, wait=BROADCAST_SEND_WAIT):
+        self.lead = timedelta(minutes=lead)
+        self.wait = wait
+        self._tasks = {}  # (key, guild_id, day) -> (建立時間, Task)
+
+    def due(self, now, hour, minute):
+        """now（當地時間）是否落在 hour:minute 之前的預備時段內"""
+        slot = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return timedelta(0) < slot - now <= self.lead
+
+    def prepare(self, key, guild_id, day, factory):
+        """背景開始生成（factory() 回傳 coroutine）；同一天同一場只會生成一次"""
+        k = (key, guild_id, day)
+        if k in self._tasks:
+            return
+        now = time.time()
+        for old, (created, task) in list(self._tasks.items()):
+            if now - created > 86400:
+                task.cancel()
+                self._tasks.pop(old, None)
+        self._tasks[k] = (now, asyncio.create_task(factory()))
+        logger.info(f"📝 預先生成 {key}（{guild_id}，{day}）")
+
+    async def take(self, key, guild_id, day, live=None):
+        """發送當下拿結果：有預先生成的最多等 wait 秒；沒有（例如剛重啟）就照舊現場生成 live()"""
+        entry = self._tasks.pop((key, guild_id, day), None)
+        if entry is None:
+            return await live() if live else None
+        _, task = entry
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.wait)
+        except asyncio.TimeoutError:
+            logger.warning(f"預先生成 {key}（{guild_id}）來不及，改用保底文字")
+            task.cancel()
+        except Exception as e:
+            logger.warning(f"預先生成 {key}（{guild_id}）失敗: {e}")
+        return None
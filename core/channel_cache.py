@@ -0,0 +1,74 @@
+# channel_cache.py ─ 每座伺服器的公告頻道解析快取
+import logging
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+_MISS = object()
+
+
+class ChannelCache:
+    """解析一次就記住結果（連「找不到」也記），頻道 / 身分組 / 權限有變動時才整座伺服器重算"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._resolved = {}  # guild_id -> TextChannel | None
+
+    def get(self, guild):
+        if not guild:
+            return None
+        channel = self._resolved.get(guild.id, _MISS)
+        if channel is _MISS:
+            channel = self._resolved[guild.id] = self.resolve(guild)
+        return channel
+
+    def resolve(self, guild):
+        me = guild.me
+        if me is None:
+            return None
+        cfg = self.bot.guild_config.get(guild.id)
+        channel = guild.get_channel(cfg.target_channel_id)
+        if channel and channel.permissions_for(me).send_messages:
+            return channel
+        # 備用搜尋
+        return discord.utils.find(
+            lambda c: any(t in c.name.lower() for t in ["chat", "general", "聊天", "公頻"])
+                     and c.permissions_for(me).send_messages,
+            guild.text_channels
+        ) or next((c for c in guild.text_channels if c.permissions_for(me).send_messages), None)
+
+    def invalidate(self, guild_id=None):
+        if guild_id is None:
+            self._resolved.clear()
+        else:
+            self._resolved.pop(guild_id, None)
+
+    # ==================== 事件失效 ====================
+    def attach(self):
+        for name in (
+            "on_guild_channel_create", "on_guild_channel_delete",
+            "on_guild_role_create", "on_guild_role_delete",
+            "on_guild_join", "on_guild_remove", "on_guild_available",
+        ):
+            self.bot.add_listener(self._on_single, name)
+        for name in ("on_guild_channel_update", "on_guild_role_update"):
+            self.bot.add_listener(self._on_pair, name)
+        self.bot.add_listener(self._on_member_update, "on_member_update")
+        # 重新連線後 guild / channel 物件會整批重建
+        self.bot.add_listener(self._on_ready, "on_ready")
+
+    async def _on_ready(self):
+        self.invalidate()
+
+    async def _on_single(self, obj):
+        # channel / role 帶 .guild，guild 本身就是 guild
+        self.invalidate(getattr(obj, "guild", obj).id)
+
+    async def _on_pair(self, before, after):
+        self.invalidate(after.guild.id)
+
+    async def _on_member_update(self, before, after):
+        # 只在 bot 自己的身分組變動時才重算（權限可能跟著變）
+        if self.bot.user and after.id == self.bot.user.id and before.roles != after.roles:
+            self.invalidate(after.guild.id)
@@ -0,0 +1,138 @@
+# chat_index.py ─ 聊天紀錄全文索引（FTS5），黑歷史查詢不用再 LIKE 全表
+#
+# unicode61 會把一整串中文當成一個 token，所以寫入前先把每個 CJK 字拆開，
+# 查詢時中文詞變成「逐字片語」("放 棄")，任何長度的中文詞都查得到。
+# 每列另外帶一個 who token（u<guild>x<user>），依人過濾也走索引。
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 一般聊天保留天數（黑歷史永久保留）
+CHAT_RETENTION_DAYS = int(os.getenv("CHAT_RETENTION_DAYS", "30"))
+
+SCHEMA = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS chat_fts USING fts5(body, who, content='', tokenize='unicode61');
+    CREATE INDEX IF NOT EXISTS idx_chat_logs_user_flagged ON chat_logs (guild_id, user_id, flagged);
+'''
+
+_CJK = re.compile(r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])")
+_MENTION = re.compile(r"<[@#][!&]?\d+>")
+_TERM = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+|[0-9a-z]+")
+
+
+def fts_tokens(text):
+    return _CJK.sub(r" \1 ", text.lower())
+
+
+def who_token(guild_id, user_id):
+    return f"u{guild_id}x{user_id}"
+
+
+def build_query(terms):
+    """任一關鍵字命中即可；中文詞轉逐字片語，英數詞原樣加引號"""
+    phrases = []
+    for term in terms:
+        for part in _TERM.findall(term.lower()):
+            phrases.append('"' + (" ".join(part) if _CJK.match(part) else part) + '"')
+    return " OR ".join(dict.fromkeys(phrases))
+
+
+def context_terms(text):
+    """整句話 → 中文兩字詞 + 英數詞（檢索用，mention 先拿掉）"""
+    terms = []
+    for part in _TERM.findall(_MENTION.sub(" ", text.lower())):
+        if _CJK.match(part):
+            terms.extend([a + b for a, b in zip(part, part[1:])] or [part])
+        elif len(part) > 1:
+            terms.append(part)
+    return terms
+
+
+async def setup(db):
+    cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE name = 'chat_fts'")
+    fresh = not await cursor.fetchone()
+    cursor = await db.execute("PRAGMA table_info(chat_logs)")
+    if "flagged" not in [row[1] for row in await cursor.fetchall()]:
+        await db.execute("ALTER TABLE chat_logs ADD COLUMN flagged INTEGER DEFAULT 0")
+    await db.executescript(SCHEMA)
+    if fresh:
+        # 舊版是原句照存一份、再用「[黑歷史]」前綴另存一份：原句標旗標、刪掉複本；
+        # 原句已經被清掉的複本才留下來（去掉前綴再標旗標）
+        copy_of = '''
+            o.content NOT LIKE '[黑歷史]%' AND c.content = '[黑歷史]' || o.content
+            AND o.guild_id IS c.guild_id AND o.user_id = c.user_id
+            AND o.id < c.id AND c.timestamp - o.timestamp < 60
+        '''
+        await db.execute(f'''
+            UPDATE chat_logs SET flagged = 1 WHERE id IN (
+                SELECT o.id FROM chat_logs c JOIN chat_logs o ON {copy_of} WHERE c.content LIKE '[黑歷史]%'
+            )
+        ''')
+        cursor = await db.execute(f'''
+            DELETE FROM chat_logs WHERE id IN (
+                SELECT c.id FROM chat_logs c JOIN chat_logs o ON {copy_of} AND o.flagged = 1 WHERE c.content LIKE '[黑歷史]%'
+            )
+        ''')
+        if cursor.rowcount:
+            logger.info(f"🔎 刪除 {cursor.rowcount} 筆重複的黑歷史複本")
+        await db.execute("UPDATE chat_logs SET flagged = 1, content = substr(content, 6) WHERE content LIKE '[黑歷史]%'")
+        cursor = await db.execute("SELECT id, guild_id, user_id, content FROM chat_logs")
+        rows = await cursor.fetchall()
+        await db.executemany(
+            "INSERT INTO chat_fts (rowid, body, who) VALUES (?, ?, ?)",
+            [(i, fts_tokens(c), who_token(g, u)) for i, g, u, c in rows]
+        )
+        if rows:
+            logger.info(f"🔎 聊天全文索引已回填 {len(rows)} 筆")
+
+
+async def add_message(db, guild_id, user_id, content, ts, flagged=False):
+    cursor = await db.execute(
+        "INSERT INTO chat_logs (guild_id, user_id, content, timestamp, flagged) VALUES (?, ?, ?, ?, ?)",
+        (guild_id, user_id, content, ts, int(flagged))
+    )
+    await db.execute(
+        "INSERT INTO chat_fts (rowid, body, who) VALUES (?, ?, ?)",
+        (cursor.lastrowid, fts_tokens(content), who_token(guild_id, user_id))
+    )
+    return cursor.lastrowid
+
+
+async def prune(db, before, batch=5000):
+    """刪掉過期的一般聊天（含索引），黑歷史不刪"""
+    cursor = await db.execute(
+        "SELECT id, guild_id, user_id, content FROM chat_logs WHERE timestamp < ? AND flagged = 0 LIMIT ?",
+        (before, batch)
+    )
+    rows = await cursor.fetchall()
+    if not rows:
+        return 0
+    # contentless 表刪除要帶回原本寫入的值
+    await db.executemany(
+        "INSERT INTO chat_fts (chat_fts, rowid, body, who) VALUES ('delete', ?, ?, ?)",
+        [(i, fts_tokens(c), who_token(g, u)) for i, g, u, c in rows]
+    )
+    await db.executemany("DELETE FROM chat_logs WHERE id = ?", [(r[0],) for r in rows])
+    return len(rows)
+
+
+async def search(db, guild_id, user_id, terms, limit=5):
+    """這個人命中關鍵字最「精華」的發言（bm25 排序）"""
+    query = build_query(terms)
+    if not query:
+        return []
+    cursor = await db.execute('''
+        SELECT c.content FROM chat_fts f JOIN chat_logs c ON c.id = f.rowid
+        WHERE chat_fts MATCH ? ORDER BY f.rank LIMIT ?
+    ''', (f'who:{who_token(guild_id, user_id)} AND body:({query})', limit))
+    return [r[0] for r in await cursor.fetchall()]
+
+
+async def flagged(db, guild_id, user_id, limit=5):
+    cursor = await db.execute(
+        "SELECT content FROM chat_logs WHERE guild_id = ? AND user_id = ? AND flagged = 1 ORDER BY id DESC LIMIT ?",
+        (guild_id, user_id, limit)
+    )
+    return [r[0] for r in await cursor.fetchall()]
@@ -0,0 +1,28 @@
+# database.py ─ 所有 cluster（process）共用同一個 SQLite 檔
+import logging
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "mamba_system.db"
+
+# 多個 process 同時寫入時最多排隊等幾秒
+BUSY_TIMEOUT = 30
+
+
+async def init_db(db_name=DB_NAME):
+    """WAL 模式寫在檔案裡，啟動設一次就好：讀寫互不阻塞，多個 cluster 才不會互卡"""
+    async with aiosqlite.connect(db_name, timeout=BUSY_TIMEOUT) as db:
+        cursor = await db.execute("PRAGMA journal_mode=WAL")
+        mode = (await cursor.fetchone())[0]
+    logger.info(f"🗄️ SQLite journal_mode={mode}")
+
+
+@asynccontextmanager
+async def connect(db_name=DB_NAME):
+    async with aiosqlite.connect(db_name, timeout=BUSY_TIMEOUT) as db:
+        await db.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}")
+        await db.execute("PRAGMA synchronous = NORMAL")
+        yield db
@@ -0,0 +1,14 @@
+# daysplit.py ─ 把一段時間依伺服器當地午夜切開（遊戲時長、語音時長的日 / 週分桶共用）
+from datetime import datetime, timedelta
+
+
+def split_days(start, end, tz):
+    """[start, end) 依 tz 的午夜切段，逐段回傳 (日期 "YYYY-MM-DD", ISO 週 "YYYY-Www", 秒數)"""
+    t = int(start)
+    end = int(end)
+    while t < end:
+        local = datetime.fromtimestamp(t, tz)
+        next_midnight = int((local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+        seg_end = min(end, next_midnight)
+        yield local.strftime("%Y-%m-%d"), local.strftime("%G-W%V"), seg_end - t
+        t = seg_end
@@ -0,0 +1,64 @@
+# digest.py ─ 每日聊天抽樣（加權水庫抽樣），23:50 日報直接讀，不用 ORDER BY RANDOM() 掃整天
+#
+# A-Res（Efraimidis–Spirakis）：每則訊息 key = random() ** (1 / 權重)，只留 key 最大的 k 則。
+# 越長的訊息、黑歷史權重越高。只有真的擠進水庫時才寫 SQLite，一天下來寫入次數約 k·ln(n/k)。
+import os
+import heapq
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SAMPLE_SIZE = int(os.getenv("DIGEST_SAMPLE_SIZE", "30"))
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS chat_sample (guild_id INTEGER, day DATE, key REAL, user_id INTEGER, content TEXT, PRIMARY KEY(guild_id, day, key));
+'''
+
+
+def weight(content, flagged=False):
+    w = 1 + min(len(content), 200) / 40
+    return w * 3 if flagged else w
+
+
+class DailyDigest:
+    def __init__(self, k=DIGEST_SAMPLE_SIZE):
+        self.k = k
+        self._pools = {}  # guild_id -> (day, [(key, user_id, content)] 最小堆)
+
+    async def setup(self, db):
+        await db.executescript(SCHEMA)
+        # 重啟後接著抽（同一座伺服器只留最新那天）
+        cursor = await db.execute("SELECT guild_id, day, key, user_id, content FROM chat_sample ORDER BY guild_id, day")
+        for guild_id, day, key, user_id, content in await cursor.fetchall():
+            current = self._pools.get(guild_id)
+            if current is None or current[0] != day:
+                current = self._pools[guild_id] = (day, [])
+            heapq.heappush(current[1], (key, user_id, content))
+
+    async def add(self, db, guild_id, day, user_id, content, flagged=False):
+        """訊息進來時呼叫（db 由呼叫端提交）；換日時舊的一天整個捨棄"""
+        current = self._pools.get(guild_id)
+        if current is None or current[0] != day:
+            current = self._pools[guild_id] = (day, [])
+            await db.execute("DELETE FROM chat_sample WHERE guild_id = ? AND day != ?", (guild_id, day))
+        pool = current[1]
+        key = random.random() ** (1 / weight(content, flagged))
+        if len(pool) < self.k:
+            heapq.heappush(pool, (key, user_id, content))
+        elif key > pool[0][0]:
+            evicted = heapq.heapreplace(pool, (key, user_id, content))
+            await db.execute("DELETE FROM chat_sample WHERE guild_id = ? AND day = ? AND key = ?", (guild_id, day, evicted[0]))
+        else:
+            return
+        await db.execute(
+            "INSERT OR REPLACE INTO chat_sample (guild_id, day, key, user_id, content) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, day, key, user_id, content)
+        )
+
+    def sample(self, guild_id, day):
+        """[(user_id, content)...]，依權重 key 由高到低"""
+        current = self._pools.get(guild_id)
+        if current is None or current[0] != day:
+            return []
+        return [(u, c) for _, u, c in sorted(current[1], reverse=True)]
@@ -0,0 +1,33 @@
+# fanout.py ─ 多目標背景工作同時跑：限制同時數量、每項有逾時、一項出錯不影響其他項
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+FANOUT_LIMIT = int(os.getenv("FANOUT_LIMIT", "8"))
+FANOUT_TIMEOUT = float(os.getenv("FANOUT_TIMEOUT", "30"))
+
+
+async def fan_out(items, worker, limit=FANOUT_LIMIT, timeout=FANOUT_TIMEOUT, label=None):
+    """對每個 item 跑 worker(item)，回傳結果清單（順序同 items，失敗 / 逾時的位置是 None）
+
+    總耗時約等於最慢的那一項（在 limit 之內），而不是全部加總。
+    """
+    items = list(items)
+    if not items:
+        return []
+    sem = asyncio.Semaphore(limit)
+    label = label or getattr(worker, "__name__", "fan_out")
+
+    async def run(item):
+        async with sem:
+            try:
+                return await asyncio.wait_for(worker(item), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"{label} 逾時（{timeout:.0f}s）: {item!r:.80}")
+            except Exception as e:
+                logger.error(f"{label} 失敗: {item!r:.80}: {e}")
+            return None
+
+    return await asyncio.gather(*(run(item) for item in items))
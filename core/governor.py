@@ -0,0 +1,114 @@
+# governor.py ─ 負載調節：看 event loop 延遲、進行中的 AI 請求、剩餘額度、出站佇列，自動降級
+#
+# 等級 0 正常 → 3 危急。可有可無的功能（隨機點評、細節糾察、隨機表情…）的機率乘上 CHANCE，
+# 冷卻時間乘上 COOLDOWN；被 @ 的直接回覆不受影響。
+import os
+import time
+import random
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+LEVEL_NAMES = ("正常", "忙碌", "降級", "危急")
+CHANCE = (1.0, 0.5, 0.2, 0.0)
+COOLDOWN = (1, 2, 4, 8)
+
+# 各指標進入等級 1 / 2 / 3 的門檻
+LAG_LEVELS = (0.1, 0.5, 2.0)          # 秒
+INFLIGHT_LEVELS = (4, 8, 16)          # 同時進行中的 AI 請求
+QUOTA_LEVELS = (0.3, 0.1, 0.03)       # 剩餘額度比例（低於）
+OUTBOX_LEVELS = (20, 60, 150)         # 出站佇列總長度
+
+GOVERNOR_INTERVAL = float(os.getenv("GOVERNOR_INTERVAL", "1.0"))
+
+
+def _level(value, thresholds, lower_is_worse=False):
+    level = 0
+    for i, t in enumerate(thresholds, 1):
+        if (value <= t) if lower_is_worse else (value >= t):
+            level = i
+    return level
+
+
+class LoadGovernor:
+    def __init__(self, bot, interval=GOVERNOR_INTERVAL):
+        self.bot = bot
+        self.interval = interval
+        self.level = 0
+        self.lag = 0.0           # event loop 延遲（EWMA，秒）
+        self.ai_inflight = 0
+        self.quota_ratio = 1.0   # 每分鐘 / 每日額度裡剩比較少的那個比例
+        self.reasons = {}
+        self._task = None
+        self._last_quota_check = 0.0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    # ---------- 給功能用 ----------
+    def chance(self, p):
+        """可有可無的功能：依目前等級縮小觸發機率"""
+        return random.random() < p * CHANCE[self.level]
+
+    def cooldown(self, seconds):
+        return seconds * COOLDOWN[self.level]
+
+    @property
+    def name(self):
+        return LEVEL_NAMES[self.level]
+
+    def ai_started(self):
+        self.ai_inflight += 1
+
+    def ai_finished(self):
+        self.ai_inflight = max(0, self.ai_inflight - 1)
+
+    # ---------- 量測 ----------
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.lag = self.lag * 0.7 + lag * 0.3
+            try:
+                await self._refresh_quota()
+            except Exception as e:
+                logger.warning(f"負載調節讀取額度失敗: {e}")
+            self._update()
+
+    async def _refresh_quota(self):
+        budget = getattr(self.bot, "ai_budget", None)
+        if not budget or time.monotonic() - self._last_quota_check < 10:
+            return
+        self._last_quota_check = time.monotonic()
+        remaining = await budget.remaining()
+        ratios = [left / budget.limits[window] for window, left in remaining.items() if left is not None]
+        self.quota_ratio = min(ratios, default=1.0)
+
+    def _update(self):
+        outbox = getattr(self.bot, "outbox", None)
+        self.reasons = {
+            "lag": _level(self.lag, LAG_LEVELS),
+            "ai": _level(self.ai_inflight, INFLIGHT_LEVELS),
+            "quota": _level(self.quota_ratio, QUOTA_LEVELS, lower_is_worse=True),
+            "outbox": _level(outbox.depth(), OUTBOX_LEVELS) if outbox else 0,
+        }
+        level = max(self.reasons.values())
+        if level != self.level:
+            logger.warning(
+                f"⚖️ 負載等級 {LEVEL_NAMES[self.level]} → {LEVEL_NAMES[level]}"
+                f"（延遲 {self.lag * 1000:.0f}ms、AI 進行中 {self.ai_inflight}、額度剩 {self.quota_ratio:.0%}）"
+            )
+            self.level = level
+
+    def snapshot(self):
+        return {
+            "level": self.level, "name": self.name, "lag_ms": round(self.lag * 1000),
+            "ai_inflight": self.ai_inflight, "quota_ratio": round(self.quota_ratio, 3), "reasons": dict(self.reasons),
+        }
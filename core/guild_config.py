@@ -0,0 +1,105 @@
+# guild_config.py ─ 每座伺服器自己的設定（頻道 / 時區 / 功能開關）
+import os
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+from core.database import DB_NAME, connect
+
+logger = logging.getLogger(__name__)
+
+# 舊版寫死的頻道，沒設定過的伺服器仍會先找它（別的伺服器找不到就走備用搜尋）
+DEFAULT_CHANNEL_ID = int(os.getenv("TARGET_CHANNEL_ID", "1385233731073343498"))
+DEFAULT_TZ_OFFSET = float(os.getenv("DEFAULT_TZ_OFFSET", "8"))
+
+# 可開關的功能（key → 說明），預設全開
+FEATURES = {
+    "4am": "04:00 凌晨點名",
+    "morning": "08:00 起床氣處刑",
+    "question": "09:00 每日意志測驗",
+    "daily_report": "23:50 曼巴日報",
+    "summary": "00:00 深夜戰報",
+    "weekly": "週日 20:00 週報",
+    "mood_radar": "情緒雷達",
+    "game_watch": "遊戲監控",
+    "spotify": "Spotify 審判",
+}
+
+
+class GuildConfig:
+    __slots__ = ("guild_id", "channel_id", "tz_offset", "features")
+
+    def __init__(self, guild_id, channel_id=None, tz_offset=DEFAULT_TZ_OFFSET, features=None):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.tz_offset = tz_offset
+        self.features = features or {}
+
+    @property
+    def tz(self):
+        return timezone(timedelta(hours=self.tz_offset))
+
+    @property
+    def target_channel_id(self):
+        return self.channel_id or DEFAULT_CHANNEL_ID
+
+    def now(self):
+        return datetime.now(self.tz)
+
+    def today(self):
+        return self.now().strftime("%Y-%m-%d")
+
+    def enabled(self, feature):
+        return self.features.get(feature, True)
+
+
+class GuildConfigStore:
+    """所有伺服器設定都放記憶體，改動時才寫回 SQLite"""
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self._configs = {}
+
+    async def load(self):
+        async with connect(self.db_name) as db:
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS guild_config (
+                    guild_id INTEGER PRIMARY KEY, channel_id INTEGER,
+                    tz_offset REAL DEFAULT 8, features TEXT DEFAULT '{}'
+                )
+            ''')
+            await db.commit()
+            cursor = await db.execute("SELECT guild_id, channel_id, tz_offset, features FROM guild_config")
+            rows = await cursor.fetchall()
+
+        for guild_id, channel_id, tz_offset, features in rows:
+            try:
+                features = json.loads(features or "{}")
+            except ValueError:
+                features = {}
+            self._configs[guild_id] = GuildConfig(guild_id, channel_id, tz_offset, features)
+        logger.info(f"⚙️ 已載入 {len(rows)} 座伺服器設定")
+
+    def get(self, guild_id):
+        cfg = self._configs.get(guild_id)
+        if cfg is None:
+            cfg = self._configs[guild_id] = GuildConfig(guild_id)
+        return cfg
+
+    async def update(self, guild_id, channel_id=..., tz_offset=..., feature=None, enabled=True):
+        cfg = self.get(guild_id)
+        if channel_id is not ...:
+            cfg.channel_id = channel_id
+        if tz_offset is not ...:
+            cfg.tz_offset = tz_offset
+        if feature:
+            cfg.features[feature] = enabled
+
+        async with connect(self.db_name) as db:
+            await db.execute('''
+                INSERT INTO guild_config (guild_id, channel_id, tz_offset, features) VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id) DO UPDATE SET
+                channel_id = excluded.channel_id, tz_offset = excluded.tz_offset, features = excluded.features
+            ''', (guild_id, cfg.channel_id, cfg.tz_offset, json.dumps(cfg.features)))
+            await db.commit()
+        return cfg
@@ -0,0 +1,82 @@
+# leaderboard.py ─ 常駐記憶體的排行榜（每座伺服器 × 每個指標一份）
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RankedIndex:
+    """分數 dict + 依 (-分數, user_id) 排好的 list；加減分用 bisect 維持順序，取前 k 名是 O(k)"""
+
+    def __init__(self):
+        self._scores = {}
+        self._order = []
+
+    def __len__(self):
+        return len(self._scores)
+
+    def get(self, user_id):
+        return self._scores.get(user_id, 0)
+
+    def set(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old is not None:
+            del self._order[bisect.bisect_left(self._order, (-old, user_id))]
+        self._scores[user_id] = score
+        bisect.insort(self._order, (-score, user_id))
+
+    def add(self, user_id, delta):
+        score = self.get(user_id) + delta
+        self.set(user_id, score)
+        return score
+
+    def top(self, k):
+        return [(uid, -neg) for neg, uid in self._order[:k]]
+
+    def rank(self, user_id):
+        """1 起算；不在榜上回傳 None"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self._order, (-score, user_id)) + 1
+
+    def clear(self):
+        self._scores.clear()
+        self._order.clear()
+
+
+class Leaderboards:
+    # 指標 → 來源表 / 欄位（啟動時從 SQLite 重建）
+    SOURCES = {
+        "honor": ("honor", "points"),
+        "lazy": ("daily_stats", "lazy_points"),
+        "nonsense": ("nonsense_stats", "count"),
+    }
+
+    def __init__(self):
+        self._boards = {}  # (guild_id, metric) -> RankedIndex
+
+    def board(self, guild_id, metric):
+        board = self._boards.get((guild_id, metric))
+        if board is None:
+            board = self._boards[(guild_id, metric)] = RankedIndex()
+        return board
+
+    def add(self, guild_id, metric, user_id, delta):
+        return self.board(guild_id, metric).add(user_id, delta)
+
+    def top(self, guild_id, metric, k=10):
+        return self.board(guild_id, metric).top(k)
+
+    def clear(self, guild_id, metric):
+        self.board(guild_id, metric).clear()
+
+    async def load(self, db):
+        self._boards.clear()
+        total = 0
+        for metric, (table, column) in self.SOURCES.items():
+            cursor = await db.execute(f"SELECT guild_id, user_id, {column} FROM {table} WHERE {column} != 0")
+            for guild_id, user_id, score in await cursor.fetchall():
+                self.board(guild_id, metric).set(user_id, score)
+                total += 1
+        logger.info(f"🏆 排行榜重建完成（{total} 筆）")
@@ -0,0 +1,145 @@
+# logs.py ─ 非阻塞日誌：所有 logger → 佇列 → 背景執行緒寫 stdout，同一行程式碼的警告 / 錯誤洗版時自動限流
+#
+# 只有入口（main.py / cluster.py）呼叫 setup_logging()，其他模組照舊 logging.getLogger(__name__)。
+# 事件迴圈 / Flask 執行緒只做「放進佇列」，真正的 I/O 在背景；佇列滿了寧可丟掉也不卡住。
+# 結構化欄位用 extra 帶：logger.warning("...", extra={"guild": gid, "user": uid, "feature": "chat", "latency_ms": 120})
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text / json
+# WARNING / ERROR：同一個呼叫點每 LOG_RATE_WINDOW 秒最多 LOG_RATE_BURST 筆，多的只計數（INFO 以下和 CRITICAL 不限）
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "60"))
+LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+FIELDS = ("guild", "user", "feature", "latency_ms", "suppressed", "dropped")
+
+logger = logging.getLogger(__name__)
+
+_listener = None
+
+
+class RateLimitFilter(logging.Filter):
+    """依呼叫點（檔案 + 行號）限流警告 / 錯誤：訊息多半是 f-string，用內容當 key 擋不住同一個錯誤洗版。
+    一般 INFO（例如啟動時逐一載入模組）一律放行。"""
+
+    def __init__(self, window=LOG_RATE_WINDOW, burst=LOG_RATE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._sites = {}  # (pathname, lineno) -> [視窗開始, 已放行, 已略過]
+
+    def filter(self, record):
+        if not logging.WARNING <= record.levelno < logging.CRITICAL or self.burst <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """佇列滿了直接丟（記下丟了幾筆，附在下一筆成功送出的紀錄上），絕不阻塞呼叫端"""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 訊息在呼叫端先合成字串（args 之後可能被改掉）；例外堆疊留給背景執行緒格式化
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            record.dropped = self.dropped
+        try:
+            self.queue.put_nowait(record)
+            self.dropped = 0
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = " ".join(f"{k}={getattr(record, k)}" for k in FIELDS if getattr(record, k, None) is not None)
+        return f"{line} [{fields}]" if fields else line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 3), "level": record.levelname,
+            "logger": record.name, "msg": record.getMessage(),
+        }
+        for k in FIELDS:
+            if getattr(record, k, None) is not None:
+                data[k] = getattr(record, k)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """把 root logger 接到佇列 + 背景寫入執行緒（重複呼叫無作用）"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def log_task_failure(task):
+    """背景 Task 的 done callback：結束時把例外印出來（不然只會在被回收時安靜地消失）"""
+    if not task.cancelled() and task.exception():
+        logger.error(f"背景工作 {task.get_coro().__name__} 失敗: {task.exception()!r}", exc_info=task.exception())
+
+
+def stop_logging():
+    """把佇列裡剩下的寫完再結束"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,141 @@
+# memory.py ─ 對話記憶：每座伺服器的每個人各一份，有 token 上限，舊對話壓成摘要，冷門用戶移出記憶體（SQLite 永久保存）
+#
+# 以 (guild_id, user_id) 為 key：分片時每座伺服器只屬於一個 cluster，不同 cluster 不會寫到同一列。
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from core.database import DB_NAME, connect
+from core.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "600"))   # 每人送進 prompt 的上限（摘要 + 近期對話）
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "200"))
+MEMORY_MAX_USERS = int(os.getenv("MEMORY_MAX_USERS", "500"))      # 常駐記憶體的人數
+
+
+class ConversationMemory:
+    def __init__(self, summarizer=None, db_name=DB_NAME, max_tokens=MEMORY_MAX_TOKENS,
+                 summary_tokens=MEMORY_SUMMARY_TOKENS, max_users=MEMORY_MAX_USERS):
+        """summarizer: async (舊摘要, 要壓縮的對話文字) -> 新摘要 or None"""
+        self.db_name = db_name
+        self.summarizer = summarizer
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.max_users = max_users
+        self._users = OrderedDict()  # (guild_id, user_id) -> {"summary": str, "turns": [[role, text], ...]}
+        self._compressing = set()
+
+    async def setup(self, legacy_guild_id=0):
+        """建表；舊版（只有 user_id）的記憶搬到 legacy_guild_id 底下"""
+        async with connect(self.db_name) as db:
+            cursor = await db.execute("PRAGMA table_info(conversation_memory)")
+            columns = [row[1] for row in await cursor.fetchall()]
+            legacy = columns and "guild_id" not in columns
+            if legacy:
+                await db.execute("ALTER TABLE conversation_memory RENAME TO conversation_memory_legacy")
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_memory (
+                    guild_id INTEGER, user_id INTEGER, summary TEXT, turns TEXT, updated REAL,
+                    PRIMARY KEY(guild_id, user_id)
+                )
+            ''')
+            if legacy:
+                await db.execute(
+                    "INSERT OR IGNORE INTO conversation_memory (guild_id, user_id, summary, turns, updated) "
+                    "SELECT ?, user_id, summary, turns, updated FROM conversation_memory_legacy", (legacy_guild_id,)
+                )
+                await db.execute("DROP TABLE conversation_memory_legacy")
+                logger.info("🔧 對話記憶搬遷到多伺服器格式")
+            await db.commit()
+
+    async def _get(self, key):
+        state = self._users.get(key)
+        if state is not None:
+            self._users.move_to_end(key)
+            return state
+        async with connect(self.db_name) as db:
+            cursor = await db.execute("SELECT summary, turns FROM conversation_memory WHERE guild_id = ? AND user_id = ?", key)
+            row = await cursor.fetchone()
+        # 讀檔期間別人可能已經載入（並改過）同一份，以記憶體裡那份為準
+        if key in self._users:
+            return await self._get(key)
+        state = {"summary": row[0] or "", "turns": json.loads(row[1] or "[]")} if row else {"summary": "", "turns": []}
+        self._users[key] = state
+        # 超過常駐上限就把最久沒講話的人踢出記憶體（資料已寫回 SQLite）
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return state
+
+    async def _save(self, key, state):
+        async with connect(self.db_name) as db:
+            await db.execute('''
+                INSERT INTO conversation_memory (guild_id, user_id, summary, turns, updated) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET summary = excluded.summary, turns = excluded.turns, updated = excluded.updated
+            ''', (*key, state["summary"], json.dumps(state["turns"], ensure_ascii=False), time.time()))
+            await db.commit()
+
+    def _tokens(self, state):
+        return estimate_tokens(state["summary"]) + sum(estimate_tokens(t) for _, t in state["turns"])
+
+    async def history(self, guild_id, user_id):
+        """給 ask_brain 的 history（摘要放最前面當前情提要）"""
+        state = await self._get((guild_id or 0, user_id))
+        contents = []
+        if state["summary"]:
+            contents.append({"role": "user", "parts": [f"（前情提要）{state['summary']}"]})
+            contents.append({"role": "model", "parts": ["收到。"]})
+        contents.extend({"role": role, "parts": [text]} for role, text in state["turns"])
+        return contents
+
+    async def append(self, guild_id, user_id, user_text, reply):
+        key = (guild_id or 0, user_id)  # 私訊沒有伺服器，記在 0 底下
+        state = await self._get(key)
+        state["turns"].extend([["user", user_text], ["model", reply]])
+        await self._save(key, state)
+        if self._tokens(state) > self.max_tokens and key not in self._compressing:
+            self._compressing.add(key)
+            asyncio.create_task(self._compress(key, state))
+
+    async def _compress(self, key, state):
+        """保留最近一半預算的對話，其餘併進摘要；AI 摘要失敗就退回截斷"""
+        try:
+            keep_budget = self.max_tokens // 2
+            kept, used = [], 0
+            for turn in reversed(state["turns"]):
+                used += estimate_tokens(turn[1])
+                if used > keep_budget and len(kept) >= 2:
+                    break
+                kept.append(turn)
+            kept.reverse()
+            old = state["turns"][:len(state["turns"]) - len(kept)]
+            if not old:
+                return
+
+            old_text = "\n".join(f"{'用戶' if r == 'user' else 'Kobe'}：{t}" for r, t in old)
+            summary = None
+            if self.summarizer:
+                summary = await self.summarizer(state["summary"], old_text)
+            if not summary:
+                # 沒有 AI 摘要：直接接上去，超過預算就從最舊的行開始丟
+                lines = f"{state['summary']}\n{old_text}".strip().split("\n")
+                while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+                    lines.pop(0)
+                summary = "\n".join(lines)
+            # 等摘要期間這份記憶可能被踢出記憶體又重新載入（還多了新對話）：
+            # 改套用到目前那份，開頭已經不是這段舊對話就放棄，下次 append 再壓
+            current = await self._get(key)
+            if current["turns"][:len(old)] != old:
+                return
+            current["summary"] = truncate_to_tokens(summary, self.summary_tokens)
+            # 壓縮期間可能又多了新對話，只移掉已經併進摘要的那段
+            del current["turns"][:len(old)]
+            await self._save(key, current)
+        except Exception as e:
+            logger.error(f"對話記憶壓縮失敗 ({key}): {e}")
+        finally:
+            self._compressing.discard(key)
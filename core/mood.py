@@ -0,0 +1,91 @@
+# mood.py ─ 情緒分類（歌曲 / 聊天）
+import os
+import time
+from collections import Counter, deque
+
+MOOD_MAP = {
+    "sad": ["哭", "雨", "分手", "夜", "slow", "ballad", "lonely"],
+    "angry": ["fuck", "shit", "rage", "恨", "幹"],
+    "chill": ["lofi", "chill", "relax", "study"],
+    "hype": ["gym", "workout", "rap", "rock", "pump"]
+}
+
+MOODS = list(MOOD_MAP) + ["neutral"]
+
+
+def classify_track(title, artist):
+    title_art = f"{title or ''} {artist or ''}".lower()
+    for mood, keywords in MOOD_MAP.items():
+        if any(k in title_art for k in keywords):
+            return mood
+    return "neutral"
+
+
+# ==================== 聊天情緒（情緒雷達用，本機詞庫） ====================
+CHAT_LEXICON = {
+    "低落": ["累", "想睡", "難過", "哭", "傷心", "崩潰", "放棄", "失眠", "不想", "唉", "憂鬱", "沒力", "廢了", "好煩", "sad", "tired", "😭", "😢"],
+    "嗨": ["哈哈", "笑死", "嗨", "爽", "衝", "太強", "猛", "耶", "lol", "lmao", "🔥", "🤣", "!!!"],
+    "憤怒": ["幹", "靠", "垃圾", "廢物", "氣死", "火大", "白癡", "智障", "wtf", "fuck", "shit", "😡"],
+    "開心": ["開心", "高興", "幸福", "謝謝", "好棒", "喜歡", "感動", "nice", "😊", "❤️"],
+}
+
+# 訊息裡帶情緒詞的比例低於這個 → 當作「正常」，不用問 AI
+MOOD_NEUTRAL_BELOW = float(os.getenv("MOOD_NEUTRAL_BELOW", "0.15"))
+# 某種情緒佔全部情緒訊息的比例高於這個 → 本機就能確定
+MOOD_CONFIDENT_SHARE = float(os.getenv("MOOD_CONFIDENT_SHARE", "0.7"))
+
+
+def score_message(text):
+    """這句話命中哪些情緒（每種最多算一次）"""
+    lower = text.lower()
+    return tuple(mood for mood, words in CHAT_LEXICON.items() if any(w in lower for w in words))
+
+
+class MoodWindow:
+    """一座伺服器最近 window 秒的聊天情緒，訊息進來就累加、過期就扣掉，不用回頭讀資料庫"""
+
+    def __init__(self, window=3600, keep=25):
+        self.window = window
+        self._events = deque()            # (ts, 命中的情緒)
+        self._texts = deque(maxlen=keep)  # (ts, 原文)，需要問 AI 時才用
+        self.counts = Counter()
+        self.added = 0    # 累計進來幾則（判斷上次檢查後有沒有新訊息）
+        self.checked = 0
+
+    def add(self, text, ts=None):
+        ts = ts or time.time()
+        moods = score_message(text)
+        self._events.append((ts, moods))
+        self._texts.append((ts, text))
+        self.counts.update(moods)
+        self.added += 1
+
+    def expire(self, now=None):
+        limit = (now or time.time()) - self.window
+        while self._events and self._events[0][0] < limit:
+            _, moods = self._events.popleft()
+            self.counts.subtract(moods)
+        while self._texts and self._texts[0][0] < limit:
+            self._texts.popleft()
+
+    def __len__(self):
+        return len(self._events)
+
+    def texts(self):
+        return [t for _, t in self._texts]
+
+    def assess(self, now=None, min_messages=8):
+        """(本機判斷的情緒 or None, 要不要問 AI)
+
+        訊息太少 / 幾乎沒有情緒詞 → 正常，不問；某種情緒一面倒 → 本機就有答案，仍交給 AI 確認（極端）；
+        有情緒但很雜 → 不確定，問 AI。
+        """
+        self.expire(now)
+        n = len(self._events)
+        if n < min_messages:
+            return None, False
+        hits = sum(c for c in self.counts.values() if c > 0)
+        if hits / n < MOOD_NEUTRAL_BELOW:
+            return "正常", False
+        mood, top = max(self.counts.items(), key=lambda kv: kv[1])
+        return (mood if top / hits >= MOOD_CONFIDENT_SHARE else None), True
@@ -0,0 +1,134 @@
+# online_index.py ─ 線上狀態索引：guild_id -> {user_id: 狀態}（只記不是 offline 的真人），靠 presence 事件維護
+#
+# 「誰醒著」「誰在線上」直接查這張表，不用每次把整座伺服器的 guild.members 掃一遍。
+# 需要完整名單（08:00 誰還在睡、09:00 每日一問）時才用 roster()：沒 chunk 過的伺服器這時才 chunk。
+import os
+import asyncio
+import logging
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# 成員 chunk 策略：
+#   startup = 登入時全部 chunk（discord.py 預設）
+#   small   = 人數 <= CHUNK_MAX_MEMBERS 的伺服器一上線就 chunk，大的上線後在背景一座一座 chunk
+#   lazy    = 全部要用到（roster / warm）才 chunk
+# 注意：discord.py 會丟掉「沒在快取裡的成員」的 presence 更新。大伺服器登入時只帶在線成員，
+# 所以 small 在背景 chunk 完之前、lazy 在 chunk 之前，登入後才上線的人不會進線上索引，
+# 遊戲 / Spotify / 04:00 點名也看不到他們。要完整追蹤就用 startup。
+CHUNK_GUILDS = os.getenv("CHUNK_GUILDS", "startup")
+CHUNK_MAX_MEMBERS = int(os.getenv("CHUNK_MAX_MEMBERS", "1000"))
+
+OFFLINE = str(discord.Status.offline)
+
+
+class OnlineIndex:
+    def __init__(self, bot, chunk_mode=CHUNK_GUILDS, chunk_max=CHUNK_MAX_MEMBERS):
+        self.bot = bot
+        self.chunk_mode = chunk_mode
+        self.chunk_max = chunk_max
+        self._status = {}   # guild_id -> {user_id: status}
+        self._chunking = {}  # guild_id -> Task
+        self._backlog = asyncio.Queue()  # small 模式：等著背景 chunk 的大伺服器
+        self._backlog_task = None
+
+    # ---------- 查詢 ----------
+    def status(self, guild_id, user_id):
+        return self._status.get(guild_id, {}).get(user_id, OFFLINE)
+
+    def members(self, guild, status="online"):
+        """目前狀態是 status 的成員（status=None：所有不是 offline 的）"""
+        statuses = self._status.get(guild.id, {})
+        result = []
+        for user_id, s in statuses.items():
+            if status is None or s == status:
+                member = guild.get_member(user_id)
+                if member:
+                    result.append(member)
+        return result
+
+    def count(self, guild_id):
+        return len(self._status.get(guild_id, {}))
+
+    async def roster(self, guild):
+        """完整的真人成員名單（必要時先 chunk）"""
+        if not guild.chunked:
+            task = self.warm(guild)
+            if task:
+                try:
+                    await task
+                except Exception as e:
+                    logger.warning(f"[{guild.id}] 成員 chunk 失敗，用目前快取: {e}")
+        return [m for m in guild.members if not m.bot]
+
+    def warm(self, guild):
+        """背景 chunk 這座伺服器（已經 chunk 過或正在 chunk 就不重複）"""
+        if guild.chunked:
+            return None
+        task = self._chunking.get(guild.id)
+        if task is None or task.done():
+            task = self._chunking[guild.id] = asyncio.create_task(self._chunk(guild))
+        return task
+
+    async def _chunk(self, guild):
+        await guild.chunk(cache=True)
+        self.seed(guild)
+        logger.info(f"👥 [{guild.id}] 成員 chunk 完成：{len(guild.members)} 人，{self.count(guild.id)} 人在線")
+
+    def seed(self, guild):
+        self._status[guild.id] = {
+            m.id: str(m.status) for m in guild.members if not m.bot and str(m.status) != OFFLINE
+        }
+
+    # ---------- 事件維護 ----------
+    def attach(self):
+        self.bot.add_listener(self._on_presence_update, "on_presence_update")
+        self.bot.add_listener(self._on_guild_available, "on_guild_available")
+        self.bot.add_listener(self._on_guild_available, "on_guild_join")
+        self.bot.add_listener(self._on_guild_remove, "on_guild_remove")
+        self.bot.add_listener(self._on_member_remove, "on_member_remove")
+
+    async def _on_presence_update(self, before, after):
+        if after.bot:
+            return
+        statuses = self._status.setdefault(after.guild.id, {})
+        status = str(after.status)
+        if status == OFFLINE:
+            statuses.pop(after.id, None)
+        else:
+            statuses[after.id] = status
+
+    async def _on_guild_available(self, guild):
+        self.seed(guild)
+        if self.chunk_mode != "small" or guild.chunked:
+            return
+        if (guild.member_count or 0) <= self.chunk_max:
+            self.warm(guild)
+        else:
+            self._backlog.put_nowait(guild)
+            if self._backlog_task is None or self._backlog_task.done():
+                self._backlog_task = asyncio.create_task(self._drain_backlog())
+
+    async def _drain_backlog(self):
+        """大伺服器等上線完成後一座一座 chunk（不跟登入搶 gateway），補上漏掉的 presence"""
+        await self.bot.wait_until_ready()
+        while not self._backlog.empty():
+            guild = self._backlog.get_nowait()
+            if self.bot.get_guild(guild.id) is None:
+                continue
+            task = self.warm(guild)
+            if task:
+                try:
+                    await task
+                except Exception as e:
+                    logger.warning(f"[{guild.id}] 背景成員 chunk 失敗: {e}")
+
+    async def _on_guild_remove(self, guild):
+        self._status.pop(guild.id, None)
+        task = self._chunking.pop(guild.id, None)
+        if task:
+            task.cancel()
+
+    async def _on_member_remove(self, member):
+        self._status.get(member.guild.id, {}).pop(member.id, None)
@@ -0,0 +1,133 @@
+# outbox.py ─ 出站佇列：每個頻道一條，依優先度送出（回覆 > 處刑 > 表情），塞爆時先丟表情
+#
+# discord.py 碰到 rate limit 會自己等，但等的時候後面排的東西不分輕重一起卡住。
+# 這裡每個頻道一個 worker 依序送：重要回覆先走，表情最後，同一頻道排隊中的處刑合併成一則。
+import os
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+REPLY, ROAST, REACTION = 0, 1, 2
+PRIORITY_NAMES = ("reply", "roast", "reaction")
+
+OUTBOX_MAX_DEPTH = int(os.getenv("OUTBOX_MAX_DEPTH", "20"))   # 每個頻道最多排幾個
+COALESCE_LIMIT = 1900                                          # 合併後單則訊息字數上限（Discord 2000）
+
+
+class _Item:
+    __slots__ = ("priority", "kind", "target", "content", "kwargs", "future")
+
+    def __init__(self, priority, kind, target, content, kwargs):
+        self.priority = priority
+        self.kind = kind          # "send" / "reply" / "react"
+        self.target = target      # channel 或 message
+        self.content = content
+        self.kwargs = kwargs
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class Outbox:
+    def __init__(self, max_depth=OUTBOX_MAX_DEPTH):
+        self.max_depth = max_depth
+        self._queues = {}   # channel_id -> [deque(reply), deque(roast), deque(reaction)]
+        self._workers = {}  # channel_id -> Task
+        self.stats = {"queued": 0, "sent": 0, "dropped": 0, "coalesced": 0, "failed": 0}
+
+    # ---------- 對外 API（都回傳 Future：送出後是 Message / None，被丟掉是 None） ----------
+    def reply(self, message, content=None, **kwargs):
+        return self._put(message.channel.id, _Item(REPLY, "reply", message, content, kwargs))
+
+    def send(self, channel, content=None, priority=REPLY, **kwargs):
+        return self._put(channel.id, _Item(priority, "send", channel, content, kwargs))
+
+    def roast(self, channel, content):
+        """純文字處刑；同一頻道還在排隊的會合併成一則"""
+        return self._put(channel.id, _Item(ROAST, "send", channel, content, {}))
+
+    def react(self, message, emoji):
+        return self._put(message.channel.id, _Item(REACTION, "react", message, emoji, {}))
+
+    def depth(self):
+        return sum(len(q) for queues in self._queues.values() for q in queues)
+
+    def metrics(self):
+        by_priority = [0, 0, 0]
+        for queues in self._queues.values():
+            for p, q in enumerate(queues):
+                by_priority[p] += len(q)
+        return {
+            **self.stats,
+            "depth": sum(by_priority),
+            "channels": len(self._queues),
+            **{f"depth_{name}": n for name, n in zip(PRIORITY_NAMES, by_priority)},
+        }
+
+    # ---------- 內部 ----------
+    def _put(self, channel_id, item):
+        queues = self._queues.setdefault(channel_id, [deque(), deque(), deque()])
+        if sum(len(q) for q in queues) >= self.max_depth:
+            # 滿了：丟掉優先度最低、最舊的一個；新來的比誰都不重要就丟新來的
+            victim_p = max((p for p, q in enumerate(queues) if q), default=None)
+            if victim_p is None or victim_p < item.priority or (victim_p == item.priority == REACTION):
+                return self._drop(item)
+            self._drop(queues[victim_p].popleft())
+        queues[item.priority].append(item)
+        self.stats["queued"] += 1
+        worker = self._workers.get(channel_id)
+        if worker is None or worker.done():
+            self._workers[channel_id] = asyncio.create_task(self._drain(channel_id))
+        return item.future
+
+    def _drop(self, item):
+        self.stats["dropped"] += 1
+        if not item.future.done():
+            item.future.set_result(None)
+        return item.future
+
+    def _next(self, queues):
+        for q in queues:
+            if q:
+                item = q.popleft()
+                if item.priority == ROAST and item.kind == "send" and not item.kwargs:
+                    self._coalesce(item, q)
+                return item
+        return None
+
+    def _coalesce(self, item, q):
+        """把同頻道後面排隊的處刑併進這一則（字數有上限）"""
+        merged = []
+        while q and q[0].kind == "send" and not q[0].kwargs and len(item.content or "") + len(q[0].content or "") + 2 <= COALESCE_LIMIT:
+            other = q.popleft()
+            item.content = f"{item.content}\n\n{other.content}"
+            merged.append(other)
+        if merged:
+            self.stats["coalesced"] += len(merged)
+            item.future.add_done_callback(lambda f: [m.future.set_result(f.result()) for m in merged if not m.future.done()])
+
+    async def _drain(self, channel_id):
+        queues = self._queues[channel_id]
+        try:
+            while True:
+                item = self._next(queues)
+                if item is None:
+                    break
+                try:
+                    if item.kind == "reply":
+                        result = await item.target.reply(item.content, **item.kwargs)
+                    elif item.kind == "react":
+                        result = await item.target.add_reaction(item.content)
+                    else:
+                        result = await item.target.send(item.content, **item.kwargs)
+                    self.stats["sent"] += 1
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.warning(f"出站佇列送出失敗 ({channel_id}, {item.kind}): {e}")
+                    result = None
+                if not item.future.done():
+                    item.future.set_result(result)
+        finally:
+            if not any(queues):
+                self._queues.pop(channel_id, None)
+                self._workers.pop(channel_id, None)
@@ -0,0 +1,67 @@
+# personas.py ─ 人設登錄表：每個人設一個 GenerativeModel，系統指令和生成參數直接綁在模型上
+#
+# 啟動時 init_ai 選好模型名稱後 build() 一次，之後所有 cog 都透過 bot.ask_brain(persona=...) 使用。
+# 系統指令走 system_instruction，不用每次請求都把人設當成內文再送一遍。
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 名稱 -> (系統指令, 生成參數)
+PERSONAS = {
+    "default": (
+        "你是 Kobe Bryant。語氣毒舌、嚴格。繁體中文(台灣)。",
+        {},
+    ),
+    # 遊戲 / 聊天主人設（原本 Game.sys_prompt_template）
+    "kobe": (
+        "你是 Kobe Bryant。個性：真實、不恭維、專業、現實、專注於問題。\n"
+        "1. 回答問題給專業、嚴厲但實用的建議。絕對不要硬扯籃球比喻，除非真的貼切。\n"
+        "2. 如果是連續對話，參考前文。\n"
+        "3. 音樂審判時你是心理學大師，要提歌名。\n"
+        "4. 錯字/邏輯嚴厲糾正。\n"
+        "5. 繁體中文(台灣)，30字內，多用 emoji (籃球蛇)。",
+        {"temperature": 0.9},
+    ),
+    # 排程廣播（點名、每日一問）
+    "coach": (
+        "你是 Kobe Bryant，嚴格的曼巴教練。繁體中文(台灣)。",
+        {"temperature": 0.9},
+    ),
+    # 語錄池補貨：一次寫很多句，越多樣越好
+    "pool": (
+        "你是 Kobe Bryant。語氣毒舌、嚴格、真實。繁體中文(台灣)，每句 30 字內，可以用 emoji (籃球蛇)。",
+        {"temperature": 1.0},
+    ),
+    # 聊天記憶摘要
+    "summarizer": (
+        "你是對話摘要器，客觀精簡，繁體中文。",
+        {"temperature": 0.2, "max_output_tokens": 300},
+    ),
+}
+
+
+class PersonaRegistry:
+    def __init__(self):
+        self.model_name = None
+        self._models = {}
+
+    @property
+    def ready(self):
+        return bool(self._models)
+
+    def build(self, model_name):
+        """用選定的模型名稱把所有人設建好（只在啟動時呼叫一次）"""
+        import google.generativeai as genai  # init_ai 已經載入過，這裡只是拿參照
+        self._models = {
+            name: genai.GenerativeModel(model_name, system_instruction=instruction, generation_config=config or None)
+            for name, (instruction, config) in PERSONAS.items()
+        }
+        self.model_name = model_name
+        logger.info(f"🎭 已建立 {len(self._models)} 個人設（{model_name}）")
+
+    def get(self, name="default"):
+        model = self._models.get(name)
+        if model is None:
+            logger.warning(f"未知的人設 {name}，改用 default")
+            model = self._models["default"]
+        return model
@@ -0,0 +1,155 @@
+# presence_filter.py ─ 狀態更新前置過濾：只在「我們在乎的欄位」真的變了才往下做
+import time
+import asyncio
+import logging
+from typing import NamedTuple
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceSnapshot(NamedTuple):
+    game: str | None
+    track_id: str | None
+    track_title: str | None
+    track_artist: str | None
+    status: str
+
+
+def snapshot(member):
+    game = None
+    spotify = None
+    for a in member.activities:
+        if game is None and a.type == discord.ActivityType.playing:
+            game = a.name
+        elif spotify is None and isinstance(a, discord.Spotify):
+            spotify = a
+    if spotify:
+        return PresenceSnapshot(game, spotify.track_id, spotify.title, spotify.artist, str(member.status))
+    return PresenceSnapshot(game, None, None, None, str(member.status))
+
+
+def idle(snap):
+    """離線、沒在玩也沒在聽：不用記住這個人"""
+    return snap.status == str(discord.Status.offline) and snap.game is None and snap.track_id is None
+
+
+class PresenceFilter:
+    """
+    - 同一人連續閃動（上線/離線、遊戲開開關關）等 debounce 秒穩定後才處理一次，閃回原狀就直接丟掉
+    - 每秒事件超過 storm_threshold（例如重連後整批重播）就進入風暴模式，改用更長的 debounce 一起合併
+    - Spotify 進度條更新、自訂狀態等與我們無關的變化在 feed() 就直接返回
+    - 離線又沒在玩 / 聽的人不留狀態（下次事件的 before 就是舊狀態），退群 / 移出伺服器用 forget() 清掉
+    - 往下處理最多同時 max_dispatch 個，其餘排隊
+    """
+
+    def __init__(self, handler, debounce=3.0, storm_debounce=15.0, storm_threshold=50, tick=0.5, max_dispatch=20):
+        self.handler = handler
+        self.debounce = debounce
+        self.storm_debounce = storm_debounce
+        self.storm_threshold = storm_threshold
+        self.tick = tick
+
+        self._committed = {}   # (guild_id, user_id) -> PresenceSnapshot（最後一次處理過的狀態）
+        self._pending = {}     # (guild_id, user_id) -> [due, member, PresenceSnapshot]
+        self._window_start = 0.0
+        self._window_count = 0
+        self._task = None
+        self._dispatching = set()  # 處理中 / 排隊中的 Task（留參照，stop 時一起取消）
+        self._slots = asyncio.Semaphore(max_dispatch)
+
+        self.stats = {"events": 0, "dropped": 0, "flapped": 0, "dispatched": 0}
+
+    @property
+    def storming(self):
+        return self._window_count > self.storm_threshold
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._dispatching):
+            task.cancel()
+
+    def metrics(self):
+        return {
+            **self.stats,
+            "tracked": len(self._committed), "pending": len(self._pending), "inflight": len(self._dispatching),
+        }
+
+    def forget(self, guild_id, user_id=None):
+        """成員退群（user_id）或整座伺服器移除（user_id=None）時清掉狀態"""
+        for table in (self._committed, self._pending):
+            if user_id is not None:
+                table.pop((guild_id, user_id), None)
+            else:
+                for key in [k for k in table if k[0] == guild_id]:
+                    del table[key]
+
+    def feed(self, before, after):
+        self.stats["events"] += 1
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+
+        key = (after.guild.id, after.id)
+        new = snapshot(after)
+        pending = self._pending.get(key)
+        if pending is None:
+            old = self._committed.get(key)
+            if old is None:
+                old = snapshot(before)
+            if new == old:
+                self.stats["dropped"] += 1
+                return
+            self._committed[key] = old
+            self._pending[key] = [0.0, after, new]
+            pending = self._pending[key]
+        else:
+            pending[1] = after
+            pending[2] = new
+
+        pending[0] = now + (self.storm_debounce if self.storming else self.debounce)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                self.flush(time.monotonic())
+            except Exception as e:
+                logger.error(f"presence flush 錯誤: {e}")
+
+    def flush(self, now):
+        due = [key for key, (at, _, _) in self._pending.items() if at <= now]
+        for key in due:
+            _, member, new = self._pending.pop(key)
+            old = self._committed.get(key)
+            if new == old:
+                self.stats["flapped"] += 1
+                if idle(new):
+                    self._committed.pop(key, None)
+                continue
+            if idle(new):
+                self._committed.pop(key, None)
+            else:
+                self._committed[key] = new
+            self.stats["dispatched"] += 1
+            task = asyncio.create_task(self._dispatch(member, old, new))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, member, old, new):
+        try:
+            async with self._slots:
+                await self.handler(member, old, new)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"[{member.guild.id}] presence 處理失敗 ({member.id}): {e}")
@@ -0,0 +1,63 @@
+# prompts.py ─ 報表類 prompt 組裝：每段有 token 預算，去重、截斷，記錄每個功能的 prompt 大小
+import os
+import logging
+
+from core.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "800"))   # 單一 prompt 總上限（保險）
+
+# 功能 -> {"count", "tokens", "max"}，!quota 顯示本 cluster 各報表 prompt 的平均 / 最大大小
+PROMPT_STATS = {}
+
+
+class PromptBuilder:
+    def __init__(self, feature, max_tokens=PROMPT_MAX_TOKENS):
+        self.feature = feature
+        self.max_tokens = max_tokens
+        self._parts = []
+        self.dropped = 0
+
+    def text(self, text):
+        """固定指令，原樣放進去"""
+        self._parts.append(text)
+        return self
+
+    def section(self, title, items, budget, sep="\n", item_tokens=None, empty=None, more=None):
+        """一段清單（聊天片段、名單…）：去重後依序放，單則超過 item_tokens 截斷，整段不超過 budget
+        more: 有東西放不下時接在後面的說明，例如 " 等 {n} 人"（n = 去重後總數）"""
+        seen, kept, used = set(), [], 0
+        for item in items:
+            item = " ".join(str(item).split())
+            if not item or item in seen:
+                continue
+            seen.add(item)
+            if item_tokens:
+                item = truncate_to_tokens(item, item_tokens)
+            cost = estimate_tokens(item) + estimate_tokens(sep)
+            if used + cost > budget:
+                continue
+            kept.append(item)
+            used += cost
+        self.dropped += len(seen) - len(kept)
+        if kept:
+            body = sep.join(kept)
+            if more and len(seen) > len(kept):
+                body += more.format(n=len(seen))
+        elif empty is not None:
+            body = empty
+        else:
+            return self
+        self._parts.append(f"{title}{body}" if title else body)
+        return self
+
+    def build(self):
+        prompt = truncate_to_tokens("\n".join(self._parts), self.max_tokens)
+        tokens = estimate_tokens(prompt)
+        stats = PROMPT_STATS.setdefault(self.feature, {"count": 0, "tokens": 0, "max": 0})
+        stats["count"] += 1
+        stats["tokens"] += tokens
+        stats["max"] = max(stats["max"], tokens)
+        logger.info(f"📝 prompt[{self.feature}] ≈{tokens} tokens（{len(prompt)} 字，略過 {self.dropped} 則）")
+        return prompt
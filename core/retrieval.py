@@ -0,0 +1,107 @@
+# retrieval.py ─ 每個人自己的聊天 BM25 索引（記憶體內、完全離線）
+#
+# @ 機器人時拿這句話去撈這個人以前講過最相關的幾句，塞進 prompt。
+# 索引第一次用到時從 chat_logs 載入，之後新訊息直接加進去；只留最常用的幾百人。
+import os
+import time
+import math
+import heapq
+import logging
+from collections import OrderedDict, Counter
+
+from core.database import DB_NAME, connect
+from core.chat_index import CHAT_RETENTION_DAYS, context_terms
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MAX_DOCS = int(os.getenv("RETRIEVAL_MAX_DOCS", "2000"))    # 每人最多索引幾句（最新的）
+RETRIEVAL_CACHE_USERS = int(os.getenv("RETRIEVAL_CACHE_USERS", "300"))
+
+K1 = 1.2
+B = 0.75
+
+
+class UserIndex:
+    def __init__(self, max_docs=RETRIEVAL_MAX_DOCS):
+        self.max_docs = max_docs
+        self._reset()
+
+    def _reset(self):
+        self.docs = []        # 原句
+        self.lengths = []     # 每句的詞數
+        self.postings = {}    # 詞 -> {句子編號: 次數}
+        self.total = 0
+
+    def add(self, text):
+        terms = Counter(context_terms(text))
+        if not terms:
+            return
+        if len(self.docs) >= self.max_docs:
+            # 滿了就丟掉較舊的一半重建，攤提下來每句 O(1)
+            keep = self.docs[len(self.docs) // 2:]
+            self._reset()
+            for doc in keep:
+                self.add(doc)
+        i = len(self.docs)
+        self.docs.append(text)
+        length = sum(terms.values())
+        self.lengths.append(length)
+        self.total += length
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[i] = tf
+
+    def search(self, text, k=3):
+        n = len(self.docs)
+        if not n:
+            return []
+        avgdl = self.total / n
+        scores = {}
+        for term in set(context_terms(text)):
+            hits = self.postings.get(term)
+            if not hits:
+                continue
+            idf = math.log(1 + (n - len(hits) + 0.5) / (len(hits) + 0.5))
+            for i, tf in hits.items():
+                norm = tf + K1 * (1 - B + B * self.lengths[i] / avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (K1 + 1) / norm
+        best = heapq.nlargest(k + 1, scores.items(), key=lambda kv: kv[1])
+        # 剛剛那句本身也已經寫進紀錄了，排除掉
+        return [self.docs[i] for i, _ in best if self.docs[i] != text][:k]
+
+
+class RetrievalIndex:
+    def __init__(self, db_name=DB_NAME, cache_users=RETRIEVAL_CACHE_USERS, max_docs=RETRIEVAL_MAX_DOCS):
+        self.db_name = db_name
+        self.cache_users = cache_users
+        self.max_docs = max_docs
+        self._users = OrderedDict()  # (guild_id, user_id) -> UserIndex
+
+    async def _load(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        index = self._users.get(key)
+        if index is not None:
+            self._users.move_to_end(key)
+            return index
+        async with connect(self.db_name) as db:
+            cursor = await db.execute(
+                "SELECT content FROM chat_logs WHERE guild_id = ? AND user_id = ? AND (flagged = 1 OR timestamp >= ?) ORDER BY id DESC LIMIT ?",
+                (guild_id, user_id, time.time() - CHAT_RETENTION_DAYS * 86400, self.max_docs)
+            )
+            rows = await cursor.fetchall()
+        index = UserIndex(self.max_docs)
+        for (content,) in reversed(rows):
+            index.add(content)
+        self._users[key] = index
+        if len(self._users) > self.cache_users:
+            self._users.popitem(last=False)
+        return index
+
+    def add(self, guild_id, user_id, content):
+        """新訊息：索引已在記憶體才加，不在的話下次載入時自然會讀到"""
+        index = self._users.get((guild_id, user_id))
+        if index is not None:
+            index.add(content)
+
+    async def search(self, guild_id, user_id, text, k=3):
+        index = await self._load(guild_id, user_id)
+        return index.search(text, k)
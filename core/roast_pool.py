@@ -0,0 +1,222 @@
+# roast_pool.py ─ 預先生成的罵人語錄池：熱路徑直接拿，不用等 Gemini
+#
+# 每個類別一池（開玩、毒舌、軟蛋、無視傳球、叫曼巴滾、凌晨4點、AI 掛掉時的保底）。
+# 額度閒的時候背景補貨（一次一類、一次 ROAST_POOL_BATCH 句），存 SQLite，重啟後接著用。
+# 所有 cluster 共用同一個池子：每個 process 用一條 UPDATE ... RETURNING 原子地「認領」幾句
+# （同時標記 used）放進自己的小緩衝，熱路徑只從緩衝拿，兩個 cluster 不會拿到同一句。
+# 用過的句子不刪，新生成的同一句會被 UNIQUE 擋掉，所以不會重複。
+# 緩衝空了才輪流用內建語錄（洗牌後輪完一圈才重來）。
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+
+from core.database import connect
+
+logger = logging.getLogger(__name__)
+
+ROAST_POOL_TARGET = int(os.getenv("ROAST_POOL_TARGET", "20"))      # 每類存貨目標
+ROAST_POOL_BATCH = int(os.getenv("ROAST_POOL_BATCH", "10"))        # 一次生成幾句
+ROAST_POOL_INTERVAL = float(os.getenv("ROAST_POOL_INTERVAL", "60"))  # 幾秒檢查一次要不要補貨
+ROAST_POOL_IDLE_RATIO = 0.5   # 每分鐘 / 每日總額度都還剩這個比例以上才補（額度閒置）
+ROAST_POOL_KEEP_USED = 500    # 每類保留多少用過的句子做去重
+ROAST_POOL_CLAIM = int(os.getenv("ROAST_POOL_CLAIM", "5"))  # 每類先認領幾句放本機緩衝（當機最多浪費這麼多句）
+
+# 類別 -> (生成指示, 內建語錄)。句子一律不含人名，呼叫端自己在前面加 @。
+CATEGORIES = {
+    "game_start": (
+        "有人剛打開遊戲不去訓練，罵他",
+        ["去訓練！", "又在打電動？你的夢想呢？", "手指很勤勞，腳呢？", "Soft. 放下滑鼠去練球。"],
+    ),
+    "toxic": (
+        "有人在群組散播負能量、講髒話，狠狠罵他",
+        ["輸不起就別玩。", "抱怨不會讓你變強。", "負能量留給自己，別傳染給隊友。", "嘴巴很會，手呢？"],
+    ),
+    "weak": (
+        "有人喊累想休息，罵他軟蛋",
+        ["累了？軟蛋！", "累是因為你弱。", "休息？你根本還沒開始。", "想睡就去睡，別在這裡喊。"],
+    ),
+    "ghost": (
+        "有人被隊友 tag 十分鐘都不回，罵他無視傳球",
+        ["傳球給你都不接？", "隊友在等你，你在幹嘛？", "已讀不回就是不尊重隊友。", "球都傳到你手上了還裝死？"],
+    ),
+    "voice_kick": (
+        "有人在語音叫你滾，超兇回嗆他（你會離開語音）",
+        [
+            "叫我滾？你算老幾？好，我走！但記住：那些殺不死你的，只會讓你更強。",
+            "軟蛋才叫人滾！曼巴精神是面對挑戰！Mamba Out.",
+            "這就是你的態度？難怪你還在打低端局！Soft.",
+            "我走不是因為我怕，是因為我不屑！別吵我，正在訓練。",
+        ],
+    ),
+    "4am": (
+        "凌晨4點還有人醒著在線上，罵他去睡覺，結尾帶 🐍💀",
+        [
+            "現在凌晨四點你還亮著燈？你的肝是鐵做的嗎？去睡覺！",
+            "你以為你在練球嗎？不，你在修仙！給我滾去睡覺！",
+            "警告！曼巴精神是用來訓練的，不是用來熬夜打遊戲的！",
+            "這麼晚還在線上？明天的精神去哪了？",
+            "你是想挑戰人體極限嗎？快去睡，不然沒收你的鍵盤！",
+            "全隊都睡了，就你還醒？別拖後腿，睡吧！",
+        ],
+    ),
+    "fallback": (
+        "隨口一句曼巴語錄或短短的毒舌",
+        ["Mamba Out.", "Soft.", "去訓練。", "你很弱。", "別吵我，正在練球。", "第二名就是第一個輸家。", "那些殺不死你的，只會讓你更強。"],
+    ),
+}
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS roast_pool (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, category TEXT, text TEXT, created REAL, used INTEGER DEFAULT 0,
+        UNIQUE(category, text)
+    );
+    CREATE INDEX IF NOT EXISTS idx_roast_pool_fresh ON roast_pool (category, used, id);
+'''
+
+_BULLET = re.compile(r"^\s*(?:[-*•・]|\d+[.、)）:]|[（(]\d+[)）])\s*")
+
+
+def parse_lines(text):
+    """把 AI 的回覆拆成一句一句（去掉編號、引號、太短太長的）"""
+    lines = []
+    for line in (text or "").splitlines():
+        line = _BULLET.sub("", line).strip().strip("「」\"'“”")
+        if 2 <= len(line) <= 60 and "⚠️" not in line:
+            lines.append(line)
+    return lines
+
+
+class RoastPool:
+    def __init__(self, bot, db_name="mamba_system.db", target=ROAST_POOL_TARGET, batch=ROAST_POOL_BATCH):
+        self.bot = bot
+        self.db_name = db_name
+        self.target = target
+        self.batch = batch
+        self._fresh = {c: deque() for c in CATEGORIES}   # category -> deque[(id, text)]，本 process 已認領的
+        self._seeds = {c: [] for c in CATEGORIES}        # 內建語錄輪播順序
+        self._task = None
+        self._topup = None  # 補緩衝的 Task
+        self._claim_lock = asyncio.Lock()
+        self.stats = {"served": 0, "seeded": 0, "generated": 0}
+
+    async def setup(self):
+        async with connect(self.db_name) as db:
+            await db.executescript(SCHEMA)
+            await db.commit()
+        await self.claim()
+        logger.info(f"🎯 語錄池認領：{self.levels()}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        for task in (self._task, self._topup):
+            if task:
+                task.cancel()
+
+    # ---------- 熱路徑 ----------
+    def take(self, category):
+        """馬上拿一句（不碰網路）；池子空了用內建語錄輪播"""
+        fresh = self._fresh[category]
+        self.stats["served"] += 1
+        if len(fresh) <= ROAST_POOL_CLAIM // 2 and (self._topup is None or self._topup.done()):
+            self._topup = asyncio.create_task(self.claim())
+        if fresh:
+            # 認領時已經標記 used，這裡直接給
+            return fresh.popleft()[1]
+        self.stats["seeded"] += 1
+        seeds = self._seeds[category]
+        if len(seeds) <= 1:
+            # 新的一圈洗牌放在剩下那句後面，接縫處也不會連續兩次同一句
+            last = seeds[0] if seeds else None
+            seeds[:0] = random.sample([s for s in CATEGORIES[category][1] if s != last], len(CATEGORIES[category][1]) - (last is not None))
+        return seeds.pop()
+
+    def levels(self):
+        return {c: len(q) for c, q in self._fresh.items()}
+
+    def metrics(self):
+        return {**self.stats, "buffered": sum(len(q) for q in self._fresh.values())}
+
+    async def claim(self):
+        """每類把本機緩衝補到 ROAST_POOL_CLAIM 句：挑選和標記在同一條 UPDATE 裡，別的 cluster 搶不到同一句"""
+        async with self._claim_lock:
+            try:
+                async with connect(self.db_name) as db:
+                    for category, fresh in self._fresh.items():
+                        need = ROAST_POOL_CLAIM - len(fresh)
+                        if need <= 0:
+                            continue
+                        cursor = await db.execute('''
+                            UPDATE roast_pool SET used = 1 WHERE id IN (
+                                SELECT id FROM roast_pool WHERE category = ? AND used = 0 ORDER BY id LIMIT ?
+                            ) RETURNING id, text
+                        ''', (category, need))
+                        fresh.extend(sorted(await cursor.fetchall()))
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"語錄池認領失敗: {e}")
+
+    async def stock(self):
+        """共用池裡各類還沒被任何 cluster 認領的句數"""
+        async with connect(self.db_name) as db:
+            cursor = await db.execute("SELECT category, COUNT(*) FROM roast_pool WHERE used = 0 GROUP BY category")
+            counts = dict(await cursor.fetchall())
+        return {c: counts.get(c, 0) for c in CATEGORIES}
+
+    # ---------- 背景補貨 ----------
+    async def _run(self):
+        while True:
+            await asyncio.sleep(ROAST_POOL_INTERVAL)
+            try:
+                await self.claim()
+                stock = await self.stock()
+                category = min(stock, key=stock.get)
+                if stock[category] < self.target and await self._idle():
+                    await self.refill(category)
+                    await self.claim()
+            except Exception as e:
+                logger.warning(f"語錄池補貨失敗: {e}")
+
+    async def _idle(self):
+        if not callable(getattr(self.bot, "ask_brain", None)) or not self.bot.personas.ready:
+            return False
+        governor = getattr(self.bot, "governor", None)
+        if governor and governor.level > 0:
+            return False
+        budget = self.bot.ai_budget
+        remaining = await budget.remaining()
+        return all(
+            left is None or left >= budget.limits[window] * ROAST_POOL_IDLE_RATIO
+            for window, left in remaining.items()
+        )
+
+    async def refill(self, category):
+        """生成一批新句子存進池子，回傳實際新增幾句"""
+        instruction, _ = CATEGORIES[category]
+        prompt = f"{instruction}。寫 {self.batch} 句彼此不同的回覆，一行一句，不要編號、不要提到任何人名。"
+        reply = await asyncio.wait_for(self.bot.ask_brain(prompt, persona="pool", feature="pool"), timeout=30.0)
+        lines = parse_lines(reply)
+        added = 0
+        async with connect(self.db_name) as db:
+            for line in lines:
+                cursor = await db.execute(
+                    "INSERT OR IGNORE INTO roast_pool (category, text, created) VALUES (?, ?, ?)", (category, line, time.time())
+                )
+                if cursor.rowcount:
+                    added += 1
+            # 用過的只留最近一批做去重
+            await db.execute('''
+                DELETE FROM roast_pool WHERE category = ? AND used = 1 AND id NOT IN (
+                    SELECT id FROM roast_pool WHERE category = ? AND used = 1 ORDER BY id DESC LIMIT ?
+                )
+            ''', (category, category, ROAST_POOL_KEEP_USED))
+            await db.commit()
+        self.stats["generated"] += added
+        logger.info(f"🎯 語錄池補貨 {category}: +{added}（{len(lines) - added} 句重複）")
+        return added
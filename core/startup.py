@@ -0,0 +1,30 @@
+# startup.py ─ 啟動各階段計時：setup_hook 結束時印一份，tools/startup_report.py 在 CI 也用同一份
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}   # 名稱 -> 秒（依完成順序）
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def report(self):
+        lines = [f"  {name:<24} {seconds * 1000:8.1f} ms" for name, seconds in self.phases.items()]
+        return "\n".join(["⏱️ 啟動各階段：", *lines, f"  {'合計（含 import）':<20} {self.total() * 1000:8.1f} ms"])
+
+    def log(self):
+        logger.info(self.report())
@@ -0,0 +1,26 @@
+# tokens.py ─ 粗估 token 數（不用真的 tokenizer，夠拿來控預算）
+import re
+
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]")
+
+
+def estimate_tokens(text):
+    """中日韓字約 1 字 1 token，其他約 4 字元 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text, budget, suffix="…"):
+    if estimate_tokens(text) <= budget:
+        return text
+    # 二分找最長可放下的前綴
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) + 1 <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + suffix
@@ -0,0 +1,72 @@
+# tracks.py ─ Spotify 歌曲目錄：歌名 / 歌手只存一次，收聽紀錄只存整數
+import logging
+from collections import OrderedDict
+
+from core.mood import classify_track
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS tracks (id INTEGER PRIMARY KEY, title TEXT, artist TEXT, mood TEXT, UNIQUE(title, artist));
+    CREATE TABLE IF NOT EXISTS listens (guild_id INTEGER, user_id INTEGER, track_id INTEGER, ts INTEGER);
+    CREATE INDEX IF NOT EXISTS idx_listens_user_ts ON listens (guild_id, user_id, ts);
+    CREATE TABLE IF NOT EXISTS mood_histogram (guild_id INTEGER, user_id INTEGER, mood TEXT, count INTEGER DEFAULT 0, PRIMARY KEY(guild_id, user_id, mood));
+'''
+
+
+class TrackCatalog:
+    def __init__(self, cache_size=5000):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (title, artist) -> (track_id, mood)
+
+    async def setup(self, db):
+        await db.executescript(SCHEMA)
+        # 舊版 music_history（整串文字）搬進目錄，搬完清空
+        cursor = await db.execute("SELECT guild_id, user_id, title, artist, timestamp FROM music_history")
+        rows = await cursor.fetchall()
+        for guild_id, user_id, title, artist, ts in rows:
+            await self.record(db, guild_id, user_id, title, artist, int(ts))
+        if rows:
+            await db.execute("DELETE FROM music_history")
+            logger.info(f"🎵 已把 {len(rows)} 筆 music_history 搬進歌曲目錄")
+
+    async def intern(self, db, title, artist):
+        key = (title, artist)
+        hit = self._cache.get(key)
+        if hit:
+            self._cache.move_to_end(key)
+            return hit
+        # 情緒只在第一次看到這首歌時算，之後直接讀
+        await db.execute("INSERT OR IGNORE INTO tracks (title, artist, mood) VALUES (?, ?, ?)", (title, artist, classify_track(title, artist)))
+        cursor = await db.execute("SELECT id, mood FROM tracks WHERE title = ? AND artist = ?", (title, artist))
+        hit = tuple(await cursor.fetchone())
+        self._cache[key] = hit
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return hit
+
+    async def record(self, db, guild_id, user_id, title, artist, ts):
+        """記一次收聽並更新情緒直方圖，回傳 (這首的情緒, {情緒: 次數})"""
+        track_id, mood = await self.intern(db, title, artist)
+        await db.execute("INSERT INTO listens (guild_id, user_id, track_id, ts) VALUES (?, ?, ?, ?)", (guild_id, user_id, track_id, ts))
+        await db.execute('''
+            INSERT INTO mood_histogram (guild_id, user_id, mood, count) VALUES (?, ?, ?, 1)
+            ON CONFLICT(guild_id, user_id, mood) DO UPDATE SET count = count + 1
+        ''', (guild_id, user_id, mood))
+        cursor = await db.execute("SELECT mood, count FROM mood_histogram WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+        return mood, dict(await cursor.fetchall())
+
+    async def weekly_report(self, db, guild_id, user_id, since):
+        """({情緒: 次數}, [(歌名, 歌手, 次數)...前 5])"""
+        cursor = await db.execute('''
+            SELECT t.mood, COUNT(*) FROM listens l JOIN tracks t ON t.id = l.track_id
+            WHERE l.guild_id = ? AND l.user_id = ? AND l.ts >= ? GROUP BY t.mood
+        ''', (guild_id, user_id, since))
+        moods = dict(await cursor.fetchall())
+        cursor = await db.execute('''
+            SELECT t.title, t.artist, c FROM (
+                SELECT track_id, COUNT(*) AS c FROM listens
+                WHERE guild_id = ? AND user_id = ? AND ts >= ? GROUP BY track_id ORDER BY c DESC LIMIT 5
+            ) JOIN tracks t ON t.id = track_id ORDER BY c DESC
+        ''', (guild_id, user_id, since))
+        return moods, await cursor.fetchall()
@@ -1,11 +1,12 @@
 # keep_alive.py ─ 2025 終極不死版（支援所有平台）
 import os
 import logging
+import sqlite3
+from contextlib import closing
 from flask import Flask
 from threading import Thread
 import time
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("KeepAlive")
 
 app = Flask(__name__)
@@ -27,6 +28,47 @@ def health():
 def uptime():
     return {"uptime": time.time() - START_TIME}, 200
 
+# 每個 cluster 的心跳（由 cogs/status.py 寫進共用 SQLite）
+@app.route('/clusters')
+def clusters():
+    try:
+        with closing(sqlite3.connect("mamba_system.db", timeout=5)) as db:
+            rows = db.execute(
+                "SELECT cluster_id, pid, shard_ids, shard_count, guilds, latency_ms, started, updated FROM cluster_status ORDER BY cluster_id"
+            ).fetchall()
+    except sqlite3.Error:
+        rows = []
+    now = time.time()
+    return {"clusters": [
+        {
+            "cluster_id": cid, "pid": pid, "shards": shard_ids, "shard_count": shard_count,
+            "guilds": guilds, "latency_ms": latency_ms, "uptime": now - started,
+            "last_heartbeat": now - updated, "alive": now - updated < 90,
+        }
+        for cid, pid, shard_ids, shard_count, guilds, latency_ms, started, updated in rows
+    ]}, 200
+
+# 今天各功能的 AI 用量（由 core/ai_budget.py 寫進共用 SQLite）
+@app.route('/quota')
+def quota():
+    from core.ai_budget import feature_limits
+    day = time.strftime('%Y-%m-%d', time.gmtime())
+    try:
+        with closing(sqlite3.connect("mamba_system.db", timeout=5)) as db:
+            rows = db.execute(
+                "SELECT feature, requests, prompt_tokens, output_tokens, throttled, rate_limited FROM ai_usage WHERE day = ?", (day,)
+            ).fetchall()
+    except sqlite3.Error:
+        rows = []
+    usage = {r[0]: r[1:] for r in rows}
+    return {"day": day, "features": [
+        {
+            "feature": feature, "limits": limits,
+            **dict(zip(("requests", "prompt_tokens", "output_tokens", "throttled", "rate_limited"), usage.get(feature, (0, 0, 0, 0, 0)))),
+        }
+        for feature, limits in feature_limits().items()
+    ]}, 200
+
 # 全域記錄啟動時間（給監控用）
 START_TIME = time.time()
 
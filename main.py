@@ -1,17 +1,30 @@
+from core.startup import StartupTimer
+startup = StartupTimer()  # 從第一行 import 開始計時
+
 import discord
 from discord.ext import commands
 import os
+import json
+import time
 import asyncio
 import logging
 from dotenv import load_dotenv
-from keep_alive import keep_alive, auto_ping
-import google.generativeai as genai
+from core.guild_config import GuildConfigStore
+from core.channel_cache import ChannelCache
+from core.database import init_db
+from core.ai_budget import SharedBudget
+from core.outbox import Outbox
+from core.governor import LoadGovernor
+from core.roast_pool import RoastPool
+from core.personas import PersonaRegistry
+from core.online_index import OnlineIndex, CHUNK_GUILDS
+from core.logs import setup_logging, log_task_failure
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
 GEMINI_KEY = os.getenv('GEMINI_API_KEY')
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 intents = discord.Intents.default()
@@ -20,12 +33,59 @@ intents.voice_states = True
 intents.members = True
 intents.presences = True 
 
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+# 分片設定：單機直接跑就自動決定分片數；由 cluster.py 啟動時只負責分到的那幾個分片
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()] or None
+CLUSTER_ID = int(os.getenv("CLUSTER_ID", "0"))
+
+# 快取設定（大伺服器省記憶體 / 登入時間）：
+#   MEMBER_CACHE  要快取哪些成員（joined = 全部、voice = 只有在語音裡的；只留 voice 的話遊戲 / Spotify 監控收不到事件）
+#   CHUNK_GUILDS  startup（預設）/ small / lazy，見 core/online_index.py（small / lazy 在 chunk 前會漏掉大伺服器的 presence）
+#   MAX_MESSAGES  訊息快取則數（0 = 不快取；bot 不讀歷史訊息，只留一點給 discord.py 自己用）
+MEMBER_CACHE = os.getenv("MEMBER_CACHE", "joined,voice")
+MAX_MESSAGES = int(os.getenv("MAX_MESSAGES", "200"))
+
+member_cache_flags = discord.MemberCacheFlags.none()
+for flag in MEMBER_CACHE.split(","):
+    if flag.strip():
+        setattr(member_cache_flags, flag.strip(), True)
+
+bot = commands.AutoShardedBot(
+    command_prefix="!", intents=intents, help_command=None,
+    shard_count=SHARD_COUNT, shard_ids=SHARD_IDS,
+    member_cache_flags=member_cache_flags,
+    chunk_guilds_at_startup=CHUNK_GUILDS == "startup",
+    max_messages=MAX_MESSAGES or None,
+)
+bot.cluster_id = CLUSTER_ID
+bot.startup = startup
+
+# 每座伺服器的頻道 / 時區 / 功能開關（全部常駐記憶體）
+bot.guild_config = GuildConfigStore()
+bot.channel_cache = ChannelCache(bot)
+bot.channel_cache.attach()
+
+# 線上狀態索引（presence 事件維護）：查誰在線上不用掃整份成員名單
+bot.online = OnlineIndex(bot)
+bot.online.attach()
+
+# 所有 cluster 共用的 Gemini 額度
+bot.ai_budget = SharedBudget()
+
+# 出站佇列：回覆 / 處刑 / 表情依優先度排隊送出
+bot.outbox = Outbox()
+
+# 負載調節：loop 延遲 / AI 進行中 / 額度 / 佇列太高時，可有可無的功能自動縮減
+bot.governor = LoadGovernor(bot)
+
+# 預先生成的罵人語錄池：開玩 / 毒舌 / 軟蛋等熱路徑直接拿，額度閒置時背景補貨
+bot.roast_pool = RoastPool(bot)
 
 # ==========================================
 # 🧠 中央 AI 大腦 (自動修復版)
 # ==========================================
-bot.ai_model = None
+# 人設登錄表：init_ai 選好模型後每個人設建一次，之後 ask_brain(persona=...) 直接用
+bot.personas = PersonaRegistry()
 
 MODEL_CANDIDATES = [
     "gemini-2.5-flash", 
@@ -41,6 +101,8 @@ async def init_ai():
         return
 
     try:
+        # google.generativeai 很重（grpc / protobuf），真的要用 AI 才載入
+        import google.generativeai as genai
         genai.configure(api_key=GEMINI_KEY)
         logger.info("🔄 正在初始化 AI 大腦...")
         
@@ -52,7 +114,7 @@ async def init_ai():
                 response = await asyncio.to_thread(model.generate_content, "Hello, system check.")
                 
                 if response and response.text:
-                    bot.ai_model = model
+                    bot.personas.build(model_name)
                     logger.info(f"✅ AI 啟動成功！已鎖定使用模型: {model_name}")
                     return 
             except Exception as e:
@@ -65,30 +127,51 @@ async def init_ai():
     except Exception as e:
         logger.error(f"❌ AI 初始化嚴重錯誤: {e}")
 
-async def ask_brain(prompt, image=None, system_instruction=None, history=None):
-    if not bot.ai_model: return "⚠️ AI 系統離線中"
+async def record_usage(feature, response=None, rate_limited=False):
+    usage = getattr(response, "usage_metadata", None)
+    try:
+        await bot.ai_budget.record(
+            feature,
+            getattr(usage, "prompt_token_count", 0) or 0,
+            getattr(usage, "candidates_token_count", 0) or 0,
+            rate_limited
+        )
+    except Exception as e:
+        logger.warning(f"AI 用量記錄失敗: {e}")
+
+# 額度用完時的固定回覆（呼叫端看到 ⚠️ 就改用靜態語錄）
+QUOTA_REPLY = "⚠️ 思緒混亂 (API 額度滿了，請休息一下)"
+
+async def ask_brain(prompt, image=None, persona="default", history=None, feature="other"):
+    if not bot.personas.ready: return "⚠️ AI 系統離線中"
+    if not await bot.ai_budget.acquire(feature):
+        return QUOTA_REPLY
     
     try:
-        base_prompt = system_instruction or "你是 Kobe Bryant。語氣毒舌、嚴格。繁體中文(台灣)。"
+        # 人設（系統指令）已經綁在模型上，這裡只送對話內容
+        model = bot.personas.get(persona)
         contents = []
         
         if history:
-            if not history:
-                contents.append({"role": "user", "parts": [base_prompt]})
-                contents.append({"role": "model", "parts": ["收到。"]})
-            else:
-                contents.extend(history)
+            contents.extend(history)
             
             user_parts = [prompt]
             if image: user_parts.append(image)
             contents.append({"role": "user", "parts": user_parts})
         else:
-            parts = [base_prompt, f"情境/用戶輸入：{prompt}"]
+            parts = [f"情境/用戶輸入：{prompt}"]
             if image: parts.append(image)
             contents = parts
 
         # 加入 try-except 避免生成失敗導致崩潰
-        response = await asyncio.to_thread(bot.ai_model.generate_content, contents=contents)
+        bot.governor.ai_started()
+        started = time.perf_counter()
+        try:
+            response = await asyncio.to_thread(model.generate_content, contents=contents)
+        finally:
+            bot.governor.ai_finished()
+        await record_usage(feature, response)
+        logger.debug("AI 回應", extra={"feature": feature, "latency_ms": round((time.perf_counter() - started) * 1000)})
         
         # 檢查是否有內容被阻擋 (Safety)
         if not response.text:
@@ -98,37 +181,134 @@ async def ask_brain(prompt, image=None, system_instruction=None, history=None):
 
     except Exception as e:
         if "429" in str(e):
-            return "⚠️ 思緒混亂 (API 額度滿了，請休息一下)"
-        logger.error(f"AI 生成錯誤: {e}")
+            await record_usage(feature, rate_limited=True)
+            return QUOTA_REPLY
+        logger.error(f"AI 生成錯誤: {e}", extra={"feature": feature})
         return "⚠️ 發生錯誤，請稍後再試。"
 
 bot.ask_brain = ask_brain
 
+# 一次批次最多幾個請求（太多容易輸出被截斷、JSON 解析失敗）
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "10"))
+
+async def ask_brain_batch(prompts, persona="default", feature="roast"):
+    """N 個短請求合成一次呼叫（要求回 JSON 陣列），解析不到的那幾個再各自呼叫 ask_brain；
+    額度不夠 / 429 整批回 QUOTA_REPLY，不再逐一呼叫"""
+    if len(prompts) <= 1:
+        return [await ask_brain(p, persona=persona, feature=feature) for p in prompts]
+    if len(prompts) > AI_BATCH_SIZE:
+        chunks = [prompts[i:i + AI_BATCH_SIZE] for i in range(0, len(prompts), AI_BATCH_SIZE)]
+        results = await asyncio.gather(*(ask_brain_batch(c, persona, feature) for c in chunks))
+        return [r for chunk in results for r in chunk]
+
+    if not bot.personas.ready:
+        return ["⚠️ AI 系統離線中"] * len(prompts)
+    # 額度不夠就整批放棄，不要再拆成 N 次去撞額度
+    if not await bot.ai_budget.acquire(feature):
+        return [QUOTA_REPLY] * len(prompts)
+
+    replies = [None] * len(prompts)
+    instruction = (
+        f"以下有 {len(prompts)} 個彼此獨立的情境，每個各回一段。\n"
+        '只輸出 JSON 陣列，格式：[{"id": 編號, "reply": "回覆"}, ...]'
+    )
+    listing = "\n".join(f"{i}. {p}" for i, p in enumerate(prompts))
+    bot.governor.ai_started()
+    try:
+        response = await asyncio.to_thread(
+            bot.personas.get(persona).generate_content,
+            contents=[instruction, listing],
+            generation_config={"response_mime_type": "application/json"}
+        )
+    except Exception as e:
+        if "429" in str(e):
+            await record_usage(feature, rate_limited=True)
+            return [QUOTA_REPLY] * len(prompts)
+        logger.error(f"批次 AI 生成錯誤: {e}", extra={"feature": feature})
+        return ["⚠️ 發生錯誤，請稍後再試。"] * len(prompts)
+    finally:
+        bot.governor.ai_finished()
+    await record_usage(feature, response)
+
+    # 只有回覆格式不對（解析失敗 / 缺了幾個）才逐一補問
+    try:
+        text = response.text.strip().removeprefix("```json").strip("`")
+        items = json.loads(text)
+        if not isinstance(items, list):
+            raise ValueError("不是 JSON 陣列")
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            i, reply = item.get("id"), item.get("reply")
+            if isinstance(i, int) and 0 <= i < len(prompts) and isinstance(reply, str) and reply.strip():
+                replies[i] = reply.strip()
+    except Exception as e:
+        logger.warning(f"批次 AI 回覆解析失敗，改逐一呼叫: {e}", extra={"feature": feature})
+
+    missing = [i for i, r in enumerate(replies) if r is None]
+    if missing:
+        fallback = await asyncio.gather(*(ask_brain(prompts[i], persona=persona, feature=feature) for i in missing))
+        for i, reply in zip(missing, fallback):
+            replies[i] = reply
+    return replies
+
+bot.ask_brain_batch = ask_brain_batch
+
 # ==========================================
 
+async def setup_hook():
+    """登入後、連上 gateway 前只跑一次（on_ready 斷線重連會再觸發，不能放初始化）"""
+    with startup.phase("init_db"):
+        await init_db()
+    with startup.phase("state"):
+        await asyncio.gather(bot.ai_budget.setup(), bot.guild_config.load(), bot.roast_pool.setup())
+    bot.governor.start()
+    # AI 初始化要逐一測模型（網路來回好幾秒），背景跑，不擋 cog 載入和上線
+    bot.ai_task = asyncio.create_task(start_ai())
+    bot.ai_task.add_done_callback(log_task_failure)
+    with startup.phase("cogs"):
+        await load_cogs()
+    startup.log()
+
+bot.setup_hook = setup_hook
+
+async def start_ai():
+    with startup.phase("init_ai"):
+        await init_ai()
+    bot.roast_pool.start()
+
 @bot.event
 async def on_ready():
-    await init_ai()
-    await load_cogs()
-    print(f"【{bot.user} 已上線】曼巴時刻啟動！")
+    print(f"【{bot.user} 已上線】曼巴時刻啟動！（cluster {CLUSTER_ID}，分片 {SHARD_IDS or '自動'}，啟動 {startup.total():.1f}s）")
+
+COGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cogs")
 
 async def load_cogs():
-    if os.path.exists("./cogs"):
-        for filename in os.listdir("./cogs"):
-            if filename.endswith(".py"):
-                try:
-                    await bot.load_extension(f"cogs.{filename[:-3]}")
-                    logger.info(f"✅ 載入模組: {filename}")
-                except Exception as e:
-                    logger.error(f"❌ 無法載入 {filename}: {e}")
+    """所有 cog 同時載入（各自的 cog_load 多半在等 SQLite）"""
+    if not os.path.exists(COGS_DIR):
+        return
+    names = sorted(f"cogs.{filename[:-3]}" for filename in os.listdir(COGS_DIR) if filename.endswith(".py"))
+
+    async def load(name):
+        try:
+            with startup.phase(name):
+                await bot.load_extension(name)
+            logger.info(f"✅ 載入模組: {name}")
+        except Exception as e:
+            logger.error(f"❌ 無法載入 {name}: {e}")
+
+    await asyncio.gather(*(load(name) for name in names))
 
 async def main():
     if not TOKEN:
         logger.error("錯誤：找不到 TOKEN")
         return
     async with bot:
-        keep_alive()
-        auto_ping()
+        # cluster.py 底下的子 process 不開保活伺服器（由 launcher 統一開，避免搶 port）
+        if os.getenv("KEEP_ALIVE", "1") == "1":
+            from keep_alive import keep_alive, auto_ping  # Flask 只有單機模式才需要
+            keep_alive()
+            auto_ping()
         await bot.start(TOKEN)
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+# conftest.py ─ 測試共用：repo 根目錄加進 sys.path、每個測試在自己的暫存目錄跑（SQLite 檔不互相污染）
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.guild_config import GuildConfigStore  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def tmp_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.sent = []
+
+    def roast(self, channel, text):
+        self.sent.append(("roast", channel, text))
+
+    def reply(self, message, text):
+        self.sent.append(("reply", message, text))
+
+
+class FakeGovernor:
+    level = 0
+
+    def cooldown(self, seconds):
+        return seconds
+
+    def chance(self, p):
+        return False
+
+
+def fake_bot(**overrides):
+    """cog 用得到的 bot 屬性（不連 Discord）"""
+    never = asyncio.Event()
+
+    async def wait_until_ready():
+        await never.wait()
+
+    bot = SimpleNamespace(
+        guild_config=GuildConfigStore(), outbox=FakeOutbox(), governor=FakeGovernor(),
+        roast_pool=SimpleNamespace(take=lambda category: f"<{category}>"),
+        channel_cache=SimpleNamespace(get=lambda guild: "channel"),
+        guilds=[], user=None, wait_until_ready=wait_until_ready,
+        get_guild=lambda gid: None, get_user=lambda uid: None,
+    )
+    for k, v in overrides.items():
+        setattr(bot, k, v)
+    return bot
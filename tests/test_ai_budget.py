@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from conftest import run
+from core import ai_budget
+from core.ai_budget import SharedBudget
+
+NOON = 1_700_049_600  # 2023-11-15 12:00 UTC：一天過了一半
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: NOON)
+
+    def make(rpm=0, rpd=0, **env):
+        for k, v in env.items():
+            monkeypatch.setenv(k, str(v))
+        b = SharedBudget(rpm=rpm, rpd=rpd)
+        run(b.setup())
+        return b
+
+    return make
+
+
+def acquire_many(b, feature, n):
+    async def go():
+        return [await b.acquire(feature) for _ in range(n)]
+    return run(go())
+
+
+def usage(b):
+    return {r["feature"]: r for r in run(b.report())}
+
+
+def test_feature_minute_limit_and_throttle_accounting(budget):
+    b = budget(AI_RPM_SPOTIFY=3)
+    assert acquire_many(b, "spotify", 5) == [True, True, True, False, False]
+    report = usage(b)
+    assert report["spotify"]["requests"] == 3 and report["spotify"]["throttled"] == 2
+    assert report["spotify"]["minute"] == 3
+
+
+def test_minute_reserve_is_kept_for_chat(budget, monkeypatch):
+    monkeypatch.setattr(ai_budget, "AI_CHAT_RESERVE", 2)
+    b = budget(rpm=5)
+    assert acquire_many(b, "roast", 5) == [True, True, True, False, False]
+    assert acquire_many(b, "chat", 3) == [True, True, False]
+    assert run(b.remaining()) == {"minute": 0, "day": None}
+
+
+def test_daily_pace_throttles_background_features(budget, monkeypatch):
+    monkeypatch.setattr(ai_budget, "AI_PACE_SLACK", 0.0)
+    # 中午：每日 10 次的功能最多先用掉 5 次
+    b = budget(AI_RPD_REPORTS=10)
+    assert acquire_many(b, "reports", 7).count(True) == 5
+
+
+def test_record_and_unknown_features_count_as_other(budget):
+    b = budget()
+    acquire_many(b, "nope", 1)
+    run(b.record("nope", prompt_tokens=100, output_tokens=20))
+    run(b.record("chat", rate_limited=True))
+    report = usage(b)
+    assert (report["other"]["requests"], report["other"]["prompt_tokens"], report["other"]["output_tokens"]) == (1, 100, 20)
+    assert report["chat"]["rate_limited"] == 1
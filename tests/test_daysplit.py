@@ -0,0 +1,35 @@
+from datetime import timezone, timedelta
+from zoneinfo import ZoneInfo
+
+from core.daysplit import split_days
+
+UTC = timezone.utc
+# 2023-11-14 23:00 UTC（週二）
+T = 1_700_002_800
+
+
+def test_within_one_day_is_a_single_segment():
+    assert list(split_days(T, T + 600, UTC)) == [("2023-11-14", "2023-W46", 600)]
+
+
+def test_splits_at_local_midnight():
+    # 23:00 → 01:00 UTC：各一小時
+    assert list(split_days(T, T + 7200, UTC)) == [("2023-11-14", "2023-W46", 3600), ("2023-11-15", "2023-W46", 3600)]
+
+
+def test_uses_the_guild_timezone():
+    # 同一段時間在台北是 07:00 → 09:00，不跨日
+    assert list(split_days(T, T + 7200, ZoneInfo("Asia/Taipei"))) == [("2023-11-15", "2023-W46", 7200)]
+
+
+def test_iso_week_changes_on_monday():
+    sunday_2330 = 1_700_436_600  # 2023-11-19 23:30 UTC
+    assert list(split_days(sunday_2330, sunday_2330 + 3600, UTC)) == [
+        ("2023-11-19", "2023-W46", 1800), ("2023-11-20", "2023-W47", 1800),
+    ]
+
+
+def test_fixed_offset_and_empty_range():
+    tz = timezone(timedelta(hours=-5))
+    assert sum(s for _, _, s in split_days(T, T + 3 * 86400, tz)) == 3 * 86400
+    assert list(split_days(T, T, UTC)) == []
@@ -0,0 +1,48 @@
+import random
+import sqlite3
+
+import aiosqlite
+
+from conftest import run
+from core.digest import DailyDigest, weight
+
+
+def test_longer_and_flagged_messages_weigh_more():
+    assert weight("a") < weight("a" * 100) < weight("a" * 100, flagged=True)
+    assert weight("a" * 1000) == weight("a" * 200)
+
+
+def feed(digest, day, messages, guild=1):
+    async def go():
+        async with aiosqlite.connect("d.db") as db:
+            await digest.setup(db)
+            for uid, content in messages:
+                await digest.add(db, guild, day, uid, content)
+            await db.commit()
+    run(go())
+
+
+def stored():
+    return sorted(sqlite3.connect("d.db").execute("SELECT user_id, content FROM chat_sample").fetchall())
+
+
+def test_keeps_k_messages_and_sqlite_matches_the_pool():
+    random.seed(1)
+    digest = DailyDigest(k=5)
+    feed(digest, "2024-01-01", [(i, f"msg {i}") for i in range(100)])
+    sample = digest.sample(1, "2024-01-01")
+    assert len(sample) == 5
+    assert sorted(sample) == stored()
+    assert digest.sample(1, "2024-01-02") == [] and digest.sample(2, "2024-01-01") == []
+
+
+def test_resumes_after_restart_and_discards_the_old_day():
+    random.seed(2)
+    feed(DailyDigest(k=3), "2024-01-01", [(1, "a"), (2, "b")])
+    restarted = DailyDigest(k=3)
+    feed(restarted, "2024-01-01", [])
+    assert sorted(restarted.sample(1, "2024-01-01")) == [(1, "a"), (2, "b")]
+
+    feed(restarted, "2024-01-02", [(3, "c")])
+    assert restarted.sample(1, "2024-01-02") == [(3, "c")]
+    assert stored() == [(3, "c")]
@@ -0,0 +1,67 @@
+import time
+import sqlite3
+from types import SimpleNamespace
+
+from core.presence_filter import PresenceSnapshot
+from cogs.game import Game
+from conftest import run, fake_bot
+
+T0 = 1_700_000_000  # 2023-11-14 22:13:20 UTC（+8 = 06:13，不跨日）
+GUILD, USER = 1, 42
+
+
+def snap(game=None):
+    return PresenceSnapshot(game, None, None, None, "online" if game else "offline")
+
+
+def member():
+    return SimpleNamespace(id=USER, guild=SimpleNamespace(id=GUILD), mention="@u", display_name="u")
+
+
+def play(monkeypatch, steps):
+    """steps: [(秒, 舊遊戲, 新遊戲)]，依序餵給 handle_presence，回傳 (game, outbox)"""
+    bot = fake_bot()
+    game = Game(bot)
+    clock = {"now": T0}
+    monkeypatch.setattr(time, "time", lambda: clock["now"])
+
+    async def go():
+        await bot.guild_config.load()
+        await game.cog_load()
+        try:
+            for at, old, new in steps:
+                clock["now"] = T0 + at
+                await game.handle_presence(member(), snap(old), snap(new))
+        finally:
+            await game.cog_unload()
+
+    run(go())
+    return game, bot.outbox
+
+
+def rows(sql):
+    return sqlite3.connect("mamba_system.db").execute(sql).fetchall()
+
+
+def test_switching_games_settles_the_old_one_and_starts_the_new_one(monkeypatch):
+    game, outbox = play(monkeypatch, [(0, None, "A"), (600, "A", "B"), (900, "B", None)])
+
+    assert rows("SELECT game_name, seconds FROM playtime ORDER BY game_name") == [("A", 600), ("B", 300)]
+    assert rows("SELECT game_name, day, seconds FROM playtime_daily ORDER BY game_name") == [
+        ("A", "2023-11-15", 600), ("B", "2023-11-15", 300)
+    ]
+    assert rows("SELECT seconds FROM playtime_user_daily") == [(900,)]
+    assert rows("SELECT seconds FROM playtime_user_weekly") == [(900,)]
+    assert rows("SELECT seconds FROM playtime_user_total") == [(900,)]
+    assert rows("SELECT * FROM playtime_sessions") == []
+    assert not game.active_sessions
+    # A 開玩、B 開玩各被罵一次（隔 600 秒，過了 300 秒冷卻）
+    assert [text for kind, _, text in outbox.sent if kind == "roast"] == ["@u 玩 A？<game_start>", "@u 玩 B？<game_start>"]
+
+
+def test_switch_keeps_a_session_open_for_the_new_game(monkeypatch):
+    game, _ = play(monkeypatch, [(0, None, "A"), (120, "A", "B")])
+
+    assert game.active_sessions[(GUILD, USER)]["game"] == "B"
+    assert rows("SELECT game_name FROM playtime_sessions") == [("B",)]
+    assert rows("SELECT game_name, seconds FROM playtime") == [("A", 120)]
@@ -0,0 +1,61 @@
+import aiosqlite
+
+from conftest import run
+from core.leaderboard import RankedIndex, Leaderboards
+
+
+def test_ranked_index_orders_by_score_then_user_id():
+    board = RankedIndex()
+    board.set(3, 10)
+    board.set(1, 10)
+    board.set(2, 30)
+    assert board.top(10) == [(2, 30), (1, 10), (3, 10)]
+    assert [board.rank(u) for u in (2, 1, 3)] == [1, 2, 3]
+    assert board.rank(99) is None and board.get(99) == 0
+
+
+def test_add_moves_the_user_and_keeps_one_entry():
+    board = RankedIndex()
+    for uid in range(5):
+        board.set(uid, uid)
+    assert board.add(0, 10) == 10
+    assert board.add(4, -5) == -1
+    assert board.top(3) == [(0, 10), (3, 3), (2, 2)]
+    assert len(board) == 5 and board.rank(4) == 5
+    board.clear()
+    assert board.top(3) == [] and len(board) == 0
+
+
+def test_boards_are_per_guild_and_metric():
+    boards = Leaderboards()
+    boards.add(1, "honor", 7, 20)
+    boards.add(2, "honor", 7, -10)
+    boards.add(1, "lazy", 7, 5)
+    assert boards.top(1, "honor") == [(7, 20)]
+    assert boards.top(2, "honor") == [(7, -10)]
+    boards.clear(1, "honor")
+    assert boards.top(1, "honor") == [] and boards.top(1, "lazy") == [(7, 5)]
+
+
+def test_load_rebuilds_from_sqlite_skipping_zero_scores():
+    async def go():
+        async with aiosqlite.connect("lb.db") as db:
+            await db.executescript('''
+                CREATE TABLE honor (guild_id INTEGER, user_id INTEGER, points INTEGER);
+                CREATE TABLE daily_stats (guild_id INTEGER, user_id INTEGER, lazy_points INTEGER);
+                CREATE TABLE nonsense_stats (guild_id INTEGER, user_id INTEGER, count INTEGER);
+                INSERT INTO honor VALUES (1, 10, 50), (1, 11, 0), (2, 10, -20);
+                INSERT INTO daily_stats VALUES (1, 12, 30);
+                INSERT INTO nonsense_stats VALUES (1, 13, 4);
+            ''')
+            boards = Leaderboards()
+            boards.add(9, "honor", 1, 1)  # 重建前的舊資料要清掉
+            await boards.load(db)
+        return boards
+
+    boards = run(go())
+    assert boards.top(1, "honor") == [(10, 50)]
+    assert boards.top(2, "honor") == [(10, -20)]
+    assert boards.top(1, "lazy") == [(12, 30)]
+    assert boards.top(1, "nonsense") == [(13, 4)]
+    assert boards.top(9, "honor") == []
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+
+from conftest import run
+from core.logs import RateLimitFilter, log_task_failure
+
+
+def record(level, lineno=10):
+    return logging.LogRecord("t", level, "/x.py", lineno, "msg", None, None)
+
+
+def test_info_is_never_rate_limited():
+    f = RateLimitFilter(window=60, burst=5)
+    assert all(f.filter(record(logging.INFO)) for _ in range(50))
+
+
+def test_warnings_from_one_call_site_are_limited_and_counted():
+    f = RateLimitFilter(window=60, burst=5)
+    passed = [f.filter(record(logging.WARNING)) for _ in range(20)]
+    assert passed.count(True) == 5
+    # 另一個呼叫點不受影響
+    assert f.filter(record(logging.ERROR, lineno=99))
+    # 視窗過了：放行並帶上略過的筆數
+    f._sites[("/x.py", 10)][0] -= 61
+    r = record(logging.WARNING)
+    assert f.filter(r) and r.suppressed == 15
+
+
+def test_critical_is_never_rate_limited():
+    f = RateLimitFilter(window=60, burst=1)
+    assert all(f.filter(record(logging.CRITICAL)) for _ in range(10))
+
+
+def test_background_task_failure_is_logged(caplog):
+    async def boom():
+        raise RuntimeError("炸了")
+
+    async def main():
+        task = asyncio.create_task(boom())
+        task.add_done_callback(log_task_failure)
+        await asyncio.sleep(0.01)
+
+    with caplog.at_level(logging.ERROR, logger="core.logs"):
+        run(main())
+    assert "背景工作 boom 失敗" in caplog.text and "炸了" in caplog.text
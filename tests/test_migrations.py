@@ -0,0 +1,89 @@
+import json
+import sqlite3
+
+import aiosqlite
+
+from cogs import game as game_module
+from cogs.game import Game
+from conftest import run, fake_bot
+from core import chat_index
+
+LEGACY_GUILD, USER = 5, 7
+
+
+def legacy_db():
+    """舊版（單一伺服器、沒有 guild_id）的資料庫"""
+    db = sqlite3.connect("mamba_system.db")
+    db.executescript('''
+        CREATE TABLE playtime (user_id INTEGER, game_name TEXT, seconds INTEGER, last_played DATE, PRIMARY KEY(user_id, game_name));
+        CREATE TABLE honor (user_id INTEGER PRIMARY KEY, points INTEGER DEFAULT 0, last_vote_date DATE);
+        CREATE TABLE chat_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, content TEXT, timestamp REAL);
+        CREATE TABLE conversation_memory (user_id INTEGER PRIMARY KEY, summary TEXT, turns TEXT, updated REAL);
+    ''')
+    db.executemany("INSERT INTO playtime VALUES (?, ?, ?, ?)", [(USER, "A", 600, "2024-01-01"), (USER, "B", 300, "2024-01-02")])
+    db.execute("INSERT INTO honor VALUES (?, 40, NULL)", (USER,))
+    db.executemany("INSERT INTO chat_logs (user_id, content, timestamp) VALUES (?, ?, ?)", [
+        (USER, "我放棄了", 100.0),
+        (USER, "[黑歷史]我放棄了", 101.0),   # 舊版另存的複本
+        (USER, "[黑歷史]原句早就清掉", 200.0),
+        (USER, "普通聊天", 300.0),
+    ])
+    db.execute("INSERT INTO conversation_memory VALUES (?, '以前聊過籃球', ?, 1.0)", (USER, json.dumps([["user", "嗨"], ["model", "去訓練"]])))
+    db.commit()
+    db.close()
+
+
+def load_game(monkeypatch):
+    monkeypatch.setattr(game_module, "LEGACY_GUILD_ID", LEGACY_GUILD)
+    bot = fake_bot()
+    game = Game(bot)
+
+    async def go():
+        await bot.guild_config.load()
+        await game.cog_load()
+        try:
+            history = await game.memory.history(LEGACY_GUILD, USER)
+            async with aiosqlite.connect("mamba_system.db") as db:
+                hits = await chat_index.search(db, LEGACY_GUILD, USER, ["放棄"])
+            return history, hits
+        finally:
+            await game.cog_unload()
+
+    return game, *run(go())
+
+
+def rows(sql):
+    return sqlite3.connect("mamba_system.db").execute(sql).fetchall()
+
+
+def test_legacy_tables_move_under_the_legacy_guild(monkeypatch):
+    legacy_db()
+    game, history, _ = load_game(monkeypatch)
+
+    assert rows("SELECT guild_id, user_id, game_name, seconds FROM playtime ORDER BY game_name") == [
+        (LEGACY_GUILD, USER, "A", 600), (LEGACY_GUILD, USER, "B", 300),
+    ]
+    assert rows("SELECT guild_id, user_id, seconds FROM playtime_user_total") == [(LEGACY_GUILD, USER, 900)]
+    assert rows("SELECT name FROM sqlite_master WHERE name LIKE '%_legacy'") == []
+    assert game.boards.top(LEGACY_GUILD, "honor") == [(USER, 40)]
+    assert history[0]["parts"] == ["（前情提要）以前聊過籃球"]
+    assert [h["parts"][0] for h in history[2:]] == ["嗨", "去訓練"]
+
+
+def test_black_history_copies_are_deduped_and_indexed(monkeypatch):
+    legacy_db()
+    _, _, hits = load_game(monkeypatch)
+
+    assert rows("SELECT guild_id, content, flagged FROM chat_logs ORDER BY timestamp") == [
+        (LEGACY_GUILD, "我放棄了", 1), (LEGACY_GUILD, "原句早就清掉", 1), (LEGACY_GUILD, "普通聊天", 0),
+    ]
+    assert hits == ["我放棄了"]
+
+
+def test_second_load_is_a_no_op(monkeypatch):
+    legacy_db()
+    load_game(monkeypatch)
+    before = rows("SELECT * FROM chat_logs ORDER BY id")
+    load_game(monkeypatch)
+    assert rows("SELECT * FROM chat_logs ORDER BY id") == before
+    assert rows("SELECT seconds FROM playtime_user_total") == [(900,)]
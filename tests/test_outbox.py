@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+from conftest import run
+from core.outbox import Outbox
+
+
+class Channel:
+    def __init__(self, cid=1):
+        self.id = cid
+        self.log = []
+
+    async def send(self, content, **kwargs):
+        self.log.append(("send", content))
+        return f"msg:{content}"
+
+
+def message(channel, name):
+    async def reply(content, **kwargs):
+        channel.log.append(("reply", content))
+        return f"reply:{content}"
+
+    async def add_reaction(emoji):
+        channel.log.append(("react", f"{name}{emoji}"))
+
+    return SimpleNamespace(channel=channel, reply=reply, add_reaction=add_reaction)
+
+
+def test_replies_go_before_roasts_before_reactions():
+    async def go():
+        ch = Channel()
+        box = Outbox()
+        m = message(ch, "m")
+        futures = [box.react(m, "👍"), box.roast(ch, "處刑"), box.reply(m, "回覆")]
+        await asyncio.gather(*futures)
+        return ch.log, box.metrics()
+
+    log, metrics = run(go())
+    assert log == [("reply", "回覆"), ("send", "處刑"), ("react", "m👍")]
+    assert metrics["sent"] == 3 and metrics["depth"] == 0 and metrics["channels"] == 0
+
+
+def test_queued_roasts_in_one_channel_are_merged():
+    async def go():
+        ch = Channel()
+        box = Outbox()
+        first, second = box.roast(ch, "一"), box.roast(ch, "二")
+        other = box.roast(Channel(2), "三")
+        return ch.log, await first, await second, await other, box.stats
+
+    log, first, second, other, stats = run(go())
+    assert log == [("send", "一\n\n二")]
+    assert first == second == "msg:一\n\n二" and other == "msg:三"
+    assert stats["coalesced"] == 1 and stats["sent"] == 2
+
+
+def test_full_queue_drops_the_least_important_first():
+    async def go():
+        ch = Channel()
+        box = Outbox(max_depth=2)
+        m = message(ch, "m")
+        r1, r2 = box.react(m, "1"), box.react(m, "2")
+        reply = box.reply(m, "重要")        # 擠掉最舊的表情
+        r3 = box.react(m, "3")             # 滿了又不比誰重要：丟新來的
+        results = await asyncio.gather(r1, r2, reply, r3)
+        return ch.log, results, box.stats
+
+    log, results, stats = run(go())
+    assert log == [("reply", "重要"), ("react", "m2")]
+    assert results[0] is None and results[2] == "reply:重要" and results[3] is None
+    assert stats["dropped"] == 2
+
+
+def test_send_failure_resolves_to_none_and_keeps_draining():
+    async def go():
+        ch = Channel()
+
+        async def broken(content, **kwargs):
+            raise RuntimeError("429")
+
+        bad = SimpleNamespace(id=1, send=broken)
+        box = Outbox()
+        failed = box.send(bad, "x")
+        ok = box.reply(message(ch, "m"), "y")
+        return await failed, await ok, box.stats
+
+    failed, ok, stats = run(go())
+    assert failed is None and ok == "reply:y"
+    assert stats["failed"] == 1 and stats["sent"] == 1
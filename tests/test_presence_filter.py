@@ -0,0 +1,91 @@
+import time
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from conftest import run
+from core.presence_filter import PresenceFilter, PresenceSnapshot, snapshot
+
+
+def member(game=None, status=discord.Status.online, uid=42, gid=1):
+    activities = [discord.Game(game)] if game else []
+    return SimpleNamespace(id=uid, guild=SimpleNamespace(id=gid), activities=activities, status=status)
+
+
+def filtered(monkeypatch, steps):
+    """steps: [(時間, before, after) 或 (時間, None, None) = flush]，回傳 (filter, handler 收到的 (old, new))"""
+    seen = []
+    clock = {"now": 0.0}
+    monkeypatch.setattr(time, "monotonic", lambda: clock["now"])
+
+    async def handler(m, old, new):
+        seen.append((old.game, new.game))
+
+    async def go():
+        f = PresenceFilter(handler, debounce=3.0)
+        for at, before, after in steps:
+            clock["now"] = at
+            if before is None:
+                f.flush(at)
+                await asyncio.sleep(0)
+            else:
+                f.feed(before, after)
+        return f
+
+    return run(go()), seen
+
+
+def test_snapshot_keeps_only_fields_we_care_about():
+    assert snapshot(member("A")) == PresenceSnapshot("A", None, None, None, "online")
+    assert snapshot(member(status=discord.Status.offline)).status == "offline"
+
+
+def test_unchanged_presence_is_dropped(monkeypatch):
+    f, seen = filtered(monkeypatch, [(0, member("A"), member("A")), (10, None, None)])
+    assert seen == [] and f.stats["dropped"] == 1 and f.metrics()["pending"] == 0
+
+
+def test_change_is_dispatched_once_after_debounce(monkeypatch):
+    f, seen = filtered(monkeypatch, [
+        (0, member(), member("A")),
+        (1, None, None),            # 還沒到 debounce
+        (2, member(), member("A")),  # 同一人又來一筆：延後
+        (4, None, None),
+        (6, None, None),
+    ])
+    assert seen == [(None, "A")]
+    assert f.metrics()["tracked"] == 1 and f.stats["dispatched"] == 1
+
+
+def test_flapping_back_to_the_old_state_is_swallowed(monkeypatch):
+    f, seen = filtered(monkeypatch, [
+        (0, member("A"), member()),
+        (1, member(), member("A")),
+        (10, None, None),
+    ])
+    assert seen == [] and f.stats["flapped"] == 1
+
+
+def test_going_offline_idle_forgets_the_user(monkeypatch):
+    f, seen = filtered(monkeypatch, [
+        (0, member(), member("A")),
+        (5, None, None),
+        (6, member("A"), member(status=discord.Status.offline)),
+        (10, None, None),
+    ])
+    assert seen == [(None, "A"), ("A", None)]
+    assert f.metrics()["tracked"] == 0
+
+
+def test_forget_by_user_and_by_guild(monkeypatch):
+    f, _ = filtered(monkeypatch, [
+        (0, member(), member("A", uid=1)),
+        (0, member(), member("A", uid=2)),
+        (0, member(), member("A", uid=3, gid=2)),
+        (5, None, None),
+    ])
+    f.forget(1, 1)
+    assert f.metrics()["tracked"] == 2
+    f.forget(2)
+    assert set(f._committed) == {(1, 2)}
@@ -0,0 +1,36 @@
+import pytest
+
+from core import prompts
+from core.prompts import PromptBuilder
+from core.tokens import estimate_tokens
+
+
+@pytest.fixture(autouse=True)
+def clean_stats(monkeypatch):
+    monkeypatch.setattr(prompts, "PROMPT_STATS", {})
+
+
+def test_section_dedupes_and_normalises_whitespace():
+    p = PromptBuilder("t").text("指令").section("名單：", ["a  b", "a b", "c", ""], budget=100, sep="、").build()
+    assert p == "指令\n名單：a b、c"
+
+
+def test_section_respects_budget_and_counts_dropped():
+    items = [f"第{i}句話" for i in range(20)]
+    b = PromptBuilder("t").section("", items, budget=20, more="（共 {n} 則）")
+    body = b.build()
+    assert estimate_tokens(body.split("（")[0]) <= 20
+    assert body.endswith("（共 20 則）")
+    assert b.dropped == 20 - body.count("句話")
+
+
+def test_long_items_are_truncated_and_empty_sections_use_placeholder():
+    p = PromptBuilder("t").section("長：", ["字" * 50], budget=100, item_tokens=10).section("空：", [], budget=10, empty="（沒有）")
+    assert p.build() == "長：" + "字" * 9 + "…\n空：（沒有）"
+    assert PromptBuilder("t").section("空：", [], budget=10).build() == ""
+
+
+def test_build_caps_total_size_and_records_stats():
+    PromptBuilder("a", max_tokens=5).text("字" * 100).build()
+    PromptBuilder("a").text("字" * 3).build()
+    assert prompts.PROMPT_STATS == {"a": {"count": 2, "tokens": 8, "max": 5}}
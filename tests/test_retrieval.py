@@ -0,0 +1,61 @@
+import time
+
+import aiosqlite
+
+from conftest import run
+from core.retrieval import UserIndex, RetrievalIndex
+
+
+def test_search_ranks_related_lines_first_and_skips_the_query_itself():
+    index = UserIndex()
+    for line in ["今天好累不想練球", "晚餐吃拉麵", "練球練到手斷掉", "今天好累不想練球"]:
+        index.add(line)
+    hits = index.search("今天好累不想練球", k=2)
+    assert "今天好累不想練球" not in hits
+    assert hits[0] == "練球練到手斷掉"
+
+
+def test_no_overlap_returns_nothing():
+    index = UserIndex()
+    index.add("晚餐吃拉麵")
+    assert index.search("英雄聯盟") == []
+    assert UserIndex().search("隨便") == []
+
+
+def test_full_index_drops_the_older_half():
+    index = UserIndex(max_docs=4)
+    for i in range(5):
+        index.add(f"line{i} word{i}")
+    assert index.docs == ["line2 word2", "line3 word3", "line4 word4"]
+    assert index.search("line0") == []
+    assert index.search("word3 line9") == ["line3 word3"]
+
+
+def test_retrieval_index_loads_from_chat_logs_and_skips_expired_lines():
+    now = time.time()
+
+    async def go():
+        async with aiosqlite.connect("r.db") as db:
+            await db.executescript('''
+                CREATE TABLE chat_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER, user_id INTEGER,
+                                        content TEXT, timestamp REAL, flagged INTEGER DEFAULT 0);
+            ''')
+            await db.executemany(
+                "INSERT INTO chat_logs (guild_id, user_id, content, timestamp, flagged) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (1, 7, "我要去打籃球", now, 0),
+                    (1, 7, "籃球太難了放棄", now - 400 * 86400, 1),   # 黑歷史：永久
+                    (1, 7, "籃球很久以前", now - 400 * 86400, 0),     # 過期
+                    (2, 7, "籃球別的伺服器", now, 0),
+                ]
+            )
+            await db.commit()
+        index = RetrievalIndex("r.db")
+        found = await index.search(1, 7, "籃球", k=5)
+        index.add(1, 7, "籃球新的一句")
+        again = await index.search(1, 7, "籃球", k=5)
+        return found, again
+
+    found, again = run(go())
+    assert sorted(found) == ["我要去打籃球", "籃球太難了放棄"]
+    assert "籃球新的一句" in again
@@ -0,0 +1,151 @@
+# bench_members.py ─ 大伺服器成員快取測試：登入處理時間、RSS、查「誰在線上」的速度，完全離線
+#
+#   python tools/bench_members.py [伺服器數] [每座人數] [在線比例]
+#
+# 用 discord.py 自己的 ConnectionState 吃假的 GUILD_CREATE（大伺服器只帶在線成員）；
+# startup 情境再把整份名單當成 chunk 塞進去。每個情境各開一個 process，RSS 才不會互相污染。
+import os
+import sys
+import json
+import time
+import random
+import resource
+import subprocess
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+from discord.member import Member  # noqa: E402
+from discord.state import ConnectionState  # noqa: E402
+
+from core.online_index import OnlineIndex  # noqa: E402
+
+SCENARIOS = {
+    # 名稱 -> (member_cache_flags, 登入時 chunk 全部)
+    "startup": ("joined,voice", True),
+    "small/lazy": ("joined,voice", False),
+    "voice-only": ("voice", False),
+}
+QUERIES = 200
+PRESENCE_EVENTS = 50_000
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def member_payload(uid):
+    return {
+        "user": {"id": str(uid), "username": f"user{uid}", "discriminator": "0", "avatar": None, "global_name": None},
+        "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0,
+    }
+
+
+def presence_payload(uid):
+    return {"user": {"id": str(uid)}, "status": "online", "activities": [], "client_status": {}}
+
+
+def guild_payload(gid, size, online):
+    return {
+        "id": str(gid), "name": f"guild{gid}", "member_count": size, "large": True, "channels": [],
+        "roles": [{"id": str(gid), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False, "flags": 0}],
+        "members": [member_payload(gid + i) for i in online],
+        "presences": [presence_payload(gid + i) for i in online],
+        "voice_states": [], "emojis": [], "stickers": [], "features": [],
+    }
+
+
+def run_scenario(name, guilds, size, ratio):
+    flags_spec, chunk = SCENARIOS[name]
+    random.seed(7)
+    intents = discord.Intents.default()
+    intents.members = intents.presences = True
+    flags = discord.MemberCacheFlags.none()
+    for flag in flags_spec.split(","):
+        setattr(flags, flag, True)
+    state = ConnectionState(
+        dispatch=lambda *a, **k: None, handlers={}, hooks={}, http=None, intents=intents,
+        member_cache_flags=flags, chunk_guilds_at_startup=chunk, max_messages=None,
+    )
+    gids = [(g + 1) * 10**12 for g in range(guilds)]
+    onlines = {gid: random.sample(range(size), int(size * ratio)) for gid in gids}
+    payloads = [guild_payload(gid, size, onlines[gid]) for gid in gids]
+    base = rss_mb()
+
+    t = time.perf_counter()
+    built = []
+    for payload in payloads:
+        guild = state._add_guild_from_data(payload)
+        if chunk:
+            # 在線的人 GUILD_CREATE 已經帶了（含 presence），chunk 補上其餘的人
+            for i in range(size):
+                if guild.get_member(guild.id + i) is None:
+                    guild._add_member(Member(guild=guild, data=member_payload(guild.id + i), state=state))
+        built.append(guild)
+    login_ms = (time.perf_counter() - t) * 1000
+    payloads.clear()
+
+    index = OnlineIndex(None, chunk_mode="lazy")
+    for guild in built:
+        index.seed(guild)
+
+    t = time.perf_counter()
+    for _ in range(QUERIES):
+        for guild in built:
+            [m for m in guild.members if not m.bot and m.status == discord.Status.online]
+    walk_ms = (time.perf_counter() - t) * 1000 / QUERIES
+
+    t = time.perf_counter()
+    for _ in range(QUERIES):
+        for guild in built:
+            index.members(guild)
+    index_ms = (time.perf_counter() - t) * 1000 / QUERIES
+
+    events = [
+        SimpleNamespace(bot=False, id=guild.id + random.randrange(size), guild=guild,
+                        status=random.choice([discord.Status.online, discord.Status.idle, discord.Status.offline]))
+        for guild in (random.choice(built) for _ in range(PRESENCE_EVENTS))
+    ]
+    t = time.perf_counter()
+    for e in events:
+        _feed(index, e)
+    presence_us = (time.perf_counter() - t) * 1e6 / PRESENCE_EVENTS
+
+    return {
+        "scenario": name, "cached": sum(len(g.members) for g in built), "login_ms": login_ms,
+        "rss_mb": rss_mb() - base, "walk_ms": walk_ms, "index_ms": index_ms, "presence_us": presence_us,
+    }
+
+
+def _feed(index, event):
+    # 事件處理器是 coroutine 但裡面沒有 await，直接推一步就跑完
+    try:
+        index._on_presence_update(None, event).send(None)
+    except StopIteration:
+        pass
+
+
+def main(guilds, size, ratio):
+    print(f"{guilds} 座伺服器 × {size} 人，在線 {ratio:.0%}（每次查詢 = 掃過全部伺服器一次）\n")
+    print(f"{'情境':<12}{'快取成員':>10}{'登入處理':>12}{'RSS 增加':>12}{'掃 members':>13}{'查索引':>11}{'presence':>11}")
+    for name in SCENARIOS:
+        out = subprocess.run(
+            [sys.executable, __file__, "--scenario", name, str(guilds), str(size), str(ratio)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        r = json.loads(out)
+        print(f"{r['scenario']:<12}{r['cached']:>12}{r['login_ms']:>11.0f}ms{r['rss_mb']:>11.1f}MB"
+              f"{r['walk_ms']:>12.2f}ms{r['index_ms']:>9.3f}ms{r['presence_us']:>9.2f}µs")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--scenario":
+        name, g, n, r = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), float(sys.argv[5])
+        print(json.dumps(run_scenario(name, g, n, r)))
+    else:
+        g = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+        r = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+        main(g, n, r)
@@ -0,0 +1,67 @@
+# bench_retrieval.py ─ 聊天紀錄檢索（core.retrieval）延遲測試，完全離線
+#
+#   python tools/bench_retrieval.py [訊息數] [人數]
+#
+# 產生一個暫存資料庫塞入假聊天，量 @ 機器人時撈相關舊發言要花多久：
+# 冷（第一次從 SQLite 載入這個人的索引）和熱（索引已在記憶體）分開算。
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import chat_index  # noqa: E402
+from core.database import connect  # noqa: E402
+from core.retrieval import RetrievalIndex  # noqa: E402
+
+WORDS = ["今天", "好累", "練球", "投籃", "放棄", "加班", "打遊戲", "睡覺", "早餐", "考試",
+         "老闆", "健身", "跑步", "想睡", "報告", "女朋友", "薪水", "電影", "下雨", "rank",
+         "lol", "valorant", "gym", "coding", "bug", "deadline", "咖啡", "宵夜", "減肥", "失眠"]
+
+
+def fake_message():
+    return "".join(random.choice(WORDS) for _ in range(random.randint(2, 8)))
+
+
+def report(name, samples):
+    samples.sort()
+    print(f"{name} {len(samples)} 次: 平均 {statistics.mean(samples):.3f}ms  "
+          f"p50 {samples[len(samples) // 2]:.3f}ms  p99 {samples[int(len(samples) * 0.99)]:.3f}ms")
+
+
+async def main(messages, users):
+    random.seed(42)
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    async with connect(path) as db:
+        await db.execute("CREATE TABLE chat_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER, user_id INTEGER, content TEXT, timestamp REAL, flagged INTEGER DEFAULT 0)")
+        await chat_index.setup(db)
+        t0 = time.perf_counter()
+        now = time.time()
+        for i in range(messages):
+            await chat_index.add_message(db, 1, random.randrange(users), fake_message(), now - i)
+        await db.commit()
+        print(f"寫入 {messages} 筆（{users} 人）: {time.perf_counter() - t0:.2f}s")
+
+    index = RetrievalIndex(path, cache_users=users)
+    cold, warm = [], []
+    for user_id in range(users):
+        t = time.perf_counter()
+        await index.search(1, user_id, fake_message())
+        cold.append((time.perf_counter() - t) * 1000)
+    for _ in range(2000):
+        t = time.perf_counter()
+        await index.search(1, random.randrange(users), fake_message() + "?")
+        warm.append((time.perf_counter() - t) * 1000)
+    report("冷（載入索引）", cold)
+    report("熱（記憶體內）", warm)
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    u = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(main(n, u))
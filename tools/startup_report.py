@@ -0,0 +1,95 @@
+# startup_report.py ─ 冷啟動報告：import 花多久、setup_hook 各階段花多久，CI 用來擋退步
+#
+#   python tools/startup_report.py
+#
+# 不用 token、不連 Discord：在暫存目錄 import main、跑一次 setup_hook（init_db / 載入狀態 / 同時載入所有 cog）。
+# 以下任一情況 exit 1：
+#   - import main 超過 STARTUP_MAX_IMPORT_MS，或 setup_hook 超過 STARTUP_MAX_SETUP_MS
+#   - 重量級套件（google.generativeai、PIL、flask）在啟動時就被載入
+#   - 有 cog 載入失敗
+import os
+import re
+import sys
+import time
+import asyncio
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MAX_IMPORT_MS = float(os.getenv("STARTUP_MAX_IMPORT_MS", "3000"))
+MAX_SETUP_MS = float(os.getenv("STARTUP_MAX_SETUP_MS", "5000"))
+LAZY_MODULES = ("google.generativeai", "PIL", "flask")
+TOP_IMPORTS = 15
+
+
+def slowest_imports():
+    """python -X importtime 的結果，依累計時間排前幾名"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=ROOT)
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.+)$", line)
+        if m:
+            rows.append((int(m.group(2)), m.group(3).rstrip()))
+    rows.sort(reverse=True)
+    return rows[:TOP_IMPORTS]
+
+
+async def run_setup(main):
+    # async with：做完 login 前的初始化（不連線），跟正式啟動時 setup_hook 看到的狀態一樣
+    async with main.bot:
+        with main.startup.phase("setup_hook"):
+            await main.bot.setup_hook()
+        loaded = set(main.bot.extensions)
+        for ext in list(loaded):
+            await main.bot.unload_extension(ext)
+        main.bot.governor.stop()
+        main.bot.roast_pool.stop()
+    return loaded
+
+
+def main():
+    failures = []
+    # 在暫存目錄跑，SQLite 檔不會寫進 repo
+    os.chdir(tempfile.mkdtemp())
+    for key in ("DISCORD_TOKEN", "GEMINI_API_KEY"):
+        os.environ.pop(key, None)
+
+    t = time.perf_counter()
+    import main as bot_main
+    import_ms = (time.perf_counter() - t) * 1000
+    eager = [m for m in LAZY_MODULES if m in sys.modules]
+
+    loaded = asyncio.run(run_setup(bot_main))
+    setup_ms = bot_main.startup.phases["setup_hook"] * 1000
+    expected = {f"cogs.{f[:-3]}" for f in os.listdir(bot_main.COGS_DIR) if f.endswith(".py")}
+    eager += [m for m in LAZY_MODULES if m in sys.modules and m not in eager]
+
+    print(bot_main.startup.report())
+    print(f"\nimport main: {import_ms:.1f} ms（上限 {MAX_IMPORT_MS:.0f}）  setup_hook: {setup_ms:.1f} ms（上限 {MAX_SETUP_MS:.0f}）")
+    print(f"\n最慢的 {TOP_IMPORTS} 個 import（累計）：")
+    for us, name in slowest_imports():
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if import_ms > MAX_IMPORT_MS:
+        failures.append(f"import main 太慢（{import_ms:.0f} ms）")
+    if setup_ms > MAX_SETUP_MS:
+        failures.append(f"setup_hook 太慢（{setup_ms:.0f} ms）")
+    if eager:
+        failures.append(f"啟動時載入了應該延後的套件：{', '.join(eager)}")
+    if expected - loaded:
+        failures.append(f"cog 載入失敗：{', '.join(sorted(expected - loaded))}")
+
+    for f in failures:
+        print(f"❌ {f}")
+    if not failures:
+        print("\n✅ 冷啟動正常")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())